@@ -4,6 +4,7 @@ import traceback
 from flask import Blueprint, render_template, jsonify, request
 from app.services.main_service import MainService
 from app.services.auction_service import AuctionService
+from app.services.watch_service import WatchService
 from flask_login import login_required, current_user
 import os
 from flask import session
@@ -304,3 +305,47 @@ def get_user_details():
         return jsonify(user_details), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@auction_controller.route("/api/watches", methods=["GET"])
+@login_required
+def get_watches():
+    """
+    List the auctions, sellers and keywords the current user watches.
+    """
+    try:
+        return jsonify(WatchService.list_watches(current_user.id)), 200
+    except Exception as e:
+        logger.error("Exception occurred while fetching watches:", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@auction_controller.route("/api/watches", methods=["POST", "DELETE"])
+@login_required
+def update_watch():
+    """
+    Watch or unwatch an auction, a seller or a keyword. Only watchers are
+    notified of matching new and starting auctions.
+
+    Body: {"watch_type": "auction" | "seller" | "keyword", "target": "..."}
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        try:
+            watch_type, target = WatchService.normalize(
+                body.get("watch_type"), body.get("target")
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if request.method == "POST":
+            if not WatchService.add_watch(current_user.id, watch_type, target):
+                return jsonify({"error": "Auction not found"}), 404
+            return jsonify({"watch_type": watch_type, "target": target}), 201
+
+        if not WatchService.remove_watch(current_user.id, watch_type, target):
+            return jsonify({"error": "Watch not found"}), 404
+        return jsonify({"message": "Watch removed"}), 200
+    except Exception as e:
+        logger.error("Exception occurred while updating a watch:", exc_info=True)
+        return jsonify({"error": str(e)}), 500
@@ -52,14 +52,15 @@ def callback():
 
             # Log user in
             user_id = session["user_id"]
-            # user_email = session["email"]
+            # Only verified addresses are stored for notifications
+            user_email = session["email"] if session.get("email_verified") else None
             user_name = session["name"]
 
             # Insert or update the user in the RDS database
             existing_user = Users.query.filter_by(user_id=user_id).first()
             if not existing_user:
                 # Insert new user
-                new_user = Users(user_id=user_id, user_name=user_name)
+                new_user = Users(user_id=user_id, user_name=user_name, email=user_email)
                 db.session.add(new_user)
                 print(f"New user added: {user_name}")
             else:
@@ -67,6 +68,9 @@ def callback():
                 if existing_user.user_name != user_name:
                     existing_user.user_name = user_name
                     print(f"User updated: {user_name}")
+                if user_email and existing_user.email != user_email:
+                    existing_user.email = user_email
+                    print(f"User email updated: {user_name}")
 
             db.session.commit()  # Save changes to the database
 
@@ -120,6 +124,8 @@ def decode_cognito_token(token):
 
         session["user_id"] = user_id
         session["email"] = email
+        email_verified = decoded_token.get("email_verified")
+        session["email_verified"] = email_verified in (True, "true")
         session["name"] = name
         return "Token decoded successfully", 200
     except ExpiredSignatureError:
@@ -1,2 +1,2 @@
 from app.models.db_models import db, Users, Auction  # noqa
-from app.models.db_models import AuctionInterest, AuctionWinner  # noqa
+from app.models.db_models import AuctionInterest, AuctionWinner, UserWatch  # noqa
@@ -13,6 +13,9 @@ class Users(db.Model):
         db.String(36), primary_key=True, default=lambda: str(uuid.uuid4())
     )
     user_name = db.Column(db.String(100), nullable=False)
+    # Verified email from the Cognito ID token, kept so notifications need no
+    # admin_get_user call per recipient
+    email = db.Column(db.String(255), nullable=True)
 
 
 class Auction(db.Model):
@@ -54,3 +57,27 @@ class AuctionWinner(db.Model):
 
     auction = db.relationship("Auction", backref="winners")
     user = db.relationship("Users", backref="winners")
+
+
+class UserWatch(db.Model):
+    """
+    A user following a seller or a keyword. Watching a single auction is
+    recorded in AuctionInterest instead.
+    """
+
+    __tablename__ = "user_watch"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "watch_type", "target"),
+        # Notification workers look watchers up by what was watched
+        db.Index("ix_user_watch_type_target", "watch_type", "target"),
+    )
+    watch_id = db.Column(
+        db.String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    user_id = db.Column(db.String(36), db.ForeignKey("users.user_id"), nullable=False)
+    watch_type = db.Column(db.Enum("seller", "keyword"), nullable=False)
+    # The seller's user_id, or a lowercased keyword
+    target = db.Column(db.String(100), nullable=False)
+    created_on = db.Column(db.DateTime, nullable=False)
+
+    user = db.relationship("Users", backref="watches")
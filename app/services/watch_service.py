@@ -0,0 +1,82 @@
+import re
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db
+from app.models.db_models import Auction, AuctionInterest, UserWatch
+
+WATCH_TYPES = ("auction", "seller", "keyword")
+# Keywords are matched against the words of an auction's item and description
+KEYWORD_PATTERN = re.compile(r"^[a-z0-9]{2,50}$")
+
+
+class WatchService:
+    @staticmethod
+    def normalize(watch_type, target):
+        """
+        Validate a watch request; returns (watch_type, target) or raises
+        ValueError.
+        """
+        target = (target or "").strip()
+        if watch_type not in WATCH_TYPES:
+            raise ValueError(f"watch_type must be one of {', '.join(WATCH_TYPES)}.")
+        if not target:
+            raise ValueError("Missing target.")
+        if watch_type == "keyword":
+            target = target.lower()
+            if not KEYWORD_PATTERN.match(target):
+                raise ValueError(
+                    "Keywords must be a single word of 2-50 letters or digits."
+                )
+        return watch_type, target
+
+    @staticmethod
+    def list_watches(user_id):
+        watches = [
+            {"watch_type": "auction", "target": interest.auction_id}
+            for interest in AuctionInterest.query.filter_by(user_id=user_id)
+        ]
+        watches.extend(
+            {"watch_type": watch.watch_type, "target": watch.target}
+            for watch in UserWatch.query.filter_by(user_id=user_id)
+        )
+        return watches
+
+    @staticmethod
+    def add_watch(user_id, watch_type, target):
+        """
+        Record a watch; adding an existing one is a no-op.
+
+        Returns False when a watched auction does not exist.
+        """
+        if watch_type == "auction":
+            if not db.session.get(Auction, target):
+                return False
+            watch = AuctionInterest(auction_id=target, user_id=user_id)
+        else:
+            watch = UserWatch(
+                user_id=user_id,
+                watch_type=watch_type,
+                target=target,
+                created_on=datetime.utcnow(),
+            )
+        try:
+            db.session.add(watch)
+            db.session.commit()
+        except IntegrityError:
+            # Already watched
+            db.session.rollback()
+        return True
+
+    @staticmethod
+    def remove_watch(user_id, watch_type, target):
+        if watch_type == "auction":
+            query = AuctionInterest.query.filter_by(auction_id=target, user_id=user_id)
+        else:
+            query = UserWatch.query.filter_by(
+                user_id=user_id, watch_type=watch_type, target=target
+            )
+        removed = query.delete()
+        db.session.commit()
+        return removed > 0
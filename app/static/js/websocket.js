@@ -12,6 +12,24 @@ const remainingSnipesElement = document.getElementById("remaining-snipes");
 
 // Store the reference to the current interval
 let interval = null;
+// Server clock minus local clock, estimated from ping round trips
+let clockOffsetMs = 0;
+// Auction end the countdown runs to, in server epoch milliseconds
+let auctionEndMs = null;
+
+// Wire format requested when joining; the server falls back to JSON
+const WIRE_FORMAT = "compact";
+// Reconnect backoff cap; delays are jittered so a dropped crowd spreads out
+const MAX_RECONNECT_DELAY_MS = 30000;
+// Field order of compact leaderboard rows
+const ENTRY_FIELDS = ["user_id", "user_name", "bid_amount", "timestamp"];
+// Pings per clock sync; the lowest round trip gives the best offset estimate
+const CLOCK_SYNC_SAMPLES = 5;
+const CLOCK_SYNC_SPACING_MS = 500;
+// Clocks drift, so the offset is re-estimated this often
+const CLOCK_SYNC_INTERVAL_MS = 5 * 60 * 1000;
+// How often the countdown re-renders; it reads the clock each time so never drifts
+const COUNTDOWN_TICK_MS = 250;
 
 export class AuctionWebSocket {
   constructor(websocketUrl, auctionId, userId, userName) {
@@ -23,6 +41,17 @@ export class AuctionWebSocket {
     this.topBid = 0;
     this.topBidUser = "";
     this.connectionId = null; // Store the connection ID received from the server
+    // Leaderboard state kept in sync by leaderboardDelta messages
+    this.leaderboardEntries = new Map(); // user_id -> entry
+    this.leaderboardVersion = null;
+    this.leaderboardRows = new Map(); // user_id -> table row
+    this.snapshotRequested = false;
+    // Last auction event sequence number seen, sent back when resuming
+    this.lastSeq = null;
+    this.reconnectAttempts = 0;
+    this.closedByClient = false;
+    this.bestPingRttMs = Infinity;
+    this.clockSyncTimer = null;
   }
 
   connect() {
@@ -32,25 +61,57 @@ export class AuctionWebSocket {
 
     this.socket.onopen = () => {
       console.log("WebSocket connection established.");
-      this.sendMessage("create", {
-        auction_id: this.auctionId,
-        user_id: this.userId,
-      });
+      this.reconnectAttempts = 0;
+      if (this.lastSeq != null) {
+        // Only the events after lastSeq are replayed, or a snapshot if too old
+        this.sendMessage("resume", {
+          auction_id: this.auctionId,
+          user_id: this.userId,
+          last_seq: this.lastSeq,
+          format: WIRE_FORMAT,
+        });
+      } else {
+        this.sendMessage("create", {
+          auction_id: this.auctionId,
+          user_id: this.userId,
+          format: WIRE_FORMAT,
+        });
+      }
+      this.syncClock();
+      clearInterval(this.clockSyncTimer);
+      this.clockSyncTimer = setInterval(
+        () => this.syncClock(),
+        CLOCK_SYNC_INTERVAL_MS
+      );
     };
 
     this.socket.onmessage = (event) => {
-      const message = JSON.parse(event.data);
+      const message = decodeMessage(event.data);
+      if (message.type === "pong") {
+        this.applyPong(message);
+        return;
+      }
       console.log("Message received from server:", message);
-      let remaining_time = message.remaining_time;
+      if (message.seq != null) {
+        if (
+          this.lastSeq != null &&
+          message.seq <= this.lastSeq &&
+          message.type !== "leaderboardUpdate"
+        ) {
+          return; // Replayed event that was already applied
+        }
+        this.lastSeq = Math.max(this.lastSeq ?? 0, message.seq);
+      }
+      let auction_end_ms = message.auction_end_ms;
       let auction_status = message.auction_status;
       let type = message.type;
 
-      if (message.statusCode == 200 && message.body) {
-        const message_body = JSON.parse(message.body);
+      const message_body = statusBody(message);
+      if (message_body) {
         console.log("Message received in body" + message_body);
         if (message_body.auction_status == 'SNIPED') {
           console.log("Snipe prevented");
-          remaining_time = message_body.remaining_time;
+          auction_end_ms = message_body.auction_end_ms;
           auction_status = message_body.auction_status;
           type = message_body.type;
           let remaining_snipes = message_body.remaining_snipes;
@@ -61,7 +122,7 @@ export class AuctionWebSocket {
         }
         if (message_body.auction_status == 'STARTED') {
           console.log("Auction Started");
-          remaining_time = message_body.remaining_time;
+          auction_end_ms = message_body.auction_end_ms;
           auction_status = message_body.auction_status;
           type = message_body.type;
           clearInterval(interval);
@@ -78,22 +139,9 @@ export class AuctionWebSocket {
         console.log(`Connection ID set: ${this.connectionId}`);
       }
 
-      if (remaining_time) {
-        const remainingTime = remaining_time;
-        console.log("Updating new time" + remaining_time);
-        // Update UI
-        remainingTimeElement.textContent = remainingTime;
-        if (remainingTime != "Auction has ended") {
-          // Parse the remaining time into seconds for countdown logic
-          const timeParts = remainingTime.split(":");
-          const hours = parseInt(timeParts[0], 10);
-          const minutes = parseInt(timeParts[1], 10);
-          const seconds = parseInt(timeParts[2], 10);
-          let totalSeconds = hours * 3600 + minutes * 60 + seconds;
-
-          // Start countdown
-          startCountdown(totalSeconds);
-        }
+      if (auction_end_ms) {
+        console.log("Updating end time " + auction_end_ms);
+        startCountdown(auction_end_ms);
       }
 
       if (auction_status == "STARTED" || auction_status == "SNIPED") {
@@ -130,7 +178,9 @@ export class AuctionWebSocket {
       }
 
       if (type === "leaderboardUpdate") {
-        this.updateLeaderboard(message.leaderboard);
+        this.applyLeaderboardSnapshot(message);
+      } else if (type === "leaderboardDelta") {
+        this.applyLeaderboardDelta(message);
       } else if (type === "error") {
         console.error("Server error:", message.error);
       }
@@ -142,9 +192,47 @@ export class AuctionWebSocket {
 
     this.socket.onclose = () => {
       console.log("WebSocket connection closed.");
+      clearInterval(this.clockSyncTimer);
+      if (!this.closedByClient) {
+        this.scheduleReconnect();
+      }
     };
   }
 
+  scheduleReconnect() {
+    const delay =
+      Math.random() *
+      Math.min(MAX_RECONNECT_DELAY_MS, 500 * 2 ** this.reconnectAttempts);
+    this.reconnectAttempts += 1;
+    console.log(`Reconnecting in ${Math.round(delay)} ms`);
+    setTimeout(() => this.connect(), delay);
+  }
+
+  // Send a burst of pings; applyPong keeps the lowest round trip's estimate
+  syncClock() {
+    this.bestPingRttMs = Infinity;
+    for (let i = 0; i < CLOCK_SYNC_SAMPLES; i++) {
+      setTimeout(() => {
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+          this.socket.send(
+            JSON.stringify({ action: "ping", client_ms: Date.now() })
+          );
+        }
+      }, i * CLOCK_SYNC_SPACING_MS);
+    }
+  }
+
+  applyPong(message) {
+    const now = Date.now();
+    const rtt = now - message.client_ms;
+    if (!(rtt >= 0) || rtt >= this.bestPingRttMs) {
+      return;
+    }
+    // The server read its clock about halfway through the round trip
+    this.bestPingRttMs = rtt;
+    clockOffsetMs = message.server_ms + rtt / 2 - now;
+  }
+
   sendMessage(action, data) {
     if (this.socket && this.socket.readyState === WebSocket.OPEN) {
       const message = { action, ...data };
@@ -155,13 +243,62 @@ export class AuctionWebSocket {
     }
   }
 
+  applyLeaderboardSnapshot(message) {
+    // Any snapshot answers the pending request, even one that is ignored
+    this.snapshotRequested = false;
+    if (
+      message.version != null &&
+      this.leaderboardVersion != null &&
+      message.version < this.leaderboardVersion
+    ) {
+      return; // Older than the deltas already applied
+    }
+    this.leaderboardEntries = new Map(
+      message.leaderboard.map((entry) => [entry.user_id, entry])
+    );
+    this.leaderboardVersion = message.version;
+    this.updateLeaderboard(message.leaderboard);
+  }
+
+  applyLeaderboardDelta(message) {
+    if (
+      this.leaderboardVersion != null &&
+      message.version <= this.leaderboardVersion
+    ) {
+      return; // Already applied
+    }
+    if (message.base_version !== this.leaderboardVersion) {
+      // A version was missed, only a full snapshot can resync
+      this.requestLeaderboardSnapshot();
+      return;
+    }
+    message.removed.forEach((userId) => this.leaderboardEntries.delete(userId));
+    message.changed.forEach((entry) =>
+      this.leaderboardEntries.set(entry.user_id, entry)
+    );
+    this.leaderboardVersion = message.version;
+    this.updateLeaderboard(rankLeaderboard(this.leaderboardEntries.values()));
+  }
+
+  requestLeaderboardSnapshot() {
+    if (this.snapshotRequested) {
+      return;
+    }
+    this.snapshotRequested = true;
+    this.sendMessage("leaderboardSnapshot", {
+      auction_id: this.auctionId,
+      format: WIRE_FORMAT,
+    });
+  }
+
   updateLeaderboard(leaderboard) {
     const tableBody = document.querySelector(".leaderboard tbody");
-    tableBody.innerHTML = ""; // Clear current leaderboard
 
     console.log("Leaderboard updated:", leaderboard);
 
     if (leaderboard.length === 0) {
+      tableBody.innerHTML = ""; // Clear current leaderboard
+      this.leaderboardRows.clear();
       const row = document.createElement("tr");
       row.classList.add("no-bids-row");
       row.innerHTML = `
@@ -189,16 +326,36 @@ export class AuctionWebSocket {
       "top-bid"
     ).textContent = `${leaderboard[0]["bid_amount"]}`;
 
-    leaderboard.forEach((entry, index) => {
-      const row = document.createElement("tr");
+    if (this.leaderboardRows.size === 0) {
+      tableBody.innerHTML = ""; // Drop the placeholder or server-rendered rows
+    }
 
-      row.innerHTML = `
-        <td>${index + 1}</td>
-        <td>${entry.user_name}</td>
-        <td>$${entry.bid_amount}</td>
-        <td>${new Date(entry.timestamp * 1000).toLocaleString()}</td>
-      `;
-      tableBody.appendChild(row);
+    // Reuse each bidder's row and only touch rows whose rank or bid changed
+    const present = new Set();
+    leaderboard.forEach((entry, index) => {
+      present.add(entry.user_id);
+      let row = this.leaderboardRows.get(entry.user_id);
+      if (!row) {
+        row = document.createElement("tr");
+        row.innerHTML = "<td></td><td></td><td></td><td></td>";
+        this.leaderboardRows.set(entry.user_id, row);
+      }
+      setCellText(row.children[0], `${index + 1}`);
+      setCellText(row.children[1], `${entry.user_name}`);
+      setCellText(row.children[2], `$${entry.bid_amount}`);
+      setCellText(
+        row.children[3],
+        new Date(entry.timestamp * 1000).toLocaleString()
+      );
+      if (tableBody.children[index] !== row) {
+        tableBody.insertBefore(row, tableBody.children[index] || null);
+      }
+    });
+    this.leaderboardRows.forEach((row, userId) => {
+      if (!present.has(userId)) {
+        row.remove();
+        this.leaderboardRows.delete(userId);
+      }
     });
 
     this.topBid = leaderboard[0].bid_amount;
@@ -223,6 +380,7 @@ export class AuctionWebSocket {
   }
 
   disconnect() {
+    this.closedByClient = true;
     if (this.socket) {
       this.socket.close();
       console.log("WebSocket disconnected.");
@@ -230,28 +388,93 @@ export class AuctionWebSocket {
   }
 }
 
-// Countdown logic to update time every second
-function startCountdown(totalSeconds) {
-  interval = setInterval(() => {
-    if (totalSeconds <= 0) {
-      clearInterval(interval);
-      remainingTimeElement.textContent = "Time is up!";
-      bidButtonsDiv.style.display = "none";
-      return;
-    }
+// Expand compact messages to the JSON schema the handlers work with
+function decodeMessage(data) {
+  const message = JSON.parse(data);
+  switch (message.t) {
+    case "lb":
+      return {
+        type: "leaderboardUpdate",
+        auction_id: message.a,
+        version: message.v,
+        leaderboard: message.e.map(expandEntry),
+        seq: message.seq,
+      };
+    case "ld":
+      return {
+        type: "leaderboardDelta",
+        auction_id: message.a,
+        base_version: message.b,
+        version: message.v,
+        changed: message.c,
+        removed: message.r,
+        seq: message.seq,
+      };
+    default:
+      return message;
+  }
+}
 
-    totalSeconds--;
+function expandEntry(row) {
+  const entry = {};
+  ENTRY_FIELDS.forEach((field, index) => {
+    entry[field] = row[index];
+  });
+  return entry;
+}
 
-    // Calculate hours, minutes, and seconds
-    const hours = Math.floor(totalSeconds / 3600);
-    const minutes = Math.floor((totalSeconds % 3600) / 60);
-    const seconds = totalSeconds % 60;
+// Status changes: flat in the compact format, a JSON string body in JSON
+function statusBody(message) {
+  if (message.t === "st") {
+    return message;
+  }
+  if (message.statusCode == 200 && message.body) {
+    return JSON.parse(message.body);
+  }
+  return null;
+}
 
-    // Update UI
-    remainingTimeElement.textContent = `${hours
-      .toString()
-      .padStart(2, "0")}:${minutes.toString().padStart(2, "0")}:${seconds
+// Same order as the server: highest bid first, earliest bid first on ties
+function rankLeaderboard(entries) {
+  return [...entries].sort(
+    (a, b) => b.bid_amount - a.bid_amount || a.timestamp - b.timestamp
+  );
+}
+
+function setCellText(cell, text) {
+  if (cell.textContent !== text) {
+    cell.textContent = text;
+  }
+}
+
+// Count down to the auction end on the server's clock
+function startCountdown(endMs) {
+  auctionEndMs = endMs;
+  clearInterval(interval);
+  renderCountdown();
+  interval = setInterval(renderCountdown, COUNTDOWN_TICK_MS);
+}
+
+function renderCountdown() {
+  const remainingMs = auctionEndMs - (Date.now() + clockOffsetMs);
+  if (remainingMs <= 0) {
+    clearInterval(interval);
+    remainingTimeElement.textContent = "Time is up!";
+    bidButtonsDiv.style.display = "none";
+    return;
+  }
+
+  // Calculate hours, minutes, and seconds
+  const totalSeconds = Math.ceil(remainingMs / 1000);
+  const hours = Math.floor(totalSeconds / 3600);
+  const minutes = Math.floor((totalSeconds % 3600) / 60);
+  const seconds = totalSeconds % 60;
+
+  // Update UI
+  setCellText(
+    remainingTimeElement,
+    `${hours.toString().padStart(2, "0")}:${minutes
       .toString()
-      .padStart(2, "0")}`;
-  }, 1000);
-}
\ No newline at end of file
+      .padStart(2, "0")}:${seconds.toString().padStart(2, "0")}`
+  );
+}
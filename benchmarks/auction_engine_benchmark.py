@@ -0,0 +1,115 @@
+"""
+Benchmark the pure-Python auction_engine hot paths without AWS.
+
+Replays a synthetic bid stream through the per-bid AuctionEngine checks the
+bid Lambda makes (validation, acceptance, snipe extension) and reports
+bids/sec and decision-latency percentiles, plus the cost of the top-K merge
+the priority queue consumer runs per SQS batch.
+
+    python benchmarks/auction_engine_benchmark.py --bids 200000 --bidders 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(__file__), "..", "lambda_functions", "WebSocketBidActions"
+    ),
+)
+
+from auction_engine import (  # noqa: E402
+    AuctionEngine,
+    merge_top_entries,
+    rank_leaderboard,
+)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(bids, bidders, top_size, batch_size, seed):
+    rng = random.Random(seed)
+    engine = AuctionEngine(
+        "bench",
+        end_ms=10**13,
+        snipes_remaining=10,
+        increment_ms=60000,
+        window_ms=30000,
+    )
+    users = [(f"user-{i}", f"User {i}") for i in range(bidders)]
+    stream = []
+    amount = 100.0
+    for timestamp in range(bids):
+        user_id, user_name = users[rng.randrange(bidders)]
+        amount += rng.choice((0.5, 1.0, 2.5))
+        stream.append((user_id, user_name, round(amount, 2), timestamp))
+
+    latencies_us = []
+    started = time.perf_counter()
+    for user_id, user_name, bid_amount, timestamp in stream:
+        t0 = time.perf_counter()
+        if AuctionEngine.is_valid_amount(bid_amount) and engine.accepts_bids(timestamp):
+            engine.snipe_extension(timestamp)
+        latencies_us.append((time.perf_counter() - t0) * 1e6)
+    elapsed = time.perf_counter() - started
+
+    # Top-K merge as done by the consumer once per SQS batch; the result must
+    # match ranking every bidder's latest bid from scratch
+    latest = {}
+    top = []
+    merge_latencies_us = []
+    for offset in range(0, len(stream), batch_size):
+        batch = [
+            {
+                "user_id": user_id,
+                "user_name": user_name,
+                "bid_amount": bid_amount,
+                "timestamp": timestamp,
+            }
+            for user_id, user_name, bid_amount, timestamp in stream[
+                offset : offset + batch_size
+            ]
+        ]
+        t0 = time.perf_counter()
+        top, _ = merge_top_entries(top, batch, top_size)
+        merge_latencies_us.append((time.perf_counter() - t0) * 1e6)
+        latest.update((bid["user_id"], bid) for bid in batch)
+
+    return {
+        "bids": bids,
+        "bidders": bidders,
+        "top_size": top_size,
+        "batch_size": batch_size,
+        "bids_per_sec": round(bids / elapsed),
+        "decide_p50_us": round(percentile(latencies_us, 50), 2),
+        "decide_p99_us": round(percentile(latencies_us, 99), 2),
+        "merge_p50_us": round(percentile(merge_latencies_us, 50), 2),
+        "merge_p99_us": round(percentile(merge_latencies_us, 99), 2),
+        "leaderboard_matches": rank_leaderboard(latest.values())[:top_size] == top,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bids", type=int, default=100000)
+    parser.add_argument("--bidders", type=int, default=1000)
+    parser.add_argument("--top-size", type=int, default=25)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    result = run(args.bids, args.bidders, args.top_size, args.batch_size, args.seed)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
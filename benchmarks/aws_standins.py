@@ -0,0 +1,423 @@
+"""
+In-process stand-ins for the AWS services the bid path talks to.
+
+They implement just enough of SQS, DynamoDB (resource API), the API Gateway
+Management API and Lambda for the real handler modules to run unchanged,
+and count every call so a benchmark can report AWS calls per bid.
+"""
+
+import copy
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from boto3.dynamodb.conditions import ConditionBase
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+serializer = TypeSerializer()
+
+
+def client_error(code, operation, message="", **extra):
+    return ClientError(
+        {"Error": {"Code": code, "Message": message}, **extra}, operation
+    )
+
+
+class AwsCallCounter:
+    def __init__(self, latency_ms=0.0):
+        self.calls = Counter()
+        self.latency_s = latency_ms / 1000
+        self._lock = threading.Lock()
+
+    def record(self, service, operation):
+        with self._lock:
+            self.calls[f"{service}.{operation}"] += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.calls)
+
+
+def evaluate_condition(condition, item, values=None):
+    """
+    Evaluate a boto3 condition object or a simple condition string.
+    """
+    if condition is None:
+        return True
+    if isinstance(condition, ConditionBase):
+        return _evaluate_boto3(condition, item)
+    return _evaluate_string(condition, item, values or {})
+
+
+def _evaluate_boto3(condition, item):
+    expression = condition.get_expression()
+    operator = expression["operator"]
+    operands = expression["values"]
+    if operator == "AND":
+        return all(_evaluate_boto3(operand, item) for operand in operands)
+    if operator == "OR":
+        return any(_evaluate_boto3(operand, item) for operand in operands)
+    name = operands[0].name
+    if operator == "attribute_not_exists":
+        return name not in item
+    if operator == "attribute_exists":
+        return name in item
+    if name not in item:
+        return False
+    return _compare(item[name], operator, operands[1], operands[2:])
+
+
+def _compare(actual, operator, expected, extra=()):
+    if operator == "=":
+        return actual == expected
+    if operator == "<>":
+        return actual != expected
+    if operator == "<":
+        return actual < expected
+    if operator == "<=":
+        return actual <= expected
+    if operator == ">":
+        return actual > expected
+    if operator == ">=":
+        return actual >= expected
+    if operator == "BETWEEN":
+        return expected <= actual <= extra[0]
+    if operator == "begins_with":
+        return str(actual).startswith(expected)
+    raise NotImplementedError(operator)
+
+
+def _evaluate_string(condition, item, values):
+    return any(
+        _evaluate_conjunction(alternative, item, values)
+        for alternative in re.split(r"\s+OR\s+", condition.strip())
+    )
+
+
+def _evaluate_conjunction(condition, item, values):
+    for clause in re.split(r"\s+AND\s+", condition.strip()):
+        match = re.fullmatch(r"attribute_(not_)?exists\((\w+)\)", clause)
+        if match:
+            exists = match.group(2) in item
+            if exists == bool(match.group(1)):
+                return False
+            continue
+        match = re.fullmatch(r"(\w+)\s+IN\s+\(([^)]*)\)", clause)
+        if match:
+            options = [values[v.strip()] for v in match.group(2).split(",")]
+            if item.get(match.group(1)) not in options:
+                return False
+            continue
+        match = re.fullmatch(r"(\w+)\s*(=|<>|<=|>=|<|>)\s*(:\w+)", clause)
+        if not match:
+            raise NotImplementedError(clause)
+        name, operator, placeholder = match.groups()
+        if name not in item or not _compare(item[name], operator, values[placeholder]):
+            return False
+    return True
+
+
+def apply_update(item, update_expression, values):
+    """
+    Apply a SET/ADD/REMOVE update expression to an item in place.
+    """
+    for action, body in re.findall(
+        r"(SET|ADD|REMOVE)\s+(.*?)(?=\s+(?:SET|ADD|REMOVE)\s+|$)", update_expression
+    ):
+        # Split on commas that are not inside function arguments
+        clauses = re.split(r",(?![^()]*\))", body)
+        for clause in [c.strip() for c in clauses if c.strip()]:
+            if action == "REMOVE":
+                item.pop(clause, None)
+                continue
+            if action == "ADD":
+                name, placeholder = clause.split()
+                item[name] = item.get(name, 0) + values[placeholder]
+                continue
+            name, expression = [part.strip() for part in clause.split("=", 1)]
+            item[name] = _evaluate_operand(expression, item, values)
+
+
+def _evaluate_operand(expression, item, values):
+    match = re.fullmatch(r"if_not_exists\((\w+),\s*(:\w+)\)", expression)
+    if match:
+        return item.get(match.group(1), values[match.group(2)])
+    match = re.fullmatch(r"(\S+)\s*([+-])\s*(\S+)", expression)
+    if match:
+        left = _evaluate_operand(match.group(1), item, values)
+        right = _evaluate_operand(match.group(3), item, values)
+        return left + right if match.group(2) == "+" else left - right
+    if expression.startswith(":"):
+        return values[expression]
+    return item[expression]
+
+
+class FakeTable:
+    def __init__(self, name, hash_key, range_key=None, indexes=None, counter=None):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        # index name -> hash key attribute of the index
+        self.indexes = indexes or {}
+        self.counter = counter
+        self.items = {}
+        self._lock = threading.RLock()
+
+    def _key(self, key):
+        if self.range_key:
+            return (key[self.hash_key], key[self.range_key])
+        return (key[self.hash_key],)
+
+    def _record(self, operation):
+        if self.counter:
+            self.counter.record("dynamodb", operation)
+
+    def get_item(self, Key, ConsistentRead=False, **kwargs):
+        self._record("GetItem")
+        with self._lock:
+            item = self.items.get(self._key(Key))
+            return {"Item": copy.deepcopy(item)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, **kwargs):
+        self._record("PutItem")
+        with self._lock:
+            key = self._key(Item)
+            current = self.items.get(key, {})
+            if not evaluate_condition(
+                ConditionExpression, current, kwargs.get("ExpressionAttributeValues")
+            ):
+                raise client_error("ConditionalCheckFailedException", "PutItem")
+            self.items[key] = copy.deepcopy(Item)
+        return {}
+
+    def delete_item(self, Key, ConditionExpression=None, **kwargs):
+        self._record("DeleteItem")
+        with self._lock:
+            key = self._key(Key)
+            current = self.items.get(key, {})
+            if not evaluate_condition(
+                ConditionExpression, current, kwargs.get("ExpressionAttributeValues")
+            ):
+                raise client_error("ConditionalCheckFailedException", "DeleteItem")
+            self.items.pop(key, None)
+        return {}
+
+    def update_item(
+        self,
+        Key,
+        UpdateExpression,
+        ConditionExpression=None,
+        ExpressionAttributeValues=None,
+        ReturnValues="NONE",
+        ReturnValuesOnConditionCheckFailure="NONE",
+        **kwargs,
+    ):
+        self._record("UpdateItem")
+        values = ExpressionAttributeValues or {}
+        with self._lock:
+            key = self._key(Key)
+            current = self.items.get(key)
+            item = copy.deepcopy(current) if current else dict(Key)
+            if not evaluate_condition(ConditionExpression, current or {}, values):
+                extra = {}
+                if ReturnValuesOnConditionCheckFailure == "ALL_OLD" and current:
+                    extra["Item"] = {
+                        k: serializer.serialize(v) for k, v in current.items()
+                    }
+                raise client_error(
+                    "ConditionalCheckFailedException", "UpdateItem", **extra
+                )
+            apply_update(item, UpdateExpression, values)
+            self.items[key] = item
+            if ReturnValues in ("ALL_NEW", "UPDATED_NEW"):
+                return {"Attributes": copy.deepcopy(item)}
+            if ReturnValues == "ALL_OLD":
+                return {"Attributes": copy.deepcopy(current or {})}
+        return {}
+
+    def query(
+        self,
+        KeyConditionExpression,
+        IndexName=None,
+        ExclusiveStartKey=None,
+        ProjectionExpression=None,
+        Limit=None,
+        FilterExpression=None,
+        **kwargs,
+    ):
+        self._record("Query")
+        with self._lock:
+            items = [
+                copy.deepcopy(item)
+                for item in self.items.values()
+                if evaluate_condition(KeyConditionExpression, item)
+                and evaluate_condition(
+                    FilterExpression, item, kwargs.get("ExpressionAttributeValues")
+                )
+            ]
+        sort_key = self.range_key if not IndexName else None
+        if sort_key:
+            items.sort(key=lambda item: item.get(sort_key))
+        else:
+            items.sort(key=lambda item: str(self._key(item)))
+        if ExclusiveStartKey:
+            start = self._key(ExclusiveStartKey)
+            keys = [self._key(item) for item in items]
+            items = items[keys.index(start) + 1 :] if start in keys else []
+        response = {}
+        if Limit and len(items) > Limit:
+            items = items[:Limit]
+            response["LastEvaluatedKey"] = {
+                name: items[-1][name]
+                for name in (self.hash_key, self.range_key)
+                if name
+            }
+        if ProjectionExpression:
+            aliases = kwargs.get("ExpressionAttributeNames") or {}
+            names = [
+                aliases.get(name.strip(), name.strip())
+                for name in ProjectionExpression.split(",")
+            ]
+            items = [{n: item[n] for n in names if n in item} for item in items]
+        response.update({"Items": items, "Count": len(items)})
+        return response
+
+    def scan(self, FilterExpression=None, ExpressionAttributeValues=None, **kwargs):
+        self._record("Scan")
+        with self._lock:
+            items = [
+                copy.deepcopy(item)
+                for item in self.items.values()
+                if evaluate_condition(FilterExpression, item, ExpressionAttributeValues)
+            ]
+        return {"Items": items, "Count": len(items)}
+
+    def batch_writer(self, **kwargs):
+        return _FakeBatchWriter(self)
+
+
+class _FakeBatchWriter:
+    def __init__(self, table):
+        self.table = table
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for offset in range(0, len(self.pending), 25):
+            self.table._record("BatchWriteItem")
+            with self.table._lock:
+                for operation, payload in self.pending[offset : offset + 25]:
+                    if operation == "delete":
+                        self.table.items.pop(self.table._key(payload), None)
+                    else:
+                        self.table.items[self.table._key(payload)] = payload
+        return False
+
+    def delete_item(self, Key):
+        self.pending.append(("delete", Key))
+
+    def put_item(self, Item):
+        self.pending.append(("put", Item))
+
+
+class FakeDynamoDB:
+    def __init__(self, counter):
+        self.counter = counter
+        self.tables = {}
+
+    def add_table(self, name, hash_key, range_key=None, indexes=None):
+        self.tables[name] = FakeTable(name, hash_key, range_key, indexes, self.counter)
+        return self.tables[name]
+
+    def Table(self, name):
+        return self.tables[name]
+
+
+class FakeSQS:
+    class exceptions:
+        class QueueDoesNotExist(Exception):
+            pass
+
+    def __init__(self, counter):
+        self.counter = counter
+        self.queues = {}
+        self._lock = threading.Lock()
+
+    def create_fifo_queue(self, name):
+        url = f"https://sqs.local/000000000000/{name}"
+        self.queues[url] = deque()
+        return url
+
+    def get_queue_url(self, QueueName):
+        self.counter.record("sqs", "GetQueueUrl")
+        url = f"https://sqs.local/000000000000/{QueueName}"
+        if url not in self.queues:
+            raise self.exceptions.QueueDoesNotExist(QueueName)
+        return {"QueueUrl": url}
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        self.counter.record("sqs", "SendMessage")
+        with self._lock:
+            self.queues[QueueUrl].append((time.perf_counter(), MessageBody))
+        return {"MessageId": "local"}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self.counter.record("sqs", "SendMessageBatch")
+        with self._lock:
+            for entry in Entries:
+                self.queues[QueueUrl].append(
+                    (time.perf_counter(), entry["MessageBody"])
+                )
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries]}
+
+    def receive_batch(self, queue_url, max_messages):
+        """
+        Pop up to max_messages in order; stands in for the Lambda poller.
+        """
+        with self._lock:
+            queue = self.queues[queue_url]
+            return [queue.popleft() for _ in range(min(max_messages, len(queue)))]
+
+    def depth(self, queue_url):
+        with self._lock:
+            return len(self.queues[queue_url])
+
+
+class FakeApiGateway:
+    class exceptions:
+        class GoneException(ClientError):
+            pass
+
+    def __init__(self, counter, gone_connections=()):
+        self.counter = counter
+        self.gone_connections = set(gone_connections)
+        self.messages = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def post_to_connection(self, ConnectionId, Data):
+        self.counter.record("apigateway", "PostToConnection")
+        if ConnectionId in self.gone_connections:
+            raise self.exceptions.GoneException(
+                {"Error": {"Code": "GoneException", "Message": "Gone"}},
+                "PostToConnection",
+            )
+        with self._lock:
+            self.messages[ConnectionId] += 1
+            self.bytes_sent += len(Data)
+        return {}
+
+
+class FakeLambda:
+    def __init__(self, counter):
+        self.counter = counter
+
+    def invoke(self, **kwargs):
+        self.counter.record("lambda", "Invoke")
+        return {"StatusCode": 202}
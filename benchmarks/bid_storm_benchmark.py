@@ -0,0 +1,365 @@
+"""
+Replay a synthetic bid storm through the real bid-path Lambda handlers.
+
+Bids go through WebSocketBidsAction.lambda_handler into the auction's FIFO
+queue, are drained in SQS-sized batches by
+WebSocketProcessPriorityQueue.lambda_handler and broadcast to every viewer.
+SQS, DynamoDB, Lambda and the API Gateway Management API are in-process
+stand-ins (see aws_standins.py) that count every call; --aws-latency-ms adds
+a fixed delay per call to approximate network round trips.
+
+Reports bids/sec, ingress latency, queue lag, enqueue-to-broadcast latency
+percentiles and AWS calls per bid as JSON.
+
+    python benchmarks/bid_storm_benchmark.py --bids 2000 --viewers 500 --rate 200
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import boto3
+
+from aws_standins import (
+    AwsCallCounter,
+    FakeApiGateway,
+    FakeDynamoDB,
+    FakeLambda,
+    FakeSQS,
+)
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), "..", "lambda_functions")
+AUCTION_ID = "bid-storm"
+SHARED_QUEUE_URL = "https://sqs.local/000000000000/AuctionBids-0.fifo"
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AUCTION_CONNECTIONS_TABLE", "auction-connections")
+os.environ.setdefault("USER_CONNECTIONS_TABLE", "user-connections")
+os.environ.setdefault("LEADERBOARD_TABLE", "AuctionLeaderboards")
+os.environ.setdefault("LEADERBOARD_TOP_TABLE", "AuctionLeaderboardTop")
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples_ms):
+    return {
+        f"p{pct}": round(percentile(samples_ms, pct), 3) if samples_ms else None
+        for pct in (50, 95, 99)
+    }
+
+
+def build_environment(counter, viewers, gone_ratio, rng, wire_format="json"):
+    """
+    Create the stand-in services and seed the auction, its queue and viewers.
+    """
+    dynamodb = FakeDynamoDB(counter)
+    dynamodb.add_table("auction-connections", "auction_id")
+    dynamodb.add_table(
+        "user-connections",
+        "connection_id",
+        "auction_id",
+        indexes={"auction_id-index": "auction_id"},
+    )
+    dynamodb.add_table("AuctionLeaderboards", "auction_id", "user_id")
+    dynamodb.add_table("AuctionLeaderboardTop", "auction_id")
+    dynamodb.add_table("bid-coalesce", "auction_id", "user_id")
+    dynamodb.add_table("auction-events", "auction_id", "seq")
+
+    sqs = FakeSQS(counter)
+    if os.getenv("BID_QUEUE_MODE") == "shared":
+        queue_url = sqs.create_fifo_queue(SHARED_QUEUE_URL.rsplit("/", 1)[1])
+    else:
+        queue_url = sqs.create_fifo_queue(f"AuctionActionsQueue-{AUCTION_ID}.fifo")
+
+    connection_ids = [f"conn-{i}" for i in range(viewers)]
+    gone = [c for c in connection_ids if rng.random() < gone_ratio]
+    services = {
+        "sqs": sqs,
+        "dynamodb": dynamodb,
+        "lambda": FakeLambda(counter),
+        "apigatewaymanagementapi": FakeApiGateway(counter, gone),
+    }
+
+    now = datetime.now(timezone.utc)
+    dynamodb.Table("auction-connections").items[(AUCTION_ID,)] = {
+        "auction_id": AUCTION_ID,
+        "auction_status": "STARTED",
+        "auction_start_time": (now - timedelta(minutes=1)).isoformat(),
+        "auction_end_time": (now + timedelta(hours=1)).isoformat(),
+        "snipes_remaining": 0,
+        "default_time_increment": 1,
+        "default_time_increment_before": 1,
+    }
+    user_connections = dynamodb.Table("user-connections")
+    for connection_id in connection_ids:
+        user_connections.items[(connection_id, AUCTION_ID)] = {
+            "connection_id": connection_id,
+            "auction_id": AUCTION_ID,
+            "format": wire_format,
+        }
+    return services, queue_url
+
+
+def load_handlers(services):
+    """
+    Import the real handler modules with boto3 pointed at the stand-ins.
+    """
+    for name in ("WebSocketBidActions", "WebSocketProcessPriorityQueue"):
+        sys.path.insert(0, os.path.join(LAMBDA_DIR, name))
+
+    original_client, original_resource = boto3.client, boto3.resource
+    boto3.client = lambda service, *args, **kwargs: services[service]
+    boto3.resource = lambda service, *args, **kwargs: services[service]
+    try:
+        import scheduler_helper
+        import WebSocketBidsAction
+        import WebSocketProcessPriorityQueue
+    finally:
+        boto3.client, boto3.resource = original_client, original_resource
+
+    scheduler_helper._default_store = scheduler_helper.InMemoryScheduleStore()
+    return (
+        WebSocketBidsAction.lambda_handler,
+        WebSocketProcessPriorityQueue.lambda_handler,
+        scheduler_helper,
+    )
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    if args.shared_queue:
+        os.environ["BID_QUEUE_MODE"] = "shared"
+        os.environ["SHARED_BID_QUEUE_URLS"] = SHARED_QUEUE_URL
+    os.environ["BROADCAST_CONFLATION"] = args.conflation
+    os.environ["BROADCAST_MAX_PER_SECOND"] = str(args.broadcasts_per_sec)
+    if args.coalesce_window_ms:
+        os.environ["BID_COALESCE_TABLE"] = "bid-coalesce"
+        os.environ["BID_COALESCE_WINDOW_MS"] = str(args.coalesce_window_ms)
+    counter = AwsCallCounter(args.aws_latency_ms)
+    services, queue_url = build_environment(
+        counter, args.viewers, args.gone_ratio, rng, args.wire_format
+    )
+    bid_handler, queue_handler, scheduler_helper = load_handlers(services)
+    sqs = services["sqs"]
+    api_gateway = services["apigatewaymanagementapi"]
+
+    users = [(f"user-{i}", f"User {i}") for i in range(args.bidders)]
+    amounts = [100.0]
+    amount_lock = threading.Lock()
+    ingress_ms = []
+    statuses = {}
+    producers_done = threading.Event()
+
+    def produce(count, rate):
+        interval = 1 / rate if rate else 0
+        next_at = time.perf_counter()
+        for _ in range(count):
+            if interval:
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_at += interval
+            user_id, user_name = users[rng.randrange(len(users))]
+            with amount_lock:
+                amounts[0] = round(amounts[0] + rng.choice((0.5, 1.0, 2.5)), 2)
+                bid_amount = amounts[0]
+            event = {
+                "action": "placeBid",
+                "auction_id": AUCTION_ID,
+                "user_id": user_id,
+                "user_name": user_name,
+                "bid_amount": bid_amount,
+            }
+            t0 = time.perf_counter()
+            response = bid_handler(event, None)
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            with amount_lock:
+                ingress_ms.append(elapsed_ms)
+                code = response["statusCode"]
+                statuses[code] = statuses.get(code, 0) + 1
+
+    queue_lag_ms = []
+    broadcast_ms = []
+    batches = [0]
+    scheduled = {}
+    schedule_store = scheduler_helper.get_default_store()
+
+    def fire_due_actions(until_ms):
+        # Fires the trailing broadcasts and bid flushes the Lambdas schedule,
+        # as AuctionScheduler does; trailing broadcasts go to the consumer,
+        # bid flushes to ingress
+        for entry in schedule_store.due(until_ms):
+            if not schedule_store.claim(entry):
+                continue
+            action = entry["action"]
+            scheduled[action] = scheduled.get(action, 0) + 1
+            handler = (
+                bid_handler if action == scheduler_helper.FLUSH_BIDS else queue_handler
+            )
+            handler({"auction_id": entry["auction_id"], "action": action}, None)
+
+    def consume():
+        while True:
+            fire_due_actions(scheduler_helper.now_ms())
+            messages = sqs.receive_batch(queue_url, args.batch_size)
+            if not messages:
+                if (
+                    producers_done.is_set()
+                    and not sqs.depth(queue_url)
+                    and not schedule_store.due(scheduler_helper.now_ms() + 10**6)
+                ):
+                    return
+                time.sleep(0.0005)
+                continue
+            dequeued_at = time.perf_counter()
+            queue_handler({"Records": [{"body": body} for _, body in messages]}, None)
+            broadcast_at = time.perf_counter()
+            batches[0] += 1
+            for enqueued_at, _ in messages:
+                queue_lag_ms.append((dequeued_at - enqueued_at) * 1000)
+                broadcast_ms.append((broadcast_at - enqueued_at) * 1000)
+
+    per_producer = [args.bids // args.producers] * args.producers
+    per_producer[0] += args.bids - sum(per_producer)
+    rate = args.rate / args.producers if args.rate else 0
+
+    logging.disable(logging.INFO)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        producers = [
+            threading.Thread(target=produce, args=(count, rate))
+            for count in per_producer
+        ]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        producers_done.set()
+        consumer.join()
+        elapsed = time.perf_counter() - started
+    logging.disable(logging.NOTSET)
+
+    accepted = statuses.get(200, 0)
+    calls = counter.snapshot()
+    total_calls = sum(calls.values())
+    return {
+        "config": {
+            "bids": args.bids,
+            "bidders": args.bidders,
+            "viewers": args.viewers,
+            "rate": args.rate,
+            "producers": args.producers,
+            "batch_size": args.batch_size,
+            "aws_latency_ms": args.aws_latency_ms,
+            "gone_ratio": args.gone_ratio,
+            "coalesce_window_ms": args.coalesce_window_ms,
+            "shared_queue": args.shared_queue,
+            "conflation": args.conflation,
+            "broadcasts_per_sec": args.broadcasts_per_sec,
+            "wire_format": args.wire_format,
+            "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "responses": {str(code): count for code, count in sorted(statuses.items())},
+        "bids_per_sec": round(accepted / elapsed, 1) if elapsed else None,
+        "messages_enqueued": len(broadcast_ms),
+        "consumer_batches": batches[0],
+        "scheduled_actions": dict(sorted(scheduled.items())),
+        "ingress_ms": summarize(ingress_ms),
+        "queue_lag_ms": summarize(queue_lag_ms),
+        "bid_to_broadcast_ms": summarize(broadcast_ms),
+        "broadcast_messages": sum(api_gateway.messages.values()),
+        "broadcast_bytes": api_gateway.bytes_sent,
+        "bytes_per_broadcast_message": (
+            round(api_gateway.bytes_sent / sum(api_gateway.messages.values()), 1)
+            if api_gateway.messages
+            else None
+        ),
+        "aws_calls": dict(sorted(calls.items())),
+        "aws_calls_per_bid": {
+            name: round(count / accepted, 3)
+            for name, count in sorted(calls.items())
+            if accepted
+        },
+        "aws_calls_per_bid_total": (
+            round(total_calls / accepted, 3) if accepted else None
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bids", type=int, default=1000)
+    parser.add_argument("--bidders", type=int, default=200)
+    parser.add_argument("--viewers", type=int, default=100)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Target bids/sec in total, 0 = unpaced"
+    )
+    parser.add_argument(
+        "--producers", type=int, default=4, help="Concurrent ingress invocations"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=10, help="SQS records per consumer batch"
+    )
+    parser.add_argument("--aws-latency-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--gone-ratio", type=float, default=0.0, help="Share of stale connections"
+    )
+    parser.add_argument(
+        "--coalesce-window-ms",
+        type=int,
+        default=0,
+        help="Enable per-user ingress coalescing with this window",
+    )
+    parser.add_argument(
+        "--shared-queue",
+        action="store_true",
+        help="Publish to a shared FIFO queue (BID_QUEUE_MODE=shared)",
+    )
+    parser.add_argument(
+        "--conflation",
+        choices=("auto", "on", "off"),
+        default="auto",
+        help="Leaderboard broadcast conflation mode (BROADCAST_CONFLATION)",
+    )
+    parser.add_argument(
+        "--broadcasts-per-sec",
+        type=float,
+        default=5,
+        help="Per-auction broadcast cap while conflating",
+    )
+    parser.add_argument(
+        "--wire-format",
+        choices=("json", "compact"),
+        default="json",
+        help="Wire format the viewers negotiated",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    args = parser.parse_args()
+
+    result = run(args)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+// Times the client-side decode of wire_format_benchmark.py payloads in node.
+// decodeMessage/statusBody mirror app/static/js/websocket.js.
+//
+//     node benchmarks/wire_decode.mjs payloads.json 20000 5
+import { readFileSync } from "fs";
+
+const ENTRY_FIELDS = ["user_id", "user_name", "bid_amount", "timestamp"];
+
+function expandEntry(row) {
+  const entry = {};
+  ENTRY_FIELDS.forEach((field, index) => {
+    entry[field] = row[index];
+  });
+  return entry;
+}
+
+function decodeMessage(data) {
+  const message = JSON.parse(data);
+  switch (message.t) {
+    case "lb":
+      return { leaderboard: message.e.map(expandEntry) };
+    case "ld":
+      return { changed: message.c };
+    case "st":
+      return message;
+    default:
+      if (message.statusCode == 200 && message.body) {
+        return JSON.parse(message.body);
+      }
+      return message;
+  }
+}
+
+const payloads = JSON.parse(readFileSync(process.argv[2], "utf-8"));
+const iterations = parseInt(process.argv[3] || "20000", 10);
+const rounds = parseInt(process.argv[4] || "5", 10);
+const results = {};
+for (const payload of Object.values(payloads)) {
+  for (let i = 0; i < Math.min(iterations, 2000); i++) {
+    decodeMessage(payload); // warm up the JIT
+  }
+}
+// Payloads are timed in interleaved rounds, keeping each one's best, so
+// JIT tiering and GC do not favour whichever payload runs first
+for (let round = 0; round < rounds; round++) {
+  for (const [name, payload] of Object.entries(payloads)) {
+    const started = process.hrtime.bigint();
+    for (let i = 0; i < iterations; i++) {
+      decodeMessage(payload);
+    }
+    const us = Number(process.hrtime.bigint() - started) / iterations / 1000;
+    results[name] = Math.min(results[name] ?? Infinity, us);
+  }
+}
+console.log(JSON.stringify(results));
@@ -0,0 +1,189 @@
+"""
+Compare the JSON and compact WebSocket wire formats.
+
+Encodes a leaderboard snapshot, a one-bid leaderboard delta and an auction
+status message in both formats with the real broadcast_helper encoders, and
+reports bytes per message plus client decode time. Decoding mirrors
+decodeMessage and statusBody in app/static/js/websocket.js (JSON parse, then
+expansion of compact rows); it runs in node (wire_decode.mjs) when node is on
+the PATH, otherwise a Python port of the decoder is timed instead.
+
+    python benchmarks/wire_format_benchmark.py --top-size 25 --iterations 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), "..", "lambda_functions")
+sys.path.insert(0, os.path.join(LAMBDA_DIR, "WebSocketProcessPriorityQueue"))
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from broadcast_helper import (  # noqa: E402
+    ENTRY_FIELDS,
+    WIRE_COMPACT,
+    WIRE_JSON,
+    encode_leaderboard_delta,
+    encode_leaderboard_message,
+    encode_status_message,
+)
+
+
+def expand_entry(row):
+    return dict(zip(ENTRY_FIELDS, row))
+
+
+def decode(data):
+    """
+    Python port of the client's decodeMessage + statusBody.
+    """
+    message = json.loads(data)
+    kind = message.get("t")
+    if kind == "lb":
+        return {"leaderboard": [expand_entry(row) for row in message["e"]]}
+    if kind == "ld":
+        return {"changed": message["c"]}
+    if message.get("statusCode") == 200 and message.get("body"):
+        return json.loads(message["body"])
+    return message
+
+
+def decode_us(payloads, iterations, rounds):
+    """
+    Time every payload with the Python decoder, in interleaved rounds keeping
+    each payload's best.
+    """
+    timings = {}
+    for _ in range(rounds):
+        for key, payload in payloads.items():
+            started = time.perf_counter()
+            for _ in range(iterations):
+                decode(payload)
+            us = (time.perf_counter() - started) / iterations * 1e6
+            timings[key] = min(timings.get(key, us), us)
+    return timings
+
+
+def build_messages(top_size, rng):
+    entries = []
+    amount = 1000.0
+    for i in range(top_size):
+        entries.append(
+            {
+                "user_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "user_name": f"Bidder {i}",
+                "bid_amount": round(amount, 2),
+                "timestamp": 1734000000 + i,
+            }
+        )
+        amount -= rng.choice((0.5, 1.0, 2.5))
+    status = {
+        "message": "Auction bench sniped",
+        "auction_status": "SNIPED",
+        "auction_end_time": "2024-12-12T18:30:00+00:00",
+        "auction_end_ms": 1734028200000,
+        "remaining_snipes": 2,
+    }
+    return {
+        "leaderboard_snapshot": lambda fmt: encode_leaderboard_message(
+            "bench", 42, entries, fmt
+        ),
+        "leaderboard_delta": lambda fmt: encode_leaderboard_delta(
+            "bench", 41, 42, entries[:1], [], fmt
+        ),
+        "status": lambda fmt: encode_status_message(status, fmt),
+    }
+
+
+def node_decode_us(payloads, iterations, rounds):
+    """
+    Time every payload with the JavaScript decoder; None without node.
+    """
+    node = shutil.which("node")
+    if not node:
+        return None
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(
+            {key: payload.decode("utf-8") for key, payload in payloads.items()}, f
+        )
+    try:
+        output = subprocess.run(
+            [
+                node,
+                os.path.join(os.path.dirname(__file__), "wire_decode.mjs"),
+                f.name,
+                str(iterations),
+                str(rounds),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    finally:
+        os.unlink(f.name)
+    return json.loads(output)
+
+
+def run(top_size, iterations, rounds, seed):
+    messages = build_messages(top_size, random.Random(seed))
+    payloads = {
+        f"{name}/{fmt}": encode(fmt)
+        for name, encode in messages.items()
+        for fmt in (WIRE_JSON, WIRE_COMPACT)
+    }
+    timings = node_decode_us(payloads, iterations, rounds)
+    decoder = "node" if timings else "python"
+    if timings is None:
+        timings = decode_us(payloads, iterations, rounds)
+
+    results = {}
+    for name in messages:
+        row = {}
+        for fmt in (WIRE_JSON, WIRE_COMPACT):
+            row[fmt] = {
+                "bytes": len(payloads[f"{name}/{fmt}"]),
+                "decode_us": round(timings[f"{name}/{fmt}"], 3),
+            }
+        row["bytes_saved_pct"] = round(
+            100 * (1 - row[WIRE_COMPACT]["bytes"] / row[WIRE_JSON]["bytes"]), 1
+        )
+        row["decode_saved_pct"] = round(
+            100 * (1 - row[WIRE_COMPACT]["decode_us"] / row[WIRE_JSON]["decode_us"]),
+            1,
+        )
+        results[name] = row
+    return {
+        "top_size": top_size,
+        "iterations": iterations,
+        "rounds": rounds,
+        "decoder": decoder,
+        "messages": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top-size", type=int, default=25)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="Best of this many timing rounds"
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(
+        json.dumps(
+            run(args.top_size, args.iterations, args.rounds, args.seed), indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,25 @@
-import time
 import boto3
 import pymysql
 import json
-from datetime import datetime, timezone
-from dateutil import parser
+from datetime import datetime
 import os
-from time_helper import calculate_remaining_time
-import logging
-from botocore.exceptions import ClientError
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-dynamodb = boto3.resource("dynamodb")
-eventbridge_client = boto3.client("events")
-lambda_client = boto3.client("lambda")
+from broadcast_helper import encode_status_message, post_pages_by_format
+from event_log_helper import append_event
+from connection_helper import iter_connection_pages
+from scheduler_helper import START_AUCTION, schedule_action
+from time_helper import now_ms, to_epoch_ms
+from metrics_helper import instrument_client, instrument_handler, timed
+from log_helper import get_logger, log_event
+
+logger = get_logger(__name__)
+
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+lambda_client = instrument_client(boto3.client("lambda"))
 auction_table = dynamodb.Table("auction-connections")
-api_gateway = boto3.client(
-    "apigatewaymanagementapi", endpoint_url=os.getenv("WEBSOCKET_ENDPOINT")
+api_gateway = instrument_client(
+    boto3.client(
+        "apigatewaymanagementapi", endpoint_url=os.getenv("WEBSOCKET_ENDPOINT")
+    )
 )
 
 rds_host = os.environ["DB_HOSTNAME"]
@@ -27,6 +28,13 @@ rds_db_name = os.environ["DB_NAME"]
 rds_user = os.environ["DB_USERNAME"]
 rds_password = os.environ["DB_PASSWORD"]
 
+# Firing this much before the deadline still counts as on time
+EARLY_TOLERANCE_MS = 1000
+# Background Lambda that emails the users watching the auction
+NOTIFICATION_WORKER_FUNCTION = os.getenv(
+    "NOTIFICATION_WORKER_FUNCTION", "AuctionNotificationWorker"
+)
+
 
 def connect_to_rds():
     try:
@@ -44,6 +52,7 @@ def connect_to_rds():
         raise e
 
 
+@timed("rds_update")
 def update_rds(auction_id, is_active):
     try:
         connection = connect_to_rds()
@@ -65,72 +74,44 @@ def update_rds(auction_id, is_active):
             connection.close()
 
 
-def delete_eventbridge_rule(rule_name):
-    try:
-        targets_response = eventbridge_client.list_targets_by_rule(Rule=rule_name)
-        target_ids = [target["Id"] for target in targets_response.get("Targets", [])]
-
-        if target_ids:
-            eventbridge_client.remove_targets(Rule=rule_name, Ids=target_ids)
-
-        eventbridge_client.delete_rule(Name=rule_name)
-        print(f"Deleted rule: {rule_name}")
-    except eventbridge_client.exceptions.ResourceNotFoundException:
-        print(f"Rule {rule_name} not found. Nothing to delete.")
-    except Exception as e:
-        print(f"Error deleting rule {rule_name}: {str(e)}")
-        raise
-
-
+@timed("notify_connections")
 def send_websocket_message(auction_id, message):
     """
     Sends a WebSocket message to the all client connected to particular auction using API Gateway Management API.
     """
     try:
-        user_connections_table = dynamodb.Table("user-connections")
-
-        response = user_connections_table.query(
-            IndexName="auction_id-index",
-            KeyConditionExpression=boto3.dynamodb.conditions.Key("auction_id").eq(
-                auction_id
-            ),
+        # Logged even without viewers, so resuming clients can replay it
+        payloads = append_event(
+            auction_id, lambda fmt, seq: encode_status_message(message, fmt, seq)
         )
-        connections = response.get("Items", [])
-
-        if not connections:
+        # Send message to all connected clients, once encoded per format
+        stats = post_pages_by_format(
+            api_gateway, auction_id, iter_connection_pages(auction_id), payloads.get
+        )
+        if not (stats["sent"] or stats["failed"] or stats["gone"]):
             print(f"No active connections for auction {auction_id}.")
-        else:
-            # Send message to all connected clients
-            for connection in connections:
-                connection_id = connection.get("connection_id")
-                try:
-                    logger.info(
-                        "Sending start auction message to connection: %s", connection_id
-                    )
-                    api_gateway.post_to_connection(
-                        ConnectionId=connection_id, Data=json.dumps(message)
-                    )
-                    logger.info(
-                        "Successfully sent update to connection_id: %s", connection_id
-                    )
-                except ClientError as e:
-                    logger.error(
-                        "Failed to send message to connection_id %s: %s",
-                        connection_id,
-                        e.response["Error"]["Message"],
-                        exc_info=True,
-                    )
-    except boto3.exceptions.Boto3Error as e:
-        print(f"WebSocket error: {str(e)}")
-        if "GoneException" in str(e):
-            print(f"Connection {connection_id} is no longer valid.")
-            # Optional: Clean up the invalid connection in DynamoDB if necessary
     except Exception as e:
         print(f"Unexpected error sending WebSocket message: {str(e)}")
 
 
+@timed("notify_watchers")
+def notify_watchers(auction_id):
+    """
+    Have the notification worker email the auction's watchers, asynchronously.
+    """
+    try:
+        lambda_client.invoke(
+            FunctionName=NOTIFICATION_WORKER_FUNCTION,
+            InvocationType="Event",
+            Payload=json.dumps({"auction_id": auction_id, "notification": "started"}),
+        )
+    except Exception as e:
+        print(f"Error starting notifications for auction {auction_id}: {str(e)}")
+
+
+@instrument_handler
 def lambda_handler(event, context):
-    print(f"Received event: {json.dumps(event)}")
+    log_event(logger, event, "startAuction")
     auction_id = event["auction_id"]
 
     if not auction_id:
@@ -148,7 +129,7 @@ def lambda_handler(event, context):
         if not auction_data:
             print(f"Auction {auction_id} not found in DynamoDB.")
             return
-        # Extract auction start time and put lambda to sleep until start time occurs
+        # The scheduler fires this Lambda at the start time instead of it sleeping
         start_time_str = auction_data.get("auction_start_time")
         if not start_time_str:
             print(f"Auction {auction_id} does not have a start time.")
@@ -157,15 +138,16 @@ def lambda_handler(event, context):
                 "body": json.dumps({"error": "Auction does not have a start time."}),
             }
 
-        start_time = parser.parse(start_time_str)
-        current_time = datetime.now(timezone.utc)
-        sleep_duration = (start_time - current_time).total_seconds()
-
-        if sleep_duration > 0:
-            print(f"Sleeping for {sleep_duration} seconds until auction start time.")
-            time.sleep(sleep_duration)
-        else:
-            print(f"Auction {auction_id} start time has already passed.")
+        start_ms = to_epoch_ms(start_time_str)
+        if start_ms - now_ms() > EARLY_TOLERANCE_MS:
+            # Invoked early (e.g. start time edited); re-arm instead of sleeping
+            schedule_action(auction_id, START_AUCTION, start_ms)
+            return {
+                "statusCode": 202,
+                "body": json.dumps(
+                    {"message": f"Auction {auction_id} start rescheduled."}
+                ),
+            }
 
         auction_table.update_item(
             Key={"auction_id": auction_id},
@@ -175,18 +157,11 @@ def lambda_handler(event, context):
 
         end_time = auction_data.get("auction_end_time", "")
 
-        remaining_time = calculate_remaining_time(end_time)
-
         message = {
-            "statusCode": 200,
-            "body": json.dumps(
-                {
-                    "message": f"Auction {auction_id} Started",
-                    "auction_status": "STARTED",
-                    "auction_end_time": end_time,
-                    "remaining_time": remaining_time,
-                }
-            ),
+            "message": f"Auction {auction_id} Started",
+            "auction_status": "STARTED",
+            "auction_end_time": end_time,
+            "auction_end_ms": to_epoch_ms(end_time),
         }
 
         send_websocket_message(auction_id, message)
@@ -194,8 +169,7 @@ def lambda_handler(event, context):
         # Update RDS auction status
         update_rds(auction_id, is_active=1)
 
-        # Delete EventBridge rule for starting the auction
-        delete_eventbridge_rule(f"StartAuction_{auction_id}")
+        notify_watchers(auction_id)
 
         return {
             "statusCode": 200,
@@ -0,0 +1,107 @@
+import os
+import time
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from broadcast_helper import WIRE_COMPACT, WIRE_JSON
+from metrics_helper import instrument_client
+
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+
+# Per-auction log of broadcast events, keyed (auction_id, seq), that serves as
+# the replay buffer for resumed sessions. Row seq=0 holds the auction's last
+# assigned sequence number; event rows expire through DynamoDB TTL on
+# expires_at.
+AUCTION_EVENTS_TABLE = os.getenv("AUCTION_EVENTS_TABLE", "auction-events")
+EVENT_LOG_ENABLED = os.getenv("EVENT_LOG_ENABLED", "true").lower() == "true"
+# How long events stay replayable, and how many a resume replays at most
+# before a full snapshot is cheaper
+REPLAY_BUFFER_SECONDS = int(os.getenv("REPLAY_BUFFER_SECONDS", "120"))
+REPLAY_BUFFER_EVENTS = int(os.getenv("REPLAY_BUFFER_EVENTS", "100"))
+
+COUNTER_SEQ = 0
+
+
+def next_seq(auction_id):
+    response = dynamodb.Table(AUCTION_EVENTS_TABLE).update_item(
+        Key={"auction_id": auction_id, "seq": COUNTER_SEQ},
+        UpdateExpression="ADD last_seq :one",
+        ExpressionAttributeValues={":one": 1},
+        ReturnValues="UPDATED_NEW",
+    )
+    return int(response["Attributes"]["last_seq"])
+
+
+def current_seq(auction_id):
+    """
+    Return the auction's last assigned sequence number (0 before any event).
+    """
+    if not EVENT_LOG_ENABLED:
+        return None
+    item = (
+        dynamodb.Table(AUCTION_EVENTS_TABLE)
+        .get_item(Key={"auction_id": auction_id, "seq": COUNTER_SEQ})
+        .get("Item")
+    )
+    return int(item["last_seq"]) if item else 0
+
+
+def append_event(auction_id, encode):
+    """
+    Give an outgoing auction event the next sequence number and keep it in
+    the replay buffer.
+
+    encode(fmt, seq) returns the event's payload in a wire format; the
+    payloads of every format are returned keyed by format, so the caller
+    can broadcast exactly what was logged.
+    """
+    if not EVENT_LOG_ENABLED:
+        return {fmt: encode(fmt, None) for fmt in (WIRE_JSON, WIRE_COMPACT)}
+
+    seq = next_seq(auction_id)
+    payloads = {fmt: encode(fmt, seq) for fmt in (WIRE_JSON, WIRE_COMPACT)}
+    dynamodb.Table(AUCTION_EVENTS_TABLE).put_item(
+        Item={
+            "auction_id": auction_id,
+            "seq": seq,
+            WIRE_JSON: payloads[WIRE_JSON].decode("utf-8"),
+            WIRE_COMPACT: payloads[WIRE_COMPACT].decode("utf-8"),
+            "expires_at": int(time.time()) + REPLAY_BUFFER_SECONDS,
+        }
+    )
+    return payloads
+
+
+def events_since(auction_id, last_seq):
+    """
+    Return the events after last_seq in order, or None when the client has
+    fallen out of the buffer and needs a full snapshot instead.
+
+    The client's own last event must still be in the log: TTL removes the
+    oldest events first, so its presence proves nothing later is missing.
+    """
+    if not EVENT_LOG_ENABLED or not last_seq or last_seq < 1:
+        return None
+    items = (
+        dynamodb.Table(AUCTION_EVENTS_TABLE)
+        .query(
+            KeyConditionExpression=Key("auction_id").eq(auction_id)
+            & Key("seq").gte(last_seq),
+            ConsistentRead=True,
+            Limit=REPLAY_BUFFER_EVENTS + 2,
+        )
+        .get("Items", [])
+    )
+    now = int(time.time())
+    if (
+        not items
+        or int(items[0]["seq"]) != last_seq
+        or int(items[0].get("expires_at", 0)) < now
+        or len(items) > REPLAY_BUFFER_EVENTS + 1
+    ):
+        return None
+    events = items[1:]
+    for expected, item in enumerate(events, start=last_seq + 1):
+        if int(item["seq"]) != expected:
+            return None
+    return events
@@ -1,31 +1,24 @@
-from datetime import timedelta, datetime
+import time
+from datetime import timezone
 
+from dateutil import parser
 
-def calculate_remaining_time(end_time_str):
-    """
-    Calculate the remaining time for an auction given its end time.
-
-    Args:
-        end_time_str (str): Auction end time in the format 'YYYY-MM-DD HH:MM:SS'
-
-    Returns:
-        str: Remaining time in 'HH:MM:SS' format, or a message if time is up.
-    """
-    # Parse the end time
-    end_time = datetime.strptime(end_time_str, "%Y-%m-%dT%H:%M:%S+00:00")
 
-    # Get the current time
-    current_time = datetime.utcnow()  # Use UTC for consistency
+def now_ms():
+    return int(time.time() * 1000)
 
-    # Calculate the difference
-    remaining_time = end_time - current_time
 
-    # If the auction has ended
-    if remaining_time.total_seconds() <= 0:
-        return "Auction has ended"
-
-    # Format the remaining time as HH:MM:SS
-    remaining_timedelta = timedelta(seconds=int(remaining_time.total_seconds()))
-    formatted_time = str(remaining_timedelta)
+def to_epoch_ms(timestamp):
+    """
+    Convert an ISO 8601 timestamp (naive values are UTC) to epoch milliseconds;
+    returns None for a missing timestamp.
 
-    return formatted_time
+    Schedule entries and the auction_end_ms sent to clients both use it, so
+    clients count down to the same instant the auction is ended at.
+    """
+    if not timestamp:
+        return None
+    dt = parser.parse(timestamp)
+    if not dt.tzinfo:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
@@ -3,21 +3,32 @@ import os
 import uuid
 import boto3
 import base64
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from dateutil import parser
 import pymysql
-from botocore.exceptions import ClientError
-
-s3_client = boto3.client("s3")
-eventbridge_client = boto3.client("events")
-lambda_client = boto3.client("lambda")
-sqs_client = boto3.client("sqs")
-cognito_idp = boto3.client("cognito-idp")  # For fetching user details from Cognito
-dynamodb = boto3.resource("dynamodb")
+from scheduler_helper import (
+    CREATE_RESOURCES,
+    END_AUCTION,
+    START_AUCTION,
+    schedule_action,
+)
+from time_helper import to_epoch_ms
+from metrics_helper import instrument_client, instrument_handler, timed
+from log_helper import get_logger, log_event
+from queue_helper import lease_queue, uses_pooled_queues, uses_shared_queues
+
+logger = get_logger(__name__)
+
+s3_client = instrument_client(boto3.client("s3"))
+lambda_client = instrument_client(boto3.client("lambda"))
+dynamodb = instrument_client(boto3.resource("dynamodb"))
 auction_table = dynamodb.Table("auction-connections")
 
 
-SQS_QUEUE_URL = os.getenv("SQS_QUEUE_URL")
+# Background Lambda that pages through users and queues their notifications
+NOTIFICATION_WORKER_FUNCTION = os.getenv(
+    "NOTIFICATION_WORKER_FUNCTION", "AuctionNotificationWorker"
+)
 
 # RDS settings from environment variables
 proxy_host_name = os.environ["DB_HOSTNAME"]
@@ -26,64 +37,6 @@ db_name = os.environ["DB_NAME"]
 db_user_name = os.environ["DB_USERNAME"]
 db_password = os.environ["DB_PASSWORD"]
 S3_BUCKET_NAME = os.environ["S3_BUCKET_NAME"]
-COGNITO_USER_POOL_ID = os.getenv("COGNITO_USER_POOL_ID")
-
-
-def get_user_email(user_id):
-    """
-    Fetch the email of a user from Cognito User Pool using their user_id.
-    """
-    try:
-        response = cognito_idp.admin_get_user(
-            UserPoolId=COGNITO_USER_POOL_ID, Username=user_id
-        )
-        for attribute in response["UserAttributes"]:
-            if attribute["Name"] == "email":
-                return attribute["Value"]
-    except ClientError as e:
-        print(f"Error fetching email for user {user_id}: {str(e)}")
-    return None
-
-
-def convert_to_cron(timestamp):
-    try:
-        # Parse timestamp and convert to UTC
-        dt = parser.parse(timestamp).astimezone(timezone.utc) - timedelta(minutes=1)
-
-        # Generate cron expression
-        return f"{dt.minute} {dt.hour} {dt.day} {dt.month} ? {dt.year}"
-    except ValueError as e:
-        raise ValueError(
-            f"Invalid timestamp format: {timestamp}. Expected ISO 8601 format."
-        ) from e
-
-
-def create_eventbridge_rule(rule_name, time, target_lambda_arn, input_data):
-    """
-    Creates an EventBridge rule for scheduling the auction-related events.
-    """
-    try:
-        cron_expression = convert_to_cron(time)
-
-        eventbridge_client.put_rule(
-            Name=rule_name,
-            ScheduleExpression=f"cron({cron_expression})",
-            State="ENABLED",
-            Description=f"Trigger for auction {input_data['auction_id']} at {time}",
-        )
-
-        # Add targets to the rule
-        eventbridge_client.put_targets(
-            Rule=rule_name,
-            Targets=[
-                {"Id": "1", "Arn": target_lambda_arn, "Input": json.dumps(input_data)}
-            ],
-        )
-
-        return rule_name
-    except Exception as e:
-        print(f"Error creating EventBridge rule: {str(e)}")
-        raise
 
 
 def connect_to_rds():
@@ -103,6 +56,7 @@ def connect_to_rds():
         raise e
 
 
+@timed("image_upload")
 def upload_to_s3(base64_data, auction_id, filename):
     try:
         decoded_data = base64.b64decode(base64_data)
@@ -125,31 +79,53 @@ def update_dynamodb_with_rules(
     default_time_increment,
     default_time_increment_before,
     stop_snipes_after,
+    bid_queue_url=None,
 ):
     """
     Updates the DynamoDB table to add start_rule_name and end_rule_name.
     """
     try:
-        auction_table.put_item(
-            Item={
-                "auction_id": auction_id,
-                "auction_start_time": start_time,
-                "auction_end_time": end_time,
-                "auction_status": "SCHEDULED",
-                "snipes_remaining": stop_snipes_after,
-                "default_time_increment": default_time_increment,
-                "default_time_increment_before": default_time_increment_before,
-            }
-        )
+        item = {
+            "auction_id": auction_id,
+            "auction_start_time": start_time,
+            "auction_end_time": end_time,
+            "auction_status": "SCHEDULED",
+            "snipes_remaining": stop_snipes_after,
+            "default_time_increment": default_time_increment,
+            "default_time_increment_before": default_time_increment_before,
+        }
+        if bid_queue_url:
+            item["bid_queue_url"] = bid_queue_url
+        auction_table.put_item(Item=item)
         print(f"DynamoDB updated for auction {auction_id} with rules.")
     except Exception as e:
         print(f"Error updating DynamoDB: {str(e)}")
         raise
 
 
+@timed("notify_users")
+def notify_users(auction_details):
+    """
+    Hand the new auction to the notification worker with an async invoke.
+
+    A failure here only costs the announcement emails, not the auction.
+    """
+    try:
+        lambda_client.invoke(
+            FunctionName=NOTIFICATION_WORKER_FUNCTION,
+            InvocationType="Event",
+            Payload=json.dumps({"auction_details": auction_details}),
+        )
+    except Exception as e:
+        print(
+            f"Error starting notifications for auction {auction_details['auction_id']}: {str(e)}"
+        )
+
+
+@instrument_handler
 def lambda_handler(event, context):
-    # Log the incoming event for debugging
-    print("Received event:", json.dumps(event))
+    # Log the incoming event with product_images summarized by size
+    log_event(logger, event, "createAuction")
 
     try:
 
@@ -231,6 +207,9 @@ def lambda_handler(event, context):
             "body": json.dumps({"error": "Internal Server Error", "details": str(e)}),
         }
 
+    # Take a ready queue from the pool now so starting needs no queue setup
+    bid_queue_url = lease_queue(auction_id) if uses_pooled_queues() else None
+
     update_dynamodb_with_rules(
         auction_id,
         start_time,
@@ -238,100 +217,46 @@ def lambda_handler(event, context):
         default_time_increment,
         default_time_increment_before,
         stop_snipes_after,
+        bid_queue_url,
     )
 
     start_time_dt = parser.parse(start_time).astimezone(timezone.utc)
     current_time = datetime.now(timezone.utc)
     time_diff = (start_time_dt - current_time).total_seconds()
 
-    create_eventbridge_rule(
-        f"EndAuction_{auction_id}",
-        end_time,
-        "arn:aws:lambda:us-east-1:908027408981:function:EndAuctionLambda",
-        {"auction_id": auction_id, "status": "ENDED"},
-    )
+    schedule_action(auction_id, END_AUCTION, to_epoch_ms(end_time))
 
     try:
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT user_id, user_name FROM users")
-                recipients = cursor.fetchall()
-        except Exception as e:
-            print(f"Error fetching users from RDS: {str(e)}")
-            return {
-                "statusCode": 500,
-                "body": json.dumps({"error": "Failed to fetch users"}),
+        # Users are notified by a background worker so the creator never
+        # waits on a per-user fan-out
+        notify_users(
+            {
+                "auction_id": auction_id,
+                "auction_item": auction_item,
+                "auction_desc": auction_desc,
+                "base_price": base_price,
+                "start_time": start_time,
+                "end_time": end_time,
+                "created_by": created_by,
             }
-
-        for recipient in recipients:
-            try:
-                user_id = recipient.get("user_id")
-                user_name = recipient.get("user_name")
-                if not user_id:
-                    print("Skipping recipient without user_id.")
-                    continue
-                email = get_user_email(user_id)
-
-                if not email:
-                    print(f"Skipping user {user_id} as email could not be retrieved.")
-                    continue
-
-                sqs_message = {
-                    "email": email,
-                    "user_name": user_name,
-                    "auction_details": {
-                        "auction_id": auction_id,
-                        "auction_item": auction_item,
-                        "auction_desc": auction_desc,
-                        "base_price": base_price,
-                        "start_time": start_time,
-                        "end_time": end_time,
-                        "created_by": created_by,
-                    },
-                }
-
-                # Send the message to SQS
-                print(f"Sending message to SQS for user {user_id} with email {email}")
-                sqs_client.send_message(
-                    QueueUrl=SQS_QUEUE_URL, MessageBody=json.dumps(sqs_message)
-                )
-                print(f"Message sent to SQS for user {user_id} with email {email}")
-
-            except Exception as e:
-                print(f"Error adding message to SQS for user {user_id}: {str(e)}")
+        )
 
         if time_diff <= 180:  # Less than or equal to 6 minutes
 
+            # Shared and leased queues need no setup, so the request need not wait
+            needs_setup = not (uses_shared_queues() or bid_queue_url)
             lambda_client.invoke(
                 FunctionName="arn:aws:lambda:us-east-1:908027408981:function:AuctionResourceManager",
-                InvocationType="RequestResponse",  # synchronous invocation "RequestResponse"
+                InvocationType="RequestResponse" if needs_setup else "Event",
                 Payload=json.dumps({"auction_id": auction_id, "status": "CREATING"}),
             )
 
-            lambda_client.invoke(
-                FunctionName="arn:aws:lambda:us-east-1:908027408981:function:StartAuctionLambda",
-                InvocationType="Event",  # synchronous invocation "RequestResponse"
-                Payload=json.dumps({"auction_id": auction_id, "status": "STARTED"}),
-            )
-
         else:
-
-            formatted_start_time = parser.parse(start_time).astimezone(timezone.utc)
-            creation_time = formatted_start_time - timedelta(minutes=3)
-
-            create_eventbridge_rule(
-                f"ResourceCreationFor_{auction_id}",
-                creation_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                "arn:aws:lambda:us-east-1:908027408981:function:AuctionResourceManager",
-                {"auction_id": auction_id, "status": "CREATING"},
+            schedule_action(
+                auction_id, CREATE_RESOURCES, to_epoch_ms(start_time) - 3 * 60 * 1000
             )
 
-            create_eventbridge_rule(
-                f"StartAuction_{auction_id}",
-                start_time,
-                "arn:aws:lambda:us-east-1:908027408981:function:StartAuctionLambda",
-                {"auction_id": auction_id, "status": "STARTED"},
-            )
+        schedule_action(auction_id, START_AUCTION, to_epoch_ms(start_time))
 
         return {
             "statusCode": 201,
@@ -0,0 +1,24 @@
+import time
+from datetime import timezone
+
+from dateutil import parser
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def to_epoch_ms(timestamp):
+    """
+    Convert an ISO 8601 timestamp (naive values are UTC) to epoch milliseconds;
+    returns None for a missing timestamp.
+
+    Schedule entries and the auction_end_ms sent to clients both use it, so
+    clients count down to the same instant the auction is ended at.
+    """
+    if not timestamp:
+        return None
+    dt = parser.parse(timestamp)
+    if not dt.tzinfo:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
@@ -0,0 +1,233 @@
+import json
+import os
+import re
+import boto3
+import pymysql
+from metrics_helper import count, instrument_client, instrument_handler, stage
+from log_helper import get_logger, log_event
+from contact_helper import fetch_cognito_emails
+
+logger = get_logger(__name__)
+
+sqs = instrument_client(boto3.client("sqs"))
+
+# Queue consumed by SendEmailLambda
+SQS_QUEUE_URL = os.getenv("SQS_QUEUE_URL")
+
+# RDS settings from environment variables
+rds_host = os.environ["DB_HOSTNAME"]
+rds_port = int(os.environ["DB_PORT"])
+rds_db_name = os.environ["DB_NAME"]
+rds_user = os.environ["DB_USERNAME"]
+rds_password = os.environ["DB_PASSWORD"]
+
+# Users read from the server-side cursor at a time
+NOTIFY_PAGE_SIZE = int(os.getenv("NOTIFY_PAGE_SIZE", "500"))
+# SQS accepts at most 10 entries per send_message_batch
+SQS_BATCH_SIZE = 10
+# Who hears about new auctions: "watchers" (users watching the seller or a
+# keyword of the auction) or "all" users. Start notices always go to watchers.
+NOTIFY_AUDIENCE = os.getenv("NOTIFY_AUDIENCE", "watchers").lower()
+# Distinct words of an auction's item and description matched to keyword watches
+MAX_AUCTION_KEYWORDS = int(os.getenv("MAX_AUCTION_KEYWORDS", "100"))
+
+CREATED = "created"
+STARTED = "started"
+
+ALL_USERS_QUERY = "SELECT user_id, user_name, email FROM users"
+# Each branch is served by an index: the auction_interest primary key and
+# ix_user_watch_type_target; UNION drops users matching more than one
+WATCHERS_QUERY = """
+    SELECT u.user_id, u.user_name, u.email
+    FROM users u
+    JOIN (
+        SELECT user_id FROM auction_interest WHERE auction_id = %s
+        UNION
+        SELECT user_id FROM user_watch WHERE watch_type = 'seller' AND target = %s
+        {keyword_branch}
+    ) w ON w.user_id = u.user_id
+"""
+KEYWORD_BRANCH = "UNION SELECT user_id FROM user_watch WHERE watch_type = 'keyword' AND target IN ({})"
+
+
+def connect_to_rds(cursorclass=pymysql.cursors.DictCursor):
+    try:
+        return pymysql.connect(
+            host=rds_host,
+            user=rds_user,
+            password=rds_password,
+            database=rds_db_name,
+            port=rds_port,
+            cursorclass=cursorclass,
+        )
+    except Exception as e:
+        print(f"Error connecting to RDS: {str(e)}")
+        raise e
+
+
+def auction_keywords(auction_details):
+    """
+    Lowercased distinct words of an auction, in the form keyword watches use.
+    """
+    text = " ".join(
+        str(auction_details.get(field) or "")
+        for field in ("auction_item", "auction_desc")
+    )
+    words = dict.fromkeys(
+        word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) >= 2
+    )
+    return list(words)[:MAX_AUCTION_KEYWORDS]
+
+
+def audience_query(notification, auction_details):
+    """
+    Build the (sql, params) selecting the users to notify of an auction.
+    """
+    if notification == CREATED and NOTIFY_AUDIENCE == "all":
+        return ALL_USERS_QUERY, ()
+
+    keywords = auction_keywords(auction_details)
+    keyword_branch = (
+        KEYWORD_BRANCH.format(", ".join(["%s"] * len(keywords))) if keywords else ""
+    )
+    params = (
+        auction_details.get("auction_id"),
+        auction_details.get("created_by"),
+        *keywords,
+    )
+    return WATCHERS_QUERY.format(keyword_branch=keyword_branch), params
+
+
+def get_auction_details(connection, auction_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT auction_id, auction_item, auction_desc, base_price, start_time, end_time, created_by FROM auction WHERE auction_id = %s",
+            (auction_id,),
+        )
+        return cursor.fetchone()
+
+
+def iter_user_pages(connection, query, params=()):
+    """
+    Yield pages of users from an unbuffered (server-side) cursor, so memory
+    stays bounded by NOTIFY_PAGE_SIZE however many users there are.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        while True:
+            with stage("user_page"):
+                rows = cursor.fetchmany(NOTIFY_PAGE_SIZE)
+            if not rows:
+                return
+            yield rows
+
+
+def send_batches(messages):
+    """
+    Publish messages to SQS_QUEUE_URL 10 per send_message_batch call.
+
+    Entries SQS rejects are retried once on their own batch call.
+
+    Returns the number of messages that could not be queued.
+    """
+    failed = 0
+    for start in range(0, len(messages), SQS_BATCH_SIZE):
+        entries = [
+            {"Id": str(index), "MessageBody": json.dumps(message, default=str)}
+            for index, message in enumerate(messages[start : start + SQS_BATCH_SIZE])
+        ]
+        for attempt in range(2):
+            with stage("sqs_batch"):
+                response = sqs.send_message_batch(
+                    QueueUrl=SQS_QUEUE_URL, Entries=entries
+                )
+            failed_ids = {entry["Id"] for entry in response.get("Failed", [])}
+            if not failed_ids:
+                break
+            entries = [entry for entry in entries if entry["Id"] in failed_ids]
+        else:
+            failed += len(entries)
+            logger.error(
+                "Failed to queue %d notifications: %s",
+                len(entries),
+                response.get("Failed"),
+            )
+    return failed
+
+
+def notify_users(auction_details, notification=CREATED):
+    """
+    Queue a notification of an auction for every matching user with a known
+    email.
+    """
+    queued = failed = skipped = 0
+    # The streaming cursor ties up its connection; Cognito fallbacks write
+    # their results back through a second one
+    stream_connection = connect_to_rds(pymysql.cursors.SSDictCursor)
+    contact_connection = connect_to_rds()
+    try:
+        query, params = audience_query(notification, auction_details)
+        for rows in iter_user_pages(stream_connection, query, params):
+            # Emails are stored at login; only users without one go to Cognito
+            emails = fetch_cognito_emails(
+                contact_connection,
+                [row["user_id"] for row in rows if row["user_id"] and not row["email"]],
+            )
+            messages = []
+            for row in rows:
+                email = row["email"] or emails.get(row["user_id"])
+                if not email:
+                    skipped += 1
+                    continue
+                messages.append(
+                    {
+                        "notification": notification,
+                        "email": email,
+                        "user_name": row["user_name"],
+                        "auction_details": auction_details,
+                    }
+                )
+            page_failed = send_batches(messages)
+            queued += len(messages) - page_failed
+            failed += page_failed
+    finally:
+        stream_connection.close()
+        contact_connection.close()
+
+    count("notifications_queued", queued)
+    count("notifications_failed", failed)
+    logger.info(
+        "Auction %s %s notifications: queued=%d failed=%d skipped=%d",
+        auction_details.get("auction_id"),
+        notification,
+        queued,
+        failed,
+        skipped,
+    )
+    return {"queued": queued, "failed": failed, "skipped": skipped}
+
+
+@instrument_handler
+def lambda_handler(event, context):
+    """
+    Invoked asynchronously by addAuctionlambda once the auction is committed
+    (with its auction_details) and by StartAuctionLambda when it starts
+    (with its auction_id and notification "started").
+    """
+    log_event(logger, event, "notifyUsers")
+    notification = event.get("notification", CREATED)
+    auction_details = event.get("auction_details")
+    if not auction_details:
+        connection = connect_to_rds()
+        try:
+            auction_details = get_auction_details(connection, event["auction_id"])
+        finally:
+            connection.close()
+        if not auction_details:
+            print(f"Auction {event['auction_id']} not found in RDS.")
+            return {
+                "statusCode": 404,
+                "body": json.dumps({"error": "Auction not found"}),
+            }
+    stats = notify_users(auction_details, notification)
+    return {"statusCode": 200, "body": json.dumps(stats)}
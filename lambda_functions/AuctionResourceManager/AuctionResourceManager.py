@@ -1,22 +1,45 @@
-import json
 import boto3
 import os
 from botocore.exceptions import ClientError
 import time  # For sleep functionality
+from broadcast_helper import encode_event_message, post_pages_by_format
+from event_log_helper import append_event
+from connection_helper import iter_connection_pages
+from metrics_helper import count, instrument_client, instrument_handler, timed
+from mapping_helper import (
+    ensure_mapping,
+    function_mappings,
+    get_batching_config,
+    remove_mapping,
+)
+from time_helper import now_ms, to_epoch_ms
+from log_helper import LazyJson, get_logger, log_event
+from queue_helper import (
+    auction_id_from_queue,
+    auction_queue_name,
+    release_queue,
+    uses_pooled_queues,
+    uses_shared_queues,
+)
 
 # Initialize AWS clients
-sqs = boto3.client("sqs")
-lambda_client = boto3.client("lambda")
-eventbridge_client = boto3.client("events")
-dynamodb = boto3.resource("dynamodb")
+logger = get_logger(__name__)
+
+sqs = instrument_client(boto3.client("sqs"))
+lambda_client = instrument_client(boto3.client("lambda"))
+dynamodb = instrument_client(boto3.resource("dynamodb"))
 auction_table = dynamodb.Table("auction-connections")
-dynamodb = boto3.resource("dynamodb")
-apigateway_management_api = boto3.client(
-    "apigatewaymanagementapi", endpoint_url=os.environ["WEBSOCKET_ENDPOINT"]
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+apigateway_management_api = instrument_client(
+    boto3.client(
+        "apigatewaymanagementapi", endpoint_url=os.environ["WEBSOCKET_ENDPOINT"]
+    )
 )
 
 # Environment variable for the process priority Lambda
 PROCESS_PRIORITY_LAMBDA_NAME = os.getenv("PROCESS_PRIORITY_LAMBDA_NAME")
+# Ended auctions keep their queue this long so in-flight bids still drain
+SWEEP_GRACE_SECONDS = int(os.getenv("SWEEP_GRACE_SECONDS", "600"))
 
 
 # Environment variables
@@ -31,6 +54,7 @@ def get_queue_arn(queue_url):
     return response["Attributes"]["QueueArn"]
 
 
+@timed("queue_create")
 def create_queue(queue_name, is_fifo=False):
     """
     Create an SQS queue with the given name.
@@ -47,6 +71,7 @@ def create_queue(queue_name, is_fifo=False):
         raise e
 
 
+@timed("mapping_update")
 def attach_queue_to_lambda(queue_url):
     """
     Attach an SQS queue as a trigger to the process priority Lambda.
@@ -54,29 +79,13 @@ def attach_queue_to_lambda(queue_url):
     try:
         queue_arn = get_queue_arn(queue_url)
 
-        # Check if the mapping already exists
-        existing_mappings = lambda_client.list_event_source_mappings(
-            FunctionName=PROCESS_PRIORITY_LAMBDA_NAME
-        )
-        for mapping in existing_mappings["EventSourceMappings"]:
-            if mapping["EventSourceArn"] == queue_arn:
-                print(
-                    f"Queue {queue_url} is already mapped to Lambda {PROCESS_PRIORITY_LAMBDA_NAME}."
-                )
-                return
-
         # Create the mapping with retries
         retries = 3
         for attempt in range(retries):
             try:
-                response = lambda_client.create_event_source_mapping(
-                    EventSourceArn=queue_arn,
-                    FunctionName=PROCESS_PRIORITY_LAMBDA_NAME,
-                    BatchSize=1,
-                    Enabled=True,
-                )
+                mapping_uuid = ensure_mapping(queue_arn, get_batching_config(queue_arn))
                 print(
-                    f"Attached queue {queue_url} to Lambda {PROCESS_PRIORITY_LAMBDA_NAME}: {response}"
+                    f"Queue {queue_url} is mapped to Lambda {PROCESS_PRIORITY_LAMBDA_NAME}: {mapping_uuid}"
                 )
                 return
             except ClientError as e:
@@ -113,17 +122,10 @@ def remove_queue_trigger(queue_url):
     Remove an SQS queue trigger from the process priority Lambda.
     """
     try:
-        queue_arn = get_queue_arn(queue_url)
-        existing_mappings = lambda_client.list_event_source_mappings(
-            FunctionName=PROCESS_PRIORITY_LAMBDA_NAME
-        )
-        for mapping in existing_mappings["EventSourceMappings"]:
-            if mapping["EventSourceArn"] == queue_arn:
-                lambda_client.delete_event_source_mapping(UUID=mapping["UUID"])
-                print(
-                    f"Removed trigger for queue {queue_url} from Lambda {PROCESS_PRIORITY_LAMBDA_NAME}."
-                )
-                return
+        if remove_mapping(get_queue_arn(queue_url)):
+            print(
+                f"Removed trigger for queue {queue_url} from Lambda {PROCESS_PRIORITY_LAMBDA_NAME}."
+            )
     except ClientError as e:
         print(
             f"Error removing trigger for queue {queue_url}: {e.response['Error']['Message']}"
@@ -131,6 +133,49 @@ def remove_queue_trigger(queue_url):
         raise e
 
 
+def is_auction_over(auction_id, now):
+    """
+    Whether an auction ended (or was deleted) more than SWEEP_GRACE_SECONDS
+    before now (epoch ms).
+    """
+    item = auction_table.get_item(Key={"auction_id": auction_id}).get("Item")
+    if not item:
+        return True
+    if item.get("auction_status") != "ENDED":
+        return False
+    ended_ms = to_epoch_ms(item.get("auction_end_time"))
+    if ended_ms is None:
+        return True
+    return now - ended_ms >= SWEEP_GRACE_SECONDS * 1000
+
+
+def sweep_ended_auctions():
+    """
+    Remove the event source mappings and queues that ended auctions left
+    behind. Only per-auction queues are considered; shared and pooled queues
+    outlive their auctions.
+    """
+    now = now_ms()
+    swept = 0
+    for mapping in list(function_mappings()):
+        queue_arn = mapping["EventSourceArn"]
+        auction_id = auction_id_from_queue(queue_arn)
+        if not auction_id or not is_auction_over(auction_id, now):
+            continue
+        remove_mapping(queue_arn)
+        try:
+            queue_url = sqs.get_queue_url(QueueName=auction_queue_name(auction_id))[
+                "QueueUrl"
+            ]
+            delete_queue(queue_url)
+        except sqs.exceptions.QueueDoesNotExist:
+            pass
+        swept += 1
+    count("mappings_swept", swept)
+    print(f"Swept {swept} mappings of ended auctions.")
+    return swept
+
+
 def update_auction_status(auction_id, new_status):
     """
     Update the auction status in the DynamoDB table.
@@ -151,79 +196,46 @@ def update_auction_status(auction_id, new_status):
         raise e
 
 
-def delete_eventbridge_rule(rule_name):
-    try:
-        targets_response = eventbridge_client.list_targets_by_rule(Rule=rule_name)
-        target_ids = [target["Id"] for target in targets_response.get("Targets", [])]
-
-        if target_ids:
-            eventbridge_client.remove_targets(Rule=rule_name, Ids=target_ids)
-            print(f"Removed targets from rule: {rule_name}")
-
-        eventbridge_client.delete_rule(Name=rule_name)
-        print(f"Deleted rule: {rule_name}")
-    except eventbridge_client.exceptions.ResourceNotFoundException:
-        print(f"Rule {rule_name} not found. Nothing to delete.")
-    except Exception as e:
-        print(f"Error deleting rule {rule_name}: {str(e)}")
-        raise
-
-
+@timed("notify_connections")
 def send_websocket_message(auction_id, message):
     """
     Sends a WebSocket message to the all client connected to particular auction using API Gateway Management API.
     """
     try:
-        user_connections_table = dynamodb.Table("user-connections")
-
-        response = user_connections_table.query(
-            IndexName="auction_id-index",
-            KeyConditionExpression=boto3.dynamodb.conditions.Key("auction_id").eq(
-                auction_id
-            ),
+        # Logged even without viewers, so resuming clients can replay it
+        payloads = append_event(
+            auction_id, lambda fmt, seq: encode_event_message(message, fmt, seq)
         )
-        connections = response.get("Items", [])
-
-        if not connections:
+        # Send message to all connected clients, once encoded per format
+        stats = post_pages_by_format(
+            apigateway_management_api,
+            auction_id,
+            iter_connection_pages(auction_id),
+            payloads.get,
+        )
+        if not (stats["sent"] or stats["failed"] or stats["gone"]):
             print(f"No active connections for auction {auction_id}.")
-        else:
-            message = {
-                "auction_id": auction_id,
-                "auction_status": "CREATING",
-                "message": "Auction has CREATING.",
-            }
-
-            # Send message to all connected clients
-            for connection in connections:
-                connection_id = connection["connection_id"]
-                apigateway_management_api.post_to_connection(
-                    ConnectionId=connection_id,
-                    Data=json.dumps(message),
-                )
-        # print(f"Message sent to connection: {connection_id}")
-    except boto3.exceptions.Boto3Error as e:
-        print(f"WebSocket error: {str(e)}")
-        if "GoneException" in str(e):
-            print(f"Connection {connection_id} is no longer valid.")
-            # Optional: Clean up the invalid connection in DynamoDB if necessary
     except Exception as e:
         print(f"Unexpected error sending WebSocket message: {str(e)}")
 
 
+@instrument_handler
 def lambda_handler(event, context):
     """
     Handle EventBridge events to create or delete auction resources.
     """
     try:
-        print(f"Event received: {json.dumps(event)}")
+        log_event(logger, event, "resourceManager")
         action = event.get("status")  # "create" or "delete"
+        if action == "SWEEP":
+            # Periodic rule: clean up after auctions instead of per attach
+            swept = sweep_ended_auctions()
+            return {"statusCode": 200, "body": f"Swept {swept} ended auctions."}
         auction_id = event.get("auction_id")
-        print(f"auction_id {auction_id}")
-        print(f"action {action}")
 
         response = auction_table.get_item(Key={"auction_id": auction_id})
         auction_item = response.get("Item")
-        print(auction_item)
+        logger.debug("Auction item: %s", LazyJson(auction_item))
 
         if not auction_id or action not in ["CREATING", "SCHEDULED"]:
             raise ValueError(
@@ -234,7 +246,7 @@ def lambda_handler(event, context):
         print("Auction Connection ID: ", auction_connection_id)
 
         # Define queue names
-        fifo_queue_name = f"AuctionActionsQueue-{auction_id}.fifo"
+        fifo_queue_name = auction_queue_name(auction_id)
         priority_queue_name = f"AuctionPriorityQueue-{auction_id}"
 
         if action == "SCHEDULED" or action == "CREATING":
@@ -249,6 +261,19 @@ def lambda_handler(event, context):
 
             send_websocket_message(auction_id, message)
 
+            if uses_shared_queues():
+                # Bids go to the long-lived shared queues; nothing to create
+                return {
+                    "statusCode": 200,
+                    "body": f"Auction {auction_id} uses the shared bid queues.",
+                }
+            if uses_pooled_queues() and auction_item.get("bid_queue_url"):
+                # The queue and its mapping were leased ready at creation
+                return {
+                    "statusCode": 200,
+                    "body": f"Auction {auction_id} uses a pooled bid queue.",
+                }
+
             # Create queues
             fifo_queue_url = create_queue(fifo_queue_name, is_fifo=True)
             priority_queue_url = create_queue(priority_queue_name, is_fifo=False)
@@ -256,15 +281,24 @@ def lambda_handler(event, context):
             # Attach priority queue to Lambda
             attach_queue_to_lambda(fifo_queue_url)
 
-            # Delete EventBridge rule for starting the auction
-            delete_eventbridge_rule(f"ResourceCreationFor_{auction_id}")
-
             return {
                 "statusCode": 200,
                 "body": f"Created resources for auction {auction_id}, including queues.",
             }
 
         elif action == "delete":
+            if uses_shared_queues():
+                return {
+                    "statusCode": 200,
+                    "body": f"Auction {auction_id} uses the shared bid queues.",
+                }
+            if uses_pooled_queues() and auction_item.get("bid_queue_url"):
+                release_queue(auction_item["bid_queue_url"], auction_id)
+                return {
+                    "statusCode": 200,
+                    "body": f"Returned the bid queue of auction {auction_id} to the pool.",
+                }
+
             # Get queue URLs
             fifo_queue_url = sqs.get_queue_url(QueueName=fifo_queue_name)["QueueUrl"]
             priority_queue_url = sqs.get_queue_url(QueueName=priority_queue_name)[
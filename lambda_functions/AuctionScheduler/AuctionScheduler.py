@@ -0,0 +1,92 @@
+import json
+import os
+import boto3
+from scheduler_helper import (
+    ACTION_STATUSES,
+    CREATE_RESOURCES,
+    END_AUCTION,
+    FLUSH_BIDS,
+    START_AUCTION,
+    TRAILING_BROADCAST,
+    get_default_store,
+    run_dispatcher,
+)
+from time_helper import now_ms
+from metrics_helper import count, instrument_client, instrument_handler
+
+lambda_client = instrument_client(boto3.client("lambda"))
+
+# Target Lambdas for each scheduled action
+ACTION_TARGETS = {
+    CREATE_RESOURCES: os.getenv(
+        "RESOURCE_MANAGER_LAMBDA_ARN",
+        "arn:aws:lambda:us-east-1:908027408981:function:AuctionResourceManager",
+    ),
+    START_AUCTION: os.getenv(
+        "START_AUCTION_LAMBDA_ARN",
+        "arn:aws:lambda:us-east-1:908027408981:function:StartAuctionLambda",
+    ),
+    END_AUCTION: os.getenv(
+        "END_AUCTION_LAMBDA_ARN",
+        "arn:aws:lambda:us-east-1:908027408981:function:EndAuctionLambda",
+    ),
+    TRAILING_BROADCAST: os.getenv(
+        "PROCESS_PRIORITY_LAMBDA_ARN",
+        "arn:aws:lambda:us-east-1:908027408981:function:WebSocketProcessPriorityQueue",
+    ),
+    FLUSH_BIDS: os.getenv(
+        "BID_ACTIONS_LAMBDA_ARN",
+        "arn:aws:lambda:us-east-1:908027408981:function:WebSocketBidActions",
+    ),
+}
+
+# Tick period and how long one invocation dispatches before handing over to
+# the next scheduled run of this Lambda (a single rate(1 minute) rule)
+SCHEDULER_TICK_MS = int(os.getenv("SCHEDULER_TICK_MS", "500"))
+DISPATCH_WINDOW_MS = int(os.getenv("DISPATCH_WINDOW_MS", "60000"))
+# Time kept back from the Lambda timeout to finish the last firing
+DISPATCH_SAFETY_MS = 2000
+
+
+def fire_action(entry):
+    """
+    Invoke the target Lambda of a due schedule entry asynchronously.
+    """
+    action = entry["action"]
+    if action in ACTION_STATUSES:
+        payload = {"auction_id": entry["auction_id"], "status": ACTION_STATUSES[action]}
+    else:
+        payload = {"auction_id": entry["auction_id"], "action": action}
+    lambda_client.invoke(
+        FunctionName=ACTION_TARGETS[action],
+        InvocationType="Event",
+        Payload=json.dumps(payload),
+    )
+    print(f"Fired {action} for auction {entry['auction_id']}")
+
+
+@instrument_handler
+def lambda_handler(event, context):
+    """
+    Tick dispatcher: fires every due start, end and resource-creation action,
+    trailing leaderboard broadcast and coalesced-bid flush for all auctions,
+    replacing per-auction EventBridge rules.
+    """
+    started_ms = now_ms()
+    until_ms = started_ms + DISPATCH_WINDOW_MS
+    if context is not None:
+        until_ms = min(
+            until_ms,
+            started_ms + context.get_remaining_time_in_millis() - DISPATCH_SAFETY_MS,
+        )
+
+    fired = run_dispatcher(
+        get_default_store(), fire_action, until_ms, tick_ms=SCHEDULER_TICK_MS
+    )
+    max_lag_ms = max((entry["lag_ms"] for entry in fired), default=0)
+    count("actions_fired", len(fired))
+    print(f"Dispatched {len(fired)} actions, max lag {max_lag_ms} ms")
+    return {
+        "statusCode": 200,
+        "body": json.dumps({"fired": len(fired), "max_lag_ms": max_lag_ms}),
+    }
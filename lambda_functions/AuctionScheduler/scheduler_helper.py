@@ -0,0 +1,269 @@
+import heapq
+import os
+import time
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from metrics_helper import count, instrument_client
+from log_helper import get_logger
+from time_helper import now_ms
+
+logger = get_logger(__name__)
+
+SCHEDULE_TABLE = os.getenv("SCHEDULE_TABLE", "auction-schedule")
+# Width of one time bucket (timer wheel slot) in the schedule table
+SCHEDULE_BUCKET_MS = int(os.getenv("SCHEDULE_BUCKET_MS", "60000"))
+# How far back the dispatcher looks for entries that are still unfired: ones
+# due while no dispatcher was running and ones written already past due
+SCHEDULE_LOOKBACK_MS = int(os.getenv("SCHEDULE_LOOKBACK_MS", "300000"))
+# Entries whose firing fails are put back this far ahead, doubling per attempt
+SCHEDULE_RETRY_MS = int(os.getenv("SCHEDULE_RETRY_MS", "1000"))
+SCHEDULE_MAX_ATTEMPTS = int(os.getenv("SCHEDULE_MAX_ATTEMPTS", "5"))
+
+# Scheduled actions and the status each one hands to its target Lambda
+CREATE_RESOURCES = "CREATE_RESOURCES"
+START_AUCTION = "START_AUCTION"
+END_AUCTION = "END_AUCTION"
+ACTION_STATUSES = {
+    CREATE_RESOURCES: "CREATING",
+    START_AUCTION: "STARTED",
+    END_AUCTION: "ENDED",
+}
+# Leaderboard state held back by broadcast conflation, sent once the
+# auction's next broadcast slot opens
+TRAILING_BROADCAST = "TRAILING_BROADCAST"
+# Bids held in an auction's coalescing windows, forwarded once they close
+FLUSH_BIDS = "FLUSH_BIDS"
+
+
+def entry_key(auction_id, action, due_ms):
+    """
+    Sort key for a schedule entry; zero-padded so keys order by due time.
+    """
+    return f"{due_ms:013d}#{auction_id}#{action}"
+
+
+class InMemoryScheduleStore:
+    """
+    Heap-backed schedule store for local runs and benchmarks.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+
+    def put(self, auction_id, action, due_ms, attempts=0):
+        key = entry_key(auction_id, action, due_ms)
+        entry = {
+            "auction_id": auction_id,
+            "action": action,
+            "due_ms": due_ms,
+            "attempts": attempts,
+        }
+        self._entries[key] = entry
+        heapq.heappush(self._heap, (due_ms, key))
+
+    def delete(self, auction_id, action, due_ms):
+        self._entries.pop(entry_key(auction_id, action, due_ms), None)
+
+    def due(self, until_ms):
+        """
+        Return live entries due at or before until_ms, earliest first.
+        """
+        entries = []
+        for due_ms, key in sorted(self._heap):
+            if due_ms > until_ms:
+                break
+            if key in self._entries:
+                entries.append(self._entries[key])
+        return entries
+
+    def claim(self, entry):
+        """
+        Remove an entry before firing it; only one claimer succeeds.
+        """
+        key = entry_key(entry["auction_id"], entry["action"], entry["due_ms"])
+        if self._entries.pop(key, None) is None:
+            return False
+        while self._heap and self._heap[0][1] not in self._entries:
+            heapq.heappop(self._heap)
+        return True
+
+
+class DynamoScheduleStore:
+    """
+    Time-indexed schedule table: one partition per SCHEDULE_BUCKET_MS slot,
+    entries sorted by due time inside it.
+    """
+
+    def __init__(self, table=None):
+        self.table = table or instrument_client(boto3.resource("dynamodb")).Table(
+            SCHEDULE_TABLE
+        )
+
+    def put(self, auction_id, action, due_ms, attempts=0):
+        self.table.put_item(
+            Item={
+                "bucket": due_ms // SCHEDULE_BUCKET_MS,
+                "entry_key": entry_key(auction_id, action, due_ms),
+                "auction_id": auction_id,
+                "action": action,
+                "due_ms": due_ms,
+                "attempts": attempts,
+            }
+        )
+
+    def delete(self, auction_id, action, due_ms):
+        self.table.delete_item(
+            Key={
+                "bucket": due_ms // SCHEDULE_BUCKET_MS,
+                "entry_key": entry_key(auction_id, action, due_ms),
+            }
+        )
+
+    def due(self, until_ms):
+        """
+        Return entries due at or before until_ms, earliest first.
+
+        Every call sweeps the SCHEDULE_LOOKBACK_MS of buckets before
+        until_ms. Entries only leave the table once claimed, so this finds
+        entries due while no dispatcher was running as well as entries
+        written into a bucket an earlier call already scanned, e.g. a
+        trailing broadcast due within the current tick or a past-due start.
+        """
+        last_bucket = until_ms // SCHEDULE_BUCKET_MS
+        first_bucket = (until_ms - SCHEDULE_LOOKBACK_MS) // SCHEDULE_BUCKET_MS
+
+        entries = []
+        upper_key = f"{until_ms:013d}~"
+        for bucket in range(first_bucket, last_bucket + 1):
+            query_kwargs = {
+                "KeyConditionExpression": Key("bucket").eq(bucket)
+                & Key("entry_key").lte(upper_key)
+            }
+            while True:
+                response = self.table.query(**query_kwargs)
+                entries.extend(response.get("Items", []))
+                if "LastEvaluatedKey" not in response:
+                    break
+                query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        for entry in entries:
+            entry["due_ms"] = int(entry["due_ms"])
+            entry["attempts"] = int(entry.get("attempts", 0))
+        return sorted(entries, key=lambda entry: entry["due_ms"])
+
+    def claim(self, entry):
+        """
+        Delete an entry before firing it; only one dispatcher succeeds.
+        """
+        try:
+            self.table.delete_item(
+                Key={
+                    "bucket": entry["due_ms"] // SCHEDULE_BUCKET_MS,
+                    "entry_key": entry_key(
+                        entry["auction_id"], entry["action"], entry["due_ms"]
+                    ),
+                },
+                ConditionExpression="attribute_exists(entry_key)",
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+
+
+_default_store = None
+
+
+def get_default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = DynamoScheduleStore()
+    return _default_store
+
+
+def schedule_action(auction_id, action, due_ms, store=None):
+    """
+    Schedule an auction action to fire at due_ms (epoch milliseconds).
+    """
+    (store or get_default_store()).put(auction_id, action, int(due_ms))
+    logger.info("Scheduled %s for auction %s at %s", action, auction_id, due_ms)
+
+
+def reschedule_action(auction_id, action, old_due_ms, new_due_ms, store=None):
+    """
+    Move a scheduled action, e.g. an auction end after a snipe extension.
+    """
+    store = store or get_default_store()
+    store.put(auction_id, action, int(new_due_ms))
+    store.delete(auction_id, action, int(old_due_ms))
+    logger.info("Rescheduled %s for auction %s to %s", action, auction_id, new_due_ms)
+
+
+def retry_entry(store, entry, now, error):
+    """
+    Put back an entry whose firing failed, SCHEDULE_RETRY_MS after now and
+    doubling with every attempt; after SCHEDULE_MAX_ATTEMPTS it is dropped.
+    """
+    count("schedule_fire_failures")
+    attempts = entry.get("attempts", 0) + 1
+    label = f"{entry['action']} for auction {entry['auction_id']}"
+    if attempts >= SCHEDULE_MAX_ATTEMPTS:
+        logger.error(
+            "Error firing %s, giving up after %d attempts: %s", label, attempts, error
+        )
+        return
+    retry_ms = now + SCHEDULE_RETRY_MS * 2 ** (attempts - 1)
+    logger.warning("Error firing %s: %s; retrying at %d", label, error, retry_ms)
+    try:
+        store.put(entry["auction_id"], entry["action"], retry_ms, attempts=attempts)
+    except Exception as e:
+        logger.error("Error rescheduling %s: %s", label, str(e), exc_info=True)
+
+
+def run_dispatcher(store, fire, until_ms, tick_ms=500, clock=now_ms, sleep=time.sleep):
+    """
+    Fire scheduled entries until until_ms.
+
+    Every tick the store is asked for entries due within the next tick; the
+    dispatcher then sleeps precisely until each entry's due time, claims it
+    and calls fire(entry). Claiming first means overlapping dispatchers never
+    fire the same entry twice; an entry whose firing raises is put back with
+    retry_entry and the remaining entries still fire.
+
+    Returns the list of fired entries with their firing lag in ms.
+    """
+    fired = []
+    while clock() < until_ms:
+        tick_started = clock()
+        for entry in store.due(tick_started + tick_ms):
+            wait_ms = entry["due_ms"] - clock()
+            if wait_ms > 0:
+                sleep(wait_ms / 1000)
+            try:
+                claimed = store.claim(entry)
+            except Exception as e:
+                # Still in the store; the next tick picks it up again
+                logger.warning(
+                    "Error claiming %s for auction %s: %s",
+                    entry["action"],
+                    entry["auction_id"],
+                    str(e),
+                )
+                continue
+            if not claimed:
+                continue
+            try:
+                fire(entry)
+            except Exception as e:
+                retry_entry(store, entry, clock(), e)
+                continue
+            fired.append({**entry, "lag_ms": clock() - entry["due_ms"]})
+
+        remaining_ms = tick_ms - (clock() - tick_started)
+        if remaining_ms > 0:
+            sleep(remaining_ms / 1000)
+    return fired
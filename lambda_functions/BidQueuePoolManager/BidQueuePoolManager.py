@@ -0,0 +1,140 @@
+import os
+import time
+import uuid
+import boto3
+from botocore.exceptions import ClientError
+from metrics_helper import count, instrument_client, instrument_handler, timed
+from log_helper import get_logger, log_event
+from mapping_helper import ensure_mapping, get_batching_config
+from queue_helper import (
+    BID_QUEUE_POOL_TABLE,
+    POOL_AVAILABLE,
+    POOL_PURGING,
+    POOL_RELEASED,
+)
+
+logger = get_logger(__name__)
+
+sqs = instrument_client(boto3.client("sqs"))
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+pool_table = dynamodb.Table(BID_QUEUE_POOL_TABLE)
+
+# Number of ready (AVAILABLE) queue + mapping pairs kept in the pool
+BID_QUEUE_POOL_SIZE = int(os.getenv("BID_QUEUE_POOL_SIZE", "10"))
+# SQS allows one purge per queue per 60s and may take that long to finish
+PURGE_SETTLE_SECONDS = 60
+
+
+def set_status(queue_url, from_status, to_status, timestamp_field):
+    """
+    Move a pool entry between states, unless another run already moved it.
+    """
+    try:
+        pool_table.update_item(
+            Key={"queue_url": queue_url},
+            UpdateExpression=f"SET #status = :to, {timestamp_field} = :now REMOVE auction_id",
+            ConditionExpression="#status = :from",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={
+                ":to": to_status,
+                ":from": from_status,
+                ":now": int(time.time()),
+            },
+        )
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        return False
+
+
+def purge_released(entry):
+    """
+    Drop the bids an ended auction left behind before the queue is reused.
+    """
+    queue_url = entry["queue_url"]
+    try:
+        sqs.purge_queue(QueueUrl=queue_url)
+    except ClientError as e:
+        # A purge is already running; the queue is empty once it finishes
+        if e.response["Error"]["Code"] != "AWS.SimpleQueueService.PurgeQueueInProgress":
+            raise
+    if set_status(queue_url, POOL_RELEASED, POOL_PURGING, "purged_at"):
+        count("queues_purged")
+        print(f"Purging released queue {queue_url}")
+
+
+def restore_purged(entry, now):
+    if now - int(entry.get("purged_at", 0)) < PURGE_SETTLE_SECONDS:
+        return False
+    if set_status(entry["queue_url"], POOL_PURGING, POOL_AVAILABLE, "available_at"):
+        print(f"Queue {entry['queue_url']} is back in the pool")
+        return True
+    return False
+
+
+@timed("queue_create")
+def provision_queue():
+    """
+    Create a FIFO bid queue, map it to the process priority Lambda and add it
+    to the pool as AVAILABLE.
+    """
+    queue_name = f"AuctionBidsPool-{uuid.uuid4()}.fifo"
+    queue_url = sqs.create_queue(
+        QueueName=queue_name,
+        Attributes={"FifoQueue": "true", "ContentBasedDeduplication": "true"},
+    )["QueueUrl"]
+    queue_arn = sqs.get_queue_attributes(
+        QueueUrl=queue_url, AttributeNames=["QueueArn"]
+    )["Attributes"]["QueueArn"]
+    ensure_mapping(queue_arn, get_batching_config(queue_arn))
+    pool_table.put_item(
+        Item={
+            "queue_url": queue_url,
+            "queue_arn": queue_arn,
+            "status": POOL_AVAILABLE,
+            "available_at": int(time.time()),
+        }
+    )
+    count("queues_created")
+    print(f"Added queue {queue_url} to the bid queue pool")
+
+
+def scan_pool():
+    entries = []
+    kwargs = {}
+    while True:
+        response = pool_table.scan(**kwargs)
+        entries.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return entries
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+@instrument_handler
+def lambda_handler(event, context):
+    """
+    Keep BID_QUEUE_POOL_SIZE ready bid queues in the pool (run by a
+    rate(1 minute) rule): purge queues released by ended auctions, return
+    purged ones to the pool and create queues for whatever is still missing.
+    """
+    log_event(logger, event, "bidQueuePool")
+    now = int(time.time())
+    available = 0
+    for entry in scan_pool():
+        status = entry.get("status")
+        if status == POOL_RELEASED:
+            purge_released(entry)
+        elif status == POOL_PURGING:
+            available += restore_purged(entry, now)
+        elif status == POOL_AVAILABLE:
+            available += 1
+
+    missing = max(0, BID_QUEUE_POOL_SIZE - available)
+    for _ in range(missing):
+        provision_queue()
+
+    return {
+        "statusCode": 200,
+        "body": f"Bid queue pool has {available + missing} ready queues.",
+    }
@@ -4,8 +4,12 @@ import boto3
 import base64
 from datetime import datetime
 import pymysql
+from metrics_helper import instrument_client, instrument_handler
+from log_helper import get_logger, log_event
 
-s3_client = boto3.client("s3")
+logger = get_logger(__name__)
+
+s3_client = instrument_client(boto3.client("s3"))
 
 # RDS settings from environment variables
 proxy_host_name = os.environ["DB_HOSTNAME"]
@@ -47,9 +51,10 @@ def upload_to_s3(base64_data, auction_id, filename):
         raise Exception(f"Failed to upload to S3: {str(e)}")
 
 
+@instrument_handler
 def lambda_handler(event, context):
-    # Log the incoming event for debugging
-    print("Received event:", json.dumps(event))
+    # Log the incoming event with product_images summarized by size
+    log_event(logger, event, "editAuction")
 
     try:
         body = json.loads(event.get("body", {}))
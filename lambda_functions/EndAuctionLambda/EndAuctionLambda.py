@@ -1,26 +1,44 @@
 import boto3
 import pymysql
 import json
-from datetime import datetime, time, timezone
+from datetime import datetime, timezone
 import os
 from botocore.exceptions import ClientError
 from decimal import Decimal
-from dateutil import parser
+from auction_engine import rank_leaderboard
+from broadcast_helper import encode_event_message, post_pages_by_format
+from event_log_helper import append_event
+from connection_helper import iter_connection_pages
+from contact_helper import get_user_emails
+from email_template_helper import AUCTION_RESULTS_TEMPLATE, SES_BULK_MODE, send_bulk
+from scheduler_helper import END_AUCTION, schedule_action
+from time_helper import now_ms, to_epoch_ms
+from metrics_helper import instrument_client, instrument_handler, timed
+from log_helper import get_logger, log_event
+from mapping_helper import remove_mapping
+from queue_helper import (
+    auction_queue_name,
+    release_queue,
+    uses_pooled_queues,
+    uses_shared_queues,
+)
+
+logger = get_logger(__name__)
 
-dynamodb = boto3.resource("dynamodb")
-eventbridge_client = boto3.client("events")
+dynamodb = instrument_client(boto3.resource("dynamodb"))
 auction_table = dynamodb.Table("auction-connections")
-apigateway_management_api = boto3.client(
-    "apigatewaymanagementapi", endpoint_url=os.environ["WEBSOCKET_ENDPOINT"]
+apigateway_management_api = instrument_client(
+    boto3.client(
+        "apigatewaymanagementapi", endpoint_url=os.environ["WEBSOCKET_ENDPOINT"]
+    )
 )
-s3 = boto3.client("s3")
-cognito_idp = boto3.client("cognito-idp")
-ses = boto3.client("ses")
-sqs = boto3.client("sqs")
+
+s3 = instrument_client(boto3.client("s3"))
+ses = instrument_client(boto3.client("ses"))
+sqs = instrument_client(boto3.client("sqs"))
 
 
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
-COGNITO_USER_POOL_ID = os.getenv("COGNITO_USER_POOL_ID")
 SES_SENDER_EMAIL = os.getenv("SES_SENDER_EMAIL")
 
 
@@ -30,6 +48,9 @@ rds_db_name = os.environ["DB_NAME"]
 rds_user = os.environ["DB_USERNAME"]
 rds_password = os.environ["DB_PASSWORD"]
 
+# Firing this much before the deadline still counts as on time
+EARLY_TOLERANCE_MS = 1000
+
 
 def convert_decimal_and_timestamp(obj):
     """
@@ -69,6 +90,7 @@ def connect_to_rds():
         raise e
 
 
+@timed("rds_update")
 def update_rds(auction_id, is_active):
     try:
         connection = connect_to_rds()
@@ -91,27 +113,48 @@ def update_rds(auction_id, is_active):
             connection.close()
 
 
-def get_user_email(user_id):
+def send_email_bulk(top_bidders, auction_item, bidders_to_show, bidders_text):
     """
-    Fetch the email of a user from Cognito User Pool using their user_id.
+    Send the results to every top bidder with one bulk templated call.
     """
-    try:
-        response = cognito_idp.admin_get_user(
-            UserPoolId=COGNITO_USER_POOL_ID, Username=user_id
+    default_data = {
+        "user_name": "Participant",
+        "auction_item": auction_item,
+        "bidders_text": bidders_text,
+        "bidders": [
+            {
+                "rank": i + 1,
+                "user_name": bidder["user_name"],
+                "bid_amount": f"{bidder['bid_amount']:.2f}",
+                "row_color": "#f9f9f9" if i % 2 == 0 else "#ffffff",
+            }
+            for i, bidder in enumerate(top_bidders[:bidders_to_show])
+        ],
+    }
+    destinations = []
+    for bidder in top_bidders:
+        if not bidder.get("email"):
+            print(f"Skipping bidder without email: {bidder}")
+            continue
+        destinations.append(
+            (bidder["email"], {"user_name": bidder.get("user_name", "Participant")})
         )
-        for attribute in response["UserAttributes"]:
-            if attribute["Name"] == "email":
-                return attribute["Value"]
-    except ClientError as e:
-        print(f"Error fetching email for user {user_id}: {str(e)}")
-    return None
+    if not destinations:
+        return
+    results = send_bulk(AUCTION_RESULTS_TEMPLATE, default_data, destinations)
+    for (email, _), ok in zip(destinations, results):
+        print(f"Email {'sent' if ok else 'failed'} to {email}")
 
 
+@timed("winner_email")
 def send_email(top_bidders, auction_item):
     try:
         num_bidders = len(top_bidders)
         bidders_to_show = min(num_bidders, 3)
         bidders_text = f"Here are the top {bidders_to_show} bidders:"
+        if SES_BULK_MODE:
+            send_email_bulk(top_bidders, auction_item, bidders_to_show, bidders_text)
+            return
 
         leaderboard_table = "\n".join(
             [
@@ -177,68 +220,38 @@ def send_email(top_bidders, auction_item):
         print(f"Error sending email: {str(e)}")
 
 
-def delete_eventbridge_rule(rule_name):
-    try:
-        targets_response = eventbridge_client.list_targets_by_rule(Rule=rule_name)
-        target_ids = [target["Id"] for target in targets_response.get("Targets", [])]
-
-        if target_ids:
-            eventbridge_client.remove_targets(Rule=rule_name, Ids=target_ids)
-            print(f"Removed targets from rule: {rule_name} and its id {target_ids}")
-
-        eventbridge_client.delete_rule(Name=rule_name)
-        print(f"Deleted rule: {rule_name}")
-    except eventbridge_client.exceptions.ResourceNotFoundException:
-        print(f"Rule {rule_name} not found. Nothing to delete.")
-    except Exception as e:
-        print(f"Error deleting rule {rule_name}: {str(e)}")
-        raise
-
-
+@timed("notify_connections")
 def send_websocket_message(auction_id, message):
     """
     Sends a WebSocket message to the all client connected to particular auction using API Gateway Management API.
     """
     try:
-        user_connections_table = dynamodb.Table("user-connections")
-
-        response = user_connections_table.scan(
-            FilterExpression="auction_id = :auction_id",
-            ExpressionAttributeValues={":auction_id": auction_id},
+        # Logged even without viewers, so resuming clients can replay it
+        payloads = append_event(
+            auction_id, lambda fmt, seq: encode_event_message(message, fmt, seq)
         )
-        connections = response.get("Items", [])
-        print(f"Connections {connections}")
-
-        if not connections:
+        # Send message to all connected clients, page by page from the GSI
+        stats = post_pages_by_format(
+            apigateway_management_api,
+            auction_id,
+            iter_connection_pages(auction_id),
+            payloads.get,
+        )
+        if not (stats["sent"] or stats["failed"] or stats["gone"]):
             print(f"No active connections for auction {auction_id}.")
-        else:
-
-            for connection in connections:
-                connection_id = connection["connection_id"]
-                apigateway_management_api.post_to_connection(
-                    ConnectionId=connection_id,
-                    Data=json.dumps(message),
-                )
-
-    except boto3.exceptions.Boto3Error as e:
-        print(f"WebSocket error: {str(e)}")
-        if "GoneException" in str(e):
-            print(f"Connection {connection_id} is no longer valid.")
-
     except Exception as e:
         print(f"Unexpected error sending WebSocket message: {str(e)}")
 
 
 def get_top_bidders(leaderboard_data):
     """
-    Fetch the top bidders by bid_amount from leaderboard_data.
+    Fetch the top bidders from leaderboard_data, ranked like the live
+    leaderboard (earliest bid first on equal amounts).
     If participants are less than 3, return only up to 2 bidders.
     """
     try:
 
-        sorted_bids = sorted(
-            leaderboard_data, key=lambda x: x["bid_amount"], reverse=True
-        )
+        sorted_bids = rank_leaderboard(leaderboard_data)
 
         max_bidders = 3 if len(sorted_bids) >= 3 else 2
 
@@ -250,6 +263,7 @@ def get_top_bidders(leaderboard_data):
         return []
 
 
+@timed("archive")
 def save_to_s3(bucket_name, auction_id, data):
     """
     Save auction data to S3 in JSON format.
@@ -294,11 +308,16 @@ def delete_sqs_queue(auction_id):
     """
     Deletes the specified SQS queue dynamically based on the auction_id.
     """
-    queue_name = f"AuctionActionsQueue-{auction_id}.fifo"
+    queue_name = auction_queue_name(auction_id)
     try:
         response = sqs.get_queue_url(QueueName=queue_name)
         queue_url = response["QueueUrl"]
+        queue_arn = sqs.get_queue_attributes(
+            QueueUrl=queue_url, AttributeNames=["QueueArn"]
+        )["Attributes"]["QueueArn"]
 
+        # Drop the trigger too, or it outlives the queue in the Lambda's list
+        remove_mapping(queue_arn)
         sqs.delete_queue(QueueUrl=queue_url)
         print(f"Queue {queue_name} has been deleted successfully.")
     except ClientError as e:
@@ -307,8 +326,9 @@ def delete_sqs_queue(auction_id):
         print(f"Unexpected error deleting queue {queue_name}: {str(e)}")
 
 
+@instrument_handler
 def lambda_handler(event, context):
-    print(f"Received event: {json.dumps(event)}")
+    log_event(logger, event, "endAuction")
     auction_id = event["auction_id"]
     auction_data = auction_table.get_item(Key={"auction_id": auction_id}).get("Item")
 
@@ -324,15 +344,22 @@ def lambda_handler(event, context):
             "body": json.dumps({"error": "Auction does not have a start time."}),
         }
 
-    end_time = parser.parse(end_time_str)
-    current_time = datetime.now(timezone.utc)
-    sleep_duration = (end_time - current_time).total_seconds()
+    if auction_data.get("auction_status") == "ENDED":
+        print(f"Auction {auction_id} has already ended.")
+        return {
+            "statusCode": 200,
+            "body": json.dumps({"message": f"Auction {auction_id} already ended."}),
+        }
 
-    if sleep_duration > 0:
-        print(f"Sleeping for {sleep_duration} seconds until auction start time.")
-        time.sleep(sleep_duration)
-    else:
-        print(f"Auction {auction_id} start time has already passed.")
+    # The scheduler fires this Lambda at the end time instead of it sleeping
+    end_ms = to_epoch_ms(end_time_str)
+    if end_ms - now_ms() > EARLY_TOLERANCE_MS:
+        # The end moved (e.g. a snipe extension); re-arm instead of sleeping
+        schedule_action(auction_id, END_AUCTION, end_ms)
+        return {
+            "statusCode": 202,
+            "body": json.dumps({"message": f"Auction {auction_id} end rescheduled."}),
+        }
 
     auction_table.update_item(
         Key={"auction_id": auction_id},
@@ -356,12 +383,6 @@ def lambda_handler(event, context):
 
     save_to_s3(S3_BUCKET_NAME, auction_id, leaderboard_data)
 
-    participant_emails = []
-    for participant in leaderboard_data:
-        email = get_user_email(participant["user_id"])
-        if email:
-            participant_emails.append(email)
-
     message = {
         "auction_id": auction_id,
         "auction_status": "ENDED",
@@ -374,18 +395,22 @@ def lambda_handler(event, context):
     for i, bidder in enumerate(top_bidders, start=1):
         print(f"{i}. User: {bidder['user_name']}, Bid Amount: {bidder['bid_amount']}")
 
+    # One query for all top bidders instead of a Cognito call per bidder
+    connection = connect_to_rds()
+    emails = get_user_emails(connection, [bidder["user_id"] for bidder in top_bidders])
     for bidder in top_bidders:
-        bidder["email"] = get_user_email(bidder["user_id"])
+        bidder["email"] = emails.get(bidder["user_id"])
 
     send_email(top_bidders, auction_item)
 
-    connection = connect_to_rds()
     with connection.cursor() as cursor:
         cursor.execute(
             "UPDATE auction SET is_active = 0 WHERE auction_id = %s", (auction_id,)
         )
         connection.commit()
 
-    delete_eventbridge_rule(f"EndAuction_{auction_id}")
-
-    delete_sqs_queue(auction_id)
+    # Shared bid queues outlive every auction; pooled ones are purged and reused
+    if uses_pooled_queues() and auction_data.get("bid_queue_url"):
+        release_queue(auction_data["bid_queue_url"], auction_id)
+    elif not uses_shared_queues():
+        delete_sqs_queue(auction_id)
@@ -0,0 +1,43 @@
+import os
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from metrics_helper import count, instrument_client, stage
+
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+
+USER_CONNECTIONS_TABLE = os.getenv("USER_CONNECTIONS_TABLE", "user-connections")
+CONNECTIONS_INDEX = "auction_id-index"
+# Connections per GSI page; smaller pages start the fan-out sooner, at the
+# cost of more Query calls for large auctions
+CONNECTION_PAGE_SIZE = int(os.getenv("CONNECTION_PAGE_SIZE", "1000"))
+
+
+def iter_connection_pages(auction_id):
+    """
+    Yield an auction's connections from the auction_id-index GSI page by page.
+
+    Only connection_id and format (the wire format post_by_format groups by)
+    are read, and LastEvaluatedKey is followed so auctions larger than one
+    page reach every viewer.
+    """
+    table = dynamodb.Table(USER_CONNECTIONS_TABLE)
+    kwargs = {
+        "IndexName": CONNECTIONS_INDEX,
+        "KeyConditionExpression": Key("auction_id").eq(auction_id),
+        "ProjectionExpression": "connection_id, #fmt",
+        "ExpressionAttributeNames": {"#fmt": "format"},
+    }
+    if CONNECTION_PAGE_SIZE > 0:
+        kwargs["Limit"] = CONNECTION_PAGE_SIZE
+    while True:
+        with stage("connection_lookup"):
+            response = table.query(**kwargs)
+        items = response.get("Items", [])
+        count("connection_pages")
+        if items:
+            yield items
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return
+        kwargs["ExclusiveStartKey"] = last_key
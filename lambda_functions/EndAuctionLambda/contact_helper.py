@@ -0,0 +1,92 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+from metrics_helper import count, instrument_client, stage
+
+cognito_idp = instrument_client(boto3.client("cognito-idp"))
+
+COGNITO_USER_POOL_ID = os.getenv("COGNITO_USER_POOL_ID")
+# user_ids per SELECT ... WHERE user_id IN (...) statement
+USER_LOOKUP_CHUNK_SIZE = int(os.getenv("USER_LOOKUP_CHUNK_SIZE", "500"))
+# Concurrent admin_get_user calls for users without a stored email
+COGNITO_LOOKUP_WORKERS = int(os.getenv("COGNITO_LOOKUP_WORKERS", "8"))
+
+
+def get_cognito_email(user_id):
+    """
+    Fetch the email of a user from Cognito User Pool using their user_id.
+
+    Returns (email, verified); email is None if it could not be retrieved.
+    """
+    try:
+        response = cognito_idp.admin_get_user(
+            UserPoolId=COGNITO_USER_POOL_ID, Username=user_id
+        )
+        attributes = {a["Name"]: a["Value"] for a in response["UserAttributes"]}
+        return attributes.get("email"), attributes.get("email_verified") == "true"
+    except ClientError as e:
+        print(f"Error fetching email for user {user_id}: {str(e)}")
+    return None, False
+
+
+def fetch_cognito_emails(connection, user_ids):
+    """
+    Resolve users without a stored email through Cognito, concurrently.
+
+    Verified addresses are written back to the users table so the next
+    lookup for the same users is a plain query.
+    """
+    emails = {}
+    verified = []
+    if not user_ids or not COGNITO_USER_POOL_ID:
+        return emails
+
+    count("email_cognito_lookups", len(user_ids))
+    workers = max(1, min(COGNITO_LOOKUP_WORKERS, len(user_ids)))
+    with stage("email_cognito_lookup"), ThreadPoolExecutor(workers) as executor:
+        for user_id, (email, is_verified) in zip(
+            user_ids, executor.map(get_cognito_email, user_ids)
+        ):
+            if email:
+                emails[user_id] = email
+                if is_verified:
+                    verified.append((email, user_id))
+
+    if verified:
+        try:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    "UPDATE users SET email = %s WHERE user_id = %s", verified
+                )
+            connection.commit()
+        except Exception as e:
+            print(f"Error storing emails of {len(verified)} users: {str(e)}")
+    return emails
+
+
+def get_user_emails(connection, user_ids):
+    """
+    Resolve many user ids to emails with one query per USER_LOOKUP_CHUNK_SIZE
+    ids, falling back to Cognito only for users without a stored email.
+
+    The connection must use DictCursor. Returns {user_id: email}; users
+    whose email is unknown are left out.
+    """
+    user_ids = list(dict.fromkeys(user_id for user_id in user_ids if user_id))
+    emails = {}
+    with stage("email_lookup"), connection.cursor() as cursor:
+        for start in range(0, len(user_ids), USER_LOOKUP_CHUNK_SIZE):
+            chunk = user_ids[start : start + USER_LOOKUP_CHUNK_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"SELECT user_id, email FROM users WHERE user_id IN ({placeholders}) AND email IS NOT NULL",
+                chunk,
+            )
+            for row in cursor.fetchall():
+                emails[row["user_id"]] = row["email"]
+
+    missing = [user_id for user_id in user_ids if user_id not in emails]
+    emails.update(fetch_cognito_emails(connection, missing))
+    return emails
@@ -0,0 +1,183 @@
+import json
+import os
+
+import boto3
+from botocore.exceptions import ClientError
+from metrics_helper import count, instrument_client, stage
+
+ses = instrument_client(boto3.client("ses"))
+
+SES_SENDER_EMAIL = os.getenv("SES_SENDER_EMAIL")
+# Send through registered templates with send_bulk_templated_email instead
+# of one send_email per recipient
+SES_BULK_MODE = os.getenv("SES_BULK_MODE", "true").lower() == "true"
+# SES accepts at most 50 destinations per send_bulk_templated_email call
+SES_BULK_DESTINATIONS = 50
+
+# Template names carry a version; change it whenever a template changes so
+# running functions never send a half-updated one
+NEW_AUCTION_TEMPLATE = "NewAuctionNotification_v1"
+AUCTION_STARTED_TEMPLATE = "AuctionStartedNotification_v1"
+AUCTION_RESULTS_TEMPLATE = "AuctionResults_v1"
+
+TEMPLATES = {
+    NEW_AUCTION_TEMPLATE: {
+        "SubjectPart": "New Auction Created: {{auction_item}}",
+        "HtmlPart": """
+            <html>
+                <body style="font-family: Arial, sans-serif; line-height: 1.6; background-color: #f4f4f4; padding: 20px;">
+                    <div style="max-width: 600px; margin: 0 auto; background: #ffffff; padding: 20px;
+                                        border-radius: 8px; box-shadow: 0 2px 5px rgba(0,0,0,0.1);">
+                        <h2 style="color: #333;">Hi {{user_name}},</h2>
+                        <p style="color: #555;">We are excited to announce a new auction!</p>
+                        <p style="color: #555;">Here are the details of the newly created auction:</p>
+                        <table style="width: 100%; border-collapse: collapse; margin: 20px 0; background-color: #fdfdfd;">
+                            <tr><th style="text-align: left; padding: 10px;">Auction Item:</th><td style="padding: 10px;">{{auction_item}}</td></tr>
+                            <tr><th style="text-align: left; padding: 10px;">Description:</th><td style="padding: 10px;">{{auction_desc}}</td></tr>
+                            <tr><th style="text-align: left; padding: 10px;">Base Price:</th><td style="padding: 10px;">${{base_price}}</td></tr>
+                            <tr><th style="text-align: left; padding: 10px;">Start Time:</th><td style="padding: 10px;">{{start_time}}</td></tr>
+                            <tr><th style="text-align: left; padding: 10px;">End Time:</th><td style="padding: 10px;">{{end_time}}</td></tr>
+                            <tr><th style="text-align: left; padding: 10px;">Created By:</th><td style="padding: 10px;">{{created_by}}</td></tr>
+                        </table>
+                        <p style="color: #555;">Get ready to place your bids and enjoy the excitement of the auction!</p>
+                        <div style="text-align: center; margin-top: 20px;">
+                            <a href="https://flash-bids.com/auctions/{{auction_id}}" style="background-color: #007bff; color: white;
+                                                text-decoration: none; padding: 10px 20px; border-radius: 5px; display: inline-block;">View Auction</a>
+                        </div>
+                        <p style="color: #aaa; font-size: 12px; text-align: center; margin-top: 20px;">&copy; 2024 Auction Platform, All rights reserved.</p>
+                    </div>
+                </body>
+            </html>
+            """,
+    },
+    AUCTION_STARTED_TEMPLATE: {
+        "SubjectPart": "Auction Started: {{auction_item}}",
+        "HtmlPart": """
+            <html>
+                <body style="font-family: Arial, sans-serif; line-height: 1.6; background-color: #f4f4f4; padding: 20px;">
+                    <div style="max-width: 600px; margin: 0 auto; background: #ffffff; padding: 20px;
+                                        border-radius: 8px; box-shadow: 0 2px 5px rgba(0,0,0,0.1);">
+                        <h2 style="color: #333;">Hi {{user_name}},</h2>
+                        <p style="color: #555;">An auction you are watching has just started!</p>
+                        <table style="width: 100%; border-collapse: collapse; margin: 20px 0; background-color: #fdfdfd;">
+                            <tr><th style="text-align: left; padding: 10px;">Auction Item:</th><td style="padding: 10px;">{{auction_item}}</td></tr>
+                            <tr><th style="text-align: left; padding: 10px;">Base Price:</th><td style="padding: 10px;">${{base_price}}</td></tr>
+                            <tr><th style="text-align: left; padding: 10px;">End Time:</th><td style="padding: 10px;">{{end_time}}</td></tr>
+                        </table>
+                        <p style="color: #555;">Place your bids before it ends!</p>
+                        <div style="text-align: center; margin-top: 20px;">
+                            <a href="https://flash-bids.com/auctions/{{auction_id}}" style="background-color: #007bff; color: white;
+                                                text-decoration: none; padding: 10px 20px; border-radius: 5px; display: inline-block;">Join Auction</a>
+                        </div>
+                        <p style="color: #aaa; font-size: 12px; text-align: center; margin-top: 20px;">&copy; 2024 Auction Platform, All rights reserved.</p>
+                    </div>
+                </body>
+            </html>
+            """,
+    },
+    AUCTION_RESULTS_TEMPLATE: {
+        "SubjectPart": "Results for the Auction {{auction_item}}",
+        "HtmlPart": """
+            <html>
+                <body style="font-family: Arial, sans-serif; line-height: 1.6; background-color: #f4f4f4; padding: 20px;">
+                    <div style="max-width: 600px; margin: 0 auto; background: #ffffff; padding: 20px;
+                                        border-radius: 8px; box-shadow: 0 2px 5px rgba(0,0,0,0.1);">
+                        <h2 style="color: #333;">Hi {{user_name}},</h2>
+                        <p style="color: #555;">Thank you for taking part in the auction.</p>
+                        <p style="color: #555;">The auction for <strong style="color: #007bff;">{{auction_item}}</strong> has ended. {{bidders_text}}</p>
+                        <table style="width: 100%; border-collapse: collapse; margin: 20px 0; background-color: #fdfdfd;">
+                            <thead>
+                                <tr style="background-color: #007bff; color: white;">
+                                    <th style="padding: 10px; border: 1px solid #ddd;">Rank</th>
+                                    <th style="padding: 10px; border: 1px solid #ddd;">User Name</th>
+                                    <th style="padding: 10px; border: 1px solid #ddd; text-align: right;">Bid Amount</th>
+                                </tr>
+                            </thead>
+                            <tbody>
+                                {{#each bidders}}
+                                <tr style="background-color: {{row_color}};">
+                                    <td style="padding: 10px; border: 1px solid #ddd; text-align: center;">{{rank}}</td>
+                                    <td style="padding: 10px; border: 1px solid #ddd;">{{user_name}}</td>
+                                    <td style="padding: 10px; border: 1px solid #ddd; text-align: right;">${{bid_amount}}</td>
+                                </tr>
+                                {{/each}}
+                            </tbody>
+                        </table>
+                        <p style="color: #555;">We hope to see you again in future auctions!</p>
+                        <div style="text-align: center; margin-top: 20px;">
+                            <a href="https://flash-bids.com/dashboard" style="background-color: #007bff; color: white;
+                                            text-decoration: none; padding: 10px 20px; border-radius: 5px; display: inline-block;">View More Auctions</a>
+                        </div>
+                        <p style="color: #aaa; font-size: 12px; text-align: center; margin-top: 20px;">&copy; 2024 Auction Platform, All rights reserved.</p>
+                    </div>
+                </body>
+            </html>
+            """,
+    },
+}
+
+# Templates known to exist in SES, kept across warm invocations
+_registered = set()
+
+
+def ensure_template(name):
+    """
+    Register a template with SES unless this container already confirmed it.
+    """
+    if name in _registered:
+        return
+    try:
+        ses.get_template(TemplateName=name)
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "TemplateDoesNotExist":
+            raise
+        try:
+            ses.create_template(Template={"TemplateName": name, **TEMPLATES[name]})
+            print(f"Registered SES template {name}")
+        except ClientError as e:
+            # Another container registered it first
+            if e.response["Error"]["Code"] != "AlreadyExists":
+                raise
+    _registered.add(name)
+
+
+def send_bulk(template, default_data, destinations):
+    """
+    Send a registered template to many recipients with
+    send_bulk_templated_email, SES_BULK_DESTINATIONS per call.
+
+    destinations is a list of (email, data) pairs; data is merged over
+    default_data for that recipient.
+
+    Returns one bool per destination, True when SES accepted it.
+    """
+    ensure_template(template)
+    results = []
+    for start in range(0, len(destinations), SES_BULK_DESTINATIONS):
+        chunk = destinations[start : start + SES_BULK_DESTINATIONS]
+        try:
+            with stage("ses_bulk_send"):
+                response = ses.send_bulk_templated_email(
+                    Source=SES_SENDER_EMAIL,
+                    Template=template,
+                    DefaultTemplateData=json.dumps(default_data, default=str),
+                    Destinations=[
+                        {
+                            "Destination": {"ToAddresses": [email]},
+                            "ReplacementTemplateData": json.dumps(data, default=str),
+                        }
+                        for email, data in chunk
+                    ],
+                )
+            statuses = response.get("Status", [])
+            results.extend(
+                index < len(statuses) and statuses[index].get("Status") == "Success"
+                for index in range(len(chunk))
+            )
+        except ClientError as e:
+            print(f"Error sending bulk email with {template}: {str(e)}")
+            results.extend([False] * len(chunk))
+
+    count("emails_sent", sum(results))
+    count("emails_failed", len(results) - sum(results))
+    return results
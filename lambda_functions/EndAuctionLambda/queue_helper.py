@@ -0,0 +1,135 @@
+import os
+import time
+import zlib
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from metrics_helper import instrument_client
+
+# "per_auction": each auction gets its own FIFO queue and event source mapping.
+# "shared": all auctions publish to a few long-lived FIFO queues (created and
+# mapped to the priority queue Lambda once, outside the auction lifecycle);
+# MessageGroupId=auction_id keeps every auction's bids in order.
+# "pooled": per-auction queues leased from a warm pool kept topped up by the
+# BidQueuePoolManager Lambda; the leased URL is stored on the auction item.
+BID_QUEUE_MODE = os.getenv("BID_QUEUE_MODE", "per_auction")
+SHARED_BID_QUEUE_URLS = [
+    url.strip()
+    for url in os.getenv("SHARED_BID_QUEUE_URLS", "").split(",")
+    if url.strip()
+]
+AUCTION_QUEUE_PREFIX = "AuctionActionsQueue-"
+BID_QUEUE_POOL_TABLE = os.getenv("BID_QUEUE_POOL_TABLE", "bid-queue-pool")
+
+# Pool entry states: ready to lease, leased to an auction, released by an
+# ended auction and awaiting a purge, and purged (purge_queue takes up to 60s)
+POOL_AVAILABLE = "AVAILABLE"
+POOL_LEASED = "LEASED"
+POOL_RELEASED = "RELEASED"
+POOL_PURGING = "PURGING"
+# Candidates read per lease attempt; several leasers race for the same items
+POOL_LEASE_CANDIDATES = 5
+
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+
+
+def uses_shared_queues():
+    return BID_QUEUE_MODE == "shared"
+
+
+def uses_pooled_queues():
+    return BID_QUEUE_MODE == "pooled"
+
+
+def auction_queue_name(auction_id):
+    return f"{AUCTION_QUEUE_PREFIX}{auction_id}.fifo"
+
+
+def auction_id_from_queue(queue_url_or_arn):
+    """
+    Return the auction a per-auction queue belongs to, or None for shared,
+    pooled and other queues.
+    """
+    name = queue_url_or_arn.rsplit("/", 1)[-1].rsplit(":", 1)[-1]
+    if name.startswith(AUCTION_QUEUE_PREFIX) and name.endswith(".fifo"):
+        return name[len(AUCTION_QUEUE_PREFIX) : -len(".fifo")]
+    return None
+
+
+def shared_queue_url(auction_id):
+    """
+    Pick the shared queue for an auction.
+
+    crc32 rather than hash() so every container maps an auction to the same
+    queue, which per-auction ordering relies on.
+    """
+    if not SHARED_BID_QUEUE_URLS:
+        raise ValueError(
+            "SHARED_BID_QUEUE_URLS must be set when BID_QUEUE_MODE is shared"
+        )
+    index = zlib.crc32(auction_id.encode("utf-8")) % len(SHARED_BID_QUEUE_URLS)
+    return SHARED_BID_QUEUE_URLS[index]
+
+
+def lease_queue(auction_id):
+    """
+    Lease a ready queue and mapping from the pool to an auction.
+
+    Returns the queue URL, or None when the pool is empty and the auction has
+    to fall back to creating its own queue.
+    """
+    table = dynamodb.Table(BID_QUEUE_POOL_TABLE)
+    candidates = table.query(
+        IndexName="status-index",
+        KeyConditionExpression=Key("status").eq(POOL_AVAILABLE),
+        Limit=POOL_LEASE_CANDIDATES,
+    ).get("Items", [])
+    for candidate in candidates:
+        try:
+            table.update_item(
+                Key={"queue_url": candidate["queue_url"]},
+                UpdateExpression="SET #status = :leased, auction_id = :auction_id, leased_at = :now",
+                ConditionExpression="#status = :available",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={
+                    ":leased": POOL_LEASED,
+                    ":available": POOL_AVAILABLE,
+                    ":auction_id": auction_id,
+                    ":now": int(time.time()),
+                },
+            )
+            print(f"Leased queue {candidate['queue_url']} to auction {auction_id}")
+            return candidate["queue_url"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+    print(f"Bid queue pool is empty, auction {auction_id} gets its own queue")
+    return None
+
+
+def release_queue(queue_url, auction_id):
+    """
+    Hand a leased queue back to the pool; the pool manager purges it before
+    it is leased again.
+    """
+    try:
+        dynamodb.Table(BID_QUEUE_POOL_TABLE).update_item(
+            Key={"queue_url": queue_url},
+            UpdateExpression="SET #status = :released, released_at = :now",
+            ConditionExpression="#status = :leased AND auction_id = :auction_id",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={
+                ":released": POOL_RELEASED,
+                ":leased": POOL_LEASED,
+                ":auction_id": auction_id,
+                ":now": int(time.time()),
+            },
+        )
+        print(f"Released queue {queue_url} from auction {auction_id}")
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        print(f"Queue {queue_url} was not leased to auction {auction_id}")
+        return False
@@ -3,9 +3,13 @@ import base64
 import boto3
 import os
 import pymysql  # Or the database driver you're using
+from metrics_helper import instrument_client, instrument_handler
+from log_helper import get_logger, log_event
 
 # S3 client
-s3_client = boto3.client("s3")
+logger = get_logger(__name__)
+
+s3_client = instrument_client(boto3.client("s3"))
 
 # Database connection details
 proxy_host_name = os.environ["DB_HOSTNAME"]
@@ -16,8 +20,9 @@ db_password = os.environ["DB_PASSWORD"]
 S3_BUCKET_NAME = os.environ["S3_BUCKET_NAME"]
 
 
+@instrument_handler
 def lambda_handler(event, context):
-    print(f"Received event: {json.dumps(event)}")
+    log_event(logger, event, "getAuction")
 
     # Get query parameters
     mode = "all_auction"  # Default to 'all_auction'
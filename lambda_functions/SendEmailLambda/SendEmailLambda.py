@@ -2,11 +2,34 @@ import json
 import os
 import boto3
 from botocore.exceptions import ClientError
+from metrics_helper import instrument_client, instrument_handler
+from email_template_helper import (
+    AUCTION_STARTED_TEMPLATE,
+    NEW_AUCTION_TEMPLATE,
+    SES_BULK_MODE,
+    send_bulk,
+)
 
-ses = boto3.client("ses")
+ses = instrument_client(boto3.client("ses"))
 
 SES_SENDER_EMAIL = os.getenv("SES_SENDER_EMAIL")
 
+# Auction fields the new-auction template renders
+AUCTION_FIELDS = (
+    "auction_id",
+    "auction_item",
+    "auction_desc",
+    "base_price",
+    "start_time",
+    "end_time",
+    "created_by",
+)
+# Template per notification kind; records without one announce a new auction
+NOTIFICATION_TEMPLATES = {
+    "created": NEW_AUCTION_TEMPLATE,
+    "started": AUCTION_STARTED_TEMPLATE,
+}
+
 
 def send_new_auction_email(recipients, auction_details):
     try:
@@ -65,9 +88,73 @@ def send_new_auction_email(recipients, auction_details):
         print(f"Error sending email: {str(e)}")
 
 
+def send_batch_bulk(records):
+    """
+    Send the notification emails of an SQS batch as bulk templated sends.
+
+    Records are grouped by notification kind and auction, so each group
+    shares the template's default data and only the recipient's name varies.
+
+    Returns the messageIds of records to retry.
+    """
+    failures = []
+    groups = {}
+    for record in records:
+        try:
+            message = json.loads(record["body"])
+            auction_details = message["auction_details"]
+            email = message["email"]
+            template = NOTIFICATION_TEMPLATES[message.get("notification", "created")]
+        except (KeyError, ValueError) as e:
+            # Retrying cannot fix a malformed record, so it is dropped
+            print(
+                f"Skipping invalid notification record {record.get('messageId')}: {str(e)}"
+            )
+            continue
+        group = groups.setdefault(
+            (template, auction_details.get("auction_id")),
+            {
+                "default_data": {
+                    "user_name": "Participant",
+                    **{field: auction_details.get(field) for field in AUCTION_FIELDS},
+                },
+                "records": [],
+                "destinations": [],
+            },
+        )
+        group["records"].append(record["messageId"])
+        group["destinations"].append(
+            (email, {"user_name": message.get("user_name") or "Participant"})
+        )
+
+    for (template, _), group in groups.items():
+        results = send_bulk(template, group["default_data"], group["destinations"])
+        failures.extend(
+            message_id for message_id, ok in zip(group["records"], results) if not ok
+        )
+    return failures
+
+
+@instrument_handler
 def lambda_handler(event, context):
+    if SES_BULK_MODE:
+        failures = send_batch_bulk(event["Records"])
+        print(
+            f"Sent {len(event['Records']) - len(failures)} of {len(event['Records'])} notification emails"
+        )
+        # Requires ReportBatchItemFailures on the event source mapping
+        return {
+            "batchItemFailures": [
+                {"itemIdentifier": message_id} for message_id in failures
+            ]
+        }
+
     for record in event["Records"]:
         message = json.loads(record["body"])
+        if message.get("notification", "created") != "created":
+            # Only new-auction emails have a per-recipient version
+            send_batch_bulk([record])
+            continue
         email = message["email"]
         user_name = message["user_name"]
         auction_details = message["auction_details"]
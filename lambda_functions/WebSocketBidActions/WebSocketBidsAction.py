@@ -1,29 +1,159 @@
 import json
 import boto3
 import os
-from datetime import datetime, timedelta, timezone
-from dateutil import parser
+import time
+import uuid
+from datetime import datetime, timezone
+from boto3.dynamodb.types import TypeDeserializer
 from botocore.exceptions import ClientError
-from time_helper import calculate_remaining_time
-import logging
+from broadcast_helper import encode_status_message, post_pages_by_format
+from event_log_helper import append_event
+from connection_helper import iter_connection_pages
+from scheduler_helper import END_AUCTION, FLUSH_BIDS, reschedule_action, schedule_action
+from time_helper import now_ms, to_epoch_ms
+from auction_engine import ACTIVE_STATUSES, AuctionEngine
+from metrics_helper import (
+    count,
+    instrument_client,
+    instrument_handler,
+    set_property,
+    stage,
+)
+from log_helper import get_logger, log_event
+from queue_helper import (
+    auction_queue_name,
+    shared_queue_url,
+    uses_pooled_queues,
+    uses_shared_queues,
+)
+from mapping_helper import ensure_mapping, get_batching_config
+from coalesce_helper import (
+    BID_COALESCE_WINDOW_MS,
+    BYPASS,
+    FLUSHER,
+    OPENED,
+    coalesce_bid,
+    coalescing_enabled,
+    flush_closed_windows,
+    flush_slot,
+)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
 
 # Initialize AWS services
-sqs = boto3.client("sqs")
-lambda_client = boto3.client("lambda")
-eventbridge_client = boto3.client("events")
+sqs = instrument_client(boto3.client("sqs"))
+lambda_client = instrument_client(boto3.client("lambda"))
 
 # Environment variables
 PROCESS_PRIORITY_LAMBDA_NAME = os.getenv("PROCESS_PRIORITY_LAMBDA_NAME")
 AUCTION_CONNECTIONS_TABLE = os.getenv("AUCTION_CONNECTIONS_TABLE")
-api_gateway = boto3.client(
-    "apigatewaymanagementapi", endpoint_url=os.getenv("WEBSOCKET_ENDPOINT")
+api_gateway = instrument_client(
+    boto3.client(
+        "apigatewaymanagementapi", endpoint_url=os.getenv("WEBSOCKET_ENDPOINT")
+    )
 )
-dynamodb = boto3.resource("dynamodb")
+dynamodb = instrument_client(boto3.resource("dynamodb"))
 auction_table = dynamodb.Table(AUCTION_CONNECTIONS_TABLE)
+deserializer = TypeDeserializer()
+
+# Warm-container caches, entries are (value, expires_at) on the monotonic clock
+QUEUE_URL_CACHE_TTL = int(os.getenv("QUEUE_URL_CACHE_TTL", "300"))
+AUCTION_CACHE_TTL = int(os.getenv("AUCTION_CACHE_TTL", "10"))
+AUCTION_METADATA_FIELDS = (
+    "auction_start_time",
+    "auction_end_time",
+    "auction_status",
+    "snipes_remaining",
+    "default_time_increment",
+    "default_time_increment_before",
+    "bid_queue_url",
+)
+_queue_url_cache = {}
+# Slot each auction's coalesced-bid flush is already scheduled for
+_flush_slots = {}
+_auction_cache = {}
+
+
+def get_queue_url(queue_name):
+    """
+    Resolve an SQS queue URL, reusing the cached value across warm invocations.
+    """
+    cached = _queue_url_cache.get(queue_name)
+    if cached and cached[1] > time.monotonic():
+        count("queue_url_cache_hit")
+        return cached[0]
+
+    with stage("queue_lookup"):
+        queue_url = sqs.get_queue_url(QueueName=queue_name)["QueueUrl"]
+    _queue_url_cache[queue_name] = (queue_url, time.monotonic() + QUEUE_URL_CACHE_TTL)
+    return queue_url
+
+
+def get_auction_metadata(auction_id, refresh=False):
+    """
+    Return the auction fields the bid path needs, cached for AUCTION_CACHE_TTL.
+
+    Returns None when the auction does not exist.
+    """
+    cached = _auction_cache.get(auction_id)
+    if not refresh and cached and cached[1] > time.monotonic():
+        count("auction_cache_hit")
+        return cached[0]
+
+    with stage("auction_lookup"):
+        item = auction_table.get_item(Key={"auction_id": auction_id}).get("Item")
+    if not item:
+        _auction_cache.pop(auction_id, None)
+        return None
+    return cache_auction_metadata(auction_id, item)
+
+
+def cache_auction_metadata(auction_id, item):
+    """
+    Store the bid-path fields of an auction item in the metadata cache.
+    """
+    metadata = {
+        field: item[field] for field in AUCTION_METADATA_FIELDS if field in item
+    }
+    _auction_cache[auction_id] = (metadata, time.monotonic() + AUCTION_CACHE_TTL)
+    return metadata
+
+
+def invalidate_auction_metadata(auction_id):
+    """
+    Drop the cached metadata for an auction after it changes.
+    """
+    _auction_cache.pop(auction_id, None)
+
+
+def load_engine(auction_id, auction_data):
+    """
+    Build the bid-rules engine from cached auction metadata.
+    """
+    return AuctionEngine.from_item(auction_id, auction_data, to_epoch_ms)
+
+
+def is_accepting_bids(auction_id, auction_data):
+    """
+    Check whether an auction accepts bids, refreshing a stale cached entry.
+
+    A cached entry that has not started but whose start time has passed, or
+    a running one whose end time has passed, is re-read once: the auction may
+    have just started or been extended by another container before the TTL
+    ran out.
+    """
+    now = now_ms()
+    engine = load_engine(auction_id, auction_data)
+    if engine.accepts_bids(now):
+        return True, auction_data
+
+    if engine.status != "ENDED" and (
+        engine.status in ACTIVE_STATUSES or engine.start_ms <= now
+    ):
+        auction_data = get_auction_metadata(auction_id, refresh=True)
+        if auction_data:
+            return load_engine(auction_id, auction_data).accepts_bids(now), auction_data
+    return False, auction_data or {}
 
 
 def get_or_create_queue(queue_name):
@@ -62,40 +192,10 @@ def attach_queue_to_lambda(queue_url):
         return
 
     try:
-        # Get the ARN of the queue
+        # One registry read in the common case, however many auctions have
+        # left mappings behind
         queue_arn = get_queue_arn(queue_url)
-
-        # List existing event source mappings for the Lambda function
-        existing_mappings = lambda_client.list_event_source_mappings(
-            FunctionName=PROCESS_PRIORITY_LAMBDA_NAME
-        )
-
-        # Check if a mapping already exists for this queue ARN
-        for mapping in existing_mappings["EventSourceMappings"]:
-            if mapping["EventSourceArn"] == queue_arn:
-                # Check if the mapping is disabled
-                if mapping["State"] != "Enabled":
-                    print(f"Re-enabling event source mapping: {mapping['UUID']}")
-                    lambda_client.update_event_source_mapping(
-                        UUID=mapping["UUID"], Enabled=True
-                    )
-                else:
-                    print(
-                        f"Queue {queue_url} is already mapped to Lambda {PROCESS_PRIORITY_LAMBDA_NAME} and enabled."
-                    )
-                return
-
-        # If no existing mapping is found, create a new one
-        response = lambda_client.create_event_source_mapping(
-            EventSourceArn=queue_arn,
-            FunctionName=PROCESS_PRIORITY_LAMBDA_NAME,
-            BatchSize=1,
-            Enabled=True,
-        )
-        print(
-            f"Attached queue {queue_url} to Lambda {PROCESS_PRIORITY_LAMBDA_NAME}: {response}"
-        )
-
+        ensure_mapping(queue_arn, get_batching_config(queue_arn))
     except ClientError as e:
         print(f"Failed to attach queue {queue_url}: {e.response['Error']['Message']}")
 
@@ -109,205 +209,321 @@ def get_queue_arn(queue_url):
     return response["Attributes"]["QueueArn"]
 
 
-def convert_to_cron(timestamp):
-    try:
-        # Parse timestamp and convert to UTC
-        dt = parser.parse(timestamp).astimezone(timezone.utc)
-
-        # Generate cron expression
-        return f"{dt.minute} {dt.hour} {dt.day} {dt.month} ? {dt.year}"
-    except ValueError as e:
-        raise ValueError(
-            f"Invalid timestamp format: {timestamp}. Expected ISO 8601 format."
-        ) from e
+def extend_auction(auction_id, auction_data, extended_time):
+    """
+    Atomically extend an auction's end time for a bid inside the snipe window.
 
+    The window was checked against the cached end time, so the write is
+    conditioned on that end time still being current and on snipes remaining;
+    DynamoDB applies the decrement server-side. Of several concurrent bidders
+    exactly one write wins; the others fail the condition without a retry
+    and refresh the cache from the returned item.
 
-def update_eventbridge_rule(rule_name, new_time, target_lambda_arn, input_data):
-    """
-    Update an existing EventBridge rule with a new schedule and input.
+    Returns the updated attributes, or None when no extension was applied.
     """
+    new_end_time_str = extended_time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    new_end_time_str = new_end_time_str[:-2] + ":" + new_end_time_str[-2:]
     try:
-        cron_expression = convert_to_cron(new_time)
-        eventbridge_client.put_rule(
-            Name=rule_name,
-            ScheduleExpression=f"cron({cron_expression})",
-            State="ENABLED",
-            Description=f"Updated trigger for auction {input_data['auction_id']} at {new_time}",
-        )
-        eventbridge_client.put_targets(
-            Rule=rule_name,
-            Targets=[
-                {"Id": "1", "Arn": target_lambda_arn, "Input": json.dumps(input_data)}
-            ],
+        response = auction_table.update_item(
+            Key={"auction_id": auction_id},
+            UpdateExpression="SET auction_end_time = :new_end_time, snipes_remaining = snipes_remaining - :one, auction_status = :new_status",
+            ConditionExpression="auction_end_time = :expected_end_time AND snipes_remaining > :zero AND auction_status IN (:started, :sniped)",
+            ExpressionAttributeValues={
+                ":new_end_time": new_end_time_str,
+                ":expected_end_time": auction_data["auction_end_time"],
+                ":one": 1,
+                ":zero": 0,
+                ":new_status": "SNIPED",
+                ":started": "STARTED",
+                ":sniped": "SNIPED",
+            },
+            ReturnValues="UPDATED_NEW",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
         )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        logger.info("Auction %s already extended or out of snipes", auction_id)
+        if e.response.get("Item"):
+            # The failed write returns the current item; refresh the cache from it
+            current = {
+                k: deserializer.deserialize(v) for k, v in e.response["Item"].items()
+            }
+            cache_auction_metadata(auction_id, current)
+        else:
+            invalidate_auction_metadata(auction_id)
+        return None
 
-        print(f"Updated EventBridge rule {rule_name} with new time {new_time}")
-    except Exception as e:
-        print(f"Error updating EventBridge rule: {str(e)}")
-        raise
+    extended = response["Attributes"]
+    cache_auction_metadata(auction_id, {**auction_data, **extended})
+    return extended
 
 
-def process_place_bid(auction_fifo_queue, auction_id, user_id, bid_amount, user_name):
+def process_place_bid(
+    auction_fifo_queue, auction_id, user_id, bid_amount, user_name, auction_data
+):
     """
-    Process a bid placement action.
+    Process a bid placement action against the (cached) auction metadata.
+
+    With coalescing enabled, the first bid of a user's window is enqueued
+    at once and later ones are held in the window; the scheduler flushes the
+    highest held bid once the window closes, so this invocation never waits.
     """
     current_time = datetime.now(timezone.utc)
     timestamp = int(current_time.timestamp())
-
-    bid_message = {
-        "action": "placeBid",
-        "auction_id": auction_id,
-        "user_id": user_id,
-        "user_name": user_name,
-        "bid_amount": bid_amount,
-        "timestamp": timestamp,
-    }
-
-    print(f"Placing Bid for {user_name} of {bid_amount}")
-
-    sqs.send_message(
-        QueueUrl=auction_fifo_queue,
-        MessageBody=json.dumps(bid_message),
-        MessageGroupId=auction_id,
-        MessageDeduplicationId=f"{auction_id}-{user_id}-{bid_amount}-{timestamp}",
-    )
+    now = int(current_time.timestamp() * 1000)
+    engine = load_engine(auction_id, auction_data)
+
+    logger.info("Placing bid for %s of %s", user_name, bid_amount)
+
+    # Lets the consumer broadcast top-bid changes near the end immediately
+    snipe_window = engine.in_snipe_window(now)
+    # Bids close to the end are forwarded directly so none is held past it
+    if coalescing_enabled() and engine.end_ms - now > 2 * BID_COALESCE_WINDOW_MS:
+        with stage("coalesce"):
+            outcome, window_end_ms = coalesce_bid(
+                auction_id,
+                user_id,
+                user_name,
+                bid_amount,
+                timestamp,
+                now,
+                uuid.uuid4().hex,
+            )
+        if outcome == FLUSHER:
+            schedule_bid_flush(auction_id, flush_slot(window_end_ms))
+    else:
+        outcome = OPENED
+
+    if outcome in (OPENED, BYPASS):
+        enqueue_bid(
+            auction_fifo_queue,
+            auction_id,
+            user_id,
+            user_name,
+            bid_amount,
+            timestamp,
+            snipe_window=snipe_window,
+        )
+    else:
+        count("bids_held")
 
     # Handle sniping
-    auction_data = auction_table.get_item(Key={"auction_id": auction_id}).get("Item")
+    extended = None
+    new_end_ms = engine.snipe_extension(now)
+    if new_end_ms:
+        extended_time = datetime.fromtimestamp(new_end_ms / 1000, tz=timezone.utc)
+        with stage("snipe_update"):
+            extended = extend_auction(auction_id, auction_data, extended_time)
+
+    if extended:
+        new_end_time_str = extended["auction_end_time"]
+        auction_status = extended["auction_status"]
+        snipes_remaining = int(extended["snipes_remaining"])
+
+        # Move the scheduled end to the extended deadline
+        with stage("schedule_update"):
+            reschedule_action(
+                auction_id,
+                END_AUCTION,
+                to_epoch_ms(auction_data["auction_end_time"]),
+                to_epoch_ms(new_end_time_str),
+            )
+        logger.info("Auction %s extended to %s", auction_id, new_end_time_str)
 
-    if not auction_data:
-        print(f"Auction {auction_id} not found in DynamoDB.")
-        return
+        message = {
+            "message": f"Auction {auction_id} sniped",
+            "auction_status": auction_status,
+            # 'auction_start_time': auction_start_time,
+            "auction_end_time": new_end_time_str,
+            "auction_end_ms": to_epoch_ms(new_end_time_str),
+            "remaining_snipes": snipes_remaining,
+        }
 
-    end_time = parser.parse(auction_data["auction_end_time"])
-    time_remaining = (end_time - current_time).total_seconds()
+        payloads = append_event(
+            auction_id, lambda fmt, seq: encode_status_message(message, fmt, seq)
+        )
+        post_pages_by_format(
+            api_gateway, auction_id, iter_connection_pages(auction_id), payloads.get
+        )
 
-    snipes_remaining = int(auction_data.get("snipes_remaining", 0))
-    default_time_increment = int(auction_data.get("default_time_increment", 0)) * 60
-    default_time_increment_before = (
-        int(auction_data.get("default_time_increment_before", 0)) * 60
-    )
+    else:
+        logger.debug("No snipe extension for auction %s", auction_id)
 
-    if snipes_remaining > 0 and time_remaining <= default_time_increment_before:
-        extended_time = end_time + timedelta(seconds=default_time_increment)
-        new_end_time_str = extended_time.strftime("%Y-%m-%dT%H:%M:%S%z")
-        new_end_time_str = new_end_time_str[:-2] + ":" + new_end_time_str[-2:]
-        auction_status = "SNIPED"
-        snipes_remaining = snipes_remaining - 1
-        print(new_end_time_str)
 
-        auction_table.update_item(
-            Key={"auction_id": auction_id},
-            UpdateExpression="SET auction_end_time = :new_end_time, snipes_remaining = :new_snipes, auction_status = :new_status",
-            ExpressionAttributeValues={
-                ":new_end_time": new_end_time_str,
-                ":new_snipes": snipes_remaining,
-                ":new_status": auction_status,
-            },
-        )
+def schedule_bid_flush(auction_id, slot_ms):
+    """
+    Schedule the flush of an auction's coalescing windows ending by slot_ms.
 
-        end_rule_name = auction_data.get("end_rule_name", f"EndAuction_{auction_id}")
+    All windows closing in the same slot share the entry, so it is written
+    once per slot and container.
+    """
+    if _flush_slots.get(auction_id) == slot_ms:
+        return
+    with stage("schedule_update"):
+        schedule_action(auction_id, FLUSH_BIDS, slot_ms)
+    _flush_slots[auction_id] = slot_ms
 
-        update_eventbridge_rule(
-            end_rule_name,
-            new_end_time_str,
-            "arn:aws:lambda:us-east-1:908027408981:function:EndAuctionLambda",
-            {"auction_id": auction_id, "status": "ENDED"},
-        )
-        print(f"Auction {auction_id} extended to {new_end_time_str}.")
 
-        user_connections_table = dynamodb.Table("user-connections")
+def flush_coalesced_bids(auction_id):
+    """
+    Enqueue the highest held bid of every closed coalescing window of an
+    auction; invoked by AuctionScheduler with a FLUSH_BIDS action.
+    """
+    auction_data = get_auction_metadata(auction_id)
+    if not auction_data:
+        logger.warning("Auction %s not found in DynamoDB", auction_id)
+        return {
+            "statusCode": 404,
+            "body": json.dumps({"error": "Auction not found."}),
+        }
 
-        # Query connections for the auction
-        response = user_connections_table.query(
-            IndexName="auction_id-index",
-            KeyConditionExpression=boto3.dynamodb.conditions.Key("auction_id").eq(
-                auction_id
-            ),
+    now = now_ms()
+    with stage("coalesce_flush"):
+        bids = flush_closed_windows(auction_id, now)
+    if bids:
+        auction_fifo_queue = resolve_bid_queue(auction_id, auction_data)
+        snipe_window = load_engine(auction_id, auction_data).in_snipe_window(now)
+    for bid in bids:
+        enqueue_bid(
+            auction_fifo_queue,
+            auction_id,
+            bid["user_id"],
+            bid["user_name"],
+            encode_amount(bid["bid_amount"]),
+            bid["timestamp"],
+            snipe_window=snipe_window,
         )
-        connections = response.get("Items", [])
-        print(f"Connections found: {connections}")
+    merged = sum(bid["merged"] for bid in bids) - len(bids)
+    count("bids_coalesced", merged)
+    logger.info(
+        "Flushed %d coalesced bids (%d merged) in auction %s",
+        len(bids),
+        merged,
+        auction_id,
+    )
+    return {
+        "statusCode": 200,
+        "body": json.dumps({"flushed": len(bids), "merged": merged}),
+    }
 
-        remaining_time = calculate_remaining_time(new_end_time_str)
 
-        message = {
-            "statusCode": 200,
-            "body": json.dumps(
-                {
-                    "message": f"Auction {auction_id} sniped",
-                    "auction_status": auction_status,
-                    # 'auction_start_time': auction_start_time,
-                    "auction_end_time": new_end_time_str,
-                    "remaining_time": remaining_time,
-                    "remaining_snipes": snipes_remaining,
-                }
-            ),
-        }
+def encode_amount(amount):
+    """
+    Turn a DynamoDB Decimal bid amount back into a JSON number.
+    """
+    return int(amount) if amount == amount.to_integral_value() else float(amount)
 
-        for connection in connections:
-            connection_id = connection.get("connection_id")
-            try:
-                logger.info("Sending updated time to connection: %s", connection_id)
-                api_gateway.post_to_connection(
-                    ConnectionId=connection_id, Data=json.dumps(message)
-                )
-                logger.info(
-                    "Successfully sent leaderboard update to connection_id: %s",
-                    connection_id,
-                )
-            except ClientError as e:
-                logger.error(
-                    "Failed to send message to connection_id %s: %s",
-                    connection_id,
-                    e.response["Error"]["Message"],
-                    exc_info=True,
-                )
 
-    else:
-        print("Sniping prevention not possible")
+def resolve_bid_queue(auction_id, auction_data):
+    """
+    URL of the FIFO queue an auction's bids are sent to.
+    """
+    if uses_shared_queues():
+        return shared_queue_url(auction_id)
+    if uses_pooled_queues() and auction_data.get("bid_queue_url"):
+        return auction_data["bid_queue_url"]
+    return get_queue_url(auction_queue_name(auction_id))
+
+
+def enqueue_bid(
+    auction_fifo_queue,
+    auction_id,
+    user_id,
+    user_name,
+    bid_amount,
+    timestamp,
+    snipe_window=False,
+):
+    """
+    Send one bid to the auction's FIFO queue.
+
+    snipe_window tells whether it was placed in the auction's snipe window. The
+    deduplication id uses the send time in milliseconds so distinct bids in
+    the same second are never dropped as duplicates.
+    """
+    bid_message = {
+        "action": "placeBid",
+        "auction_id": auction_id,
+        "user_id": user_id,
+        "user_name": user_name,
+        "bid_amount": bid_amount,
+        "timestamp": timestamp,
+        "snipe_window": snipe_window,
+    }
+    sent_ms = int(time.time() * 1000)
+    with stage("enqueue"):
+        sqs.send_message(
+            QueueUrl=auction_fifo_queue,
+            MessageBody=json.dumps(bid_message),
+            MessageGroupId=auction_id,
+            MessageDeduplicationId=f"{auction_id}-{user_id}-{bid_amount}-{sent_ms}",
+        )
 
 
+@instrument_handler
 def lambda_handler(event, context):
     """
     Handles user actions (place bids) and updates auction-specific queues.
     """
-    print(event)
+    log_event(logger, event, event.get("action") or "unknown")
     try:
         action = event.get("action")
         auction_id = event.get("auction_id")
+        set_property("auction_id", auction_id)
+        set_property("action", action)
+        if action == FLUSH_BIDS and auction_id:
+            return flush_coalesced_bids(auction_id)
+
         user_id = event.get("user_id")
         bid_amount = event.get("bid_amount", 0)
         user_name = event.get("user_name")
 
         if not action or not auction_id or not user_id or not user_name:
-            print("Missing Required Fields")
+            logger.warning("Missing required fields")
             return {
                 "statusCode": 400,
                 "body": json.dumps({"error": "Missing required fields."}),
             }
-        if not isinstance(bid_amount, (int, float)) or bid_amount <= 0:
-            print("Invalid Bid Amount: ", bid_amount)
+        if not AuctionEngine.is_valid_amount(bid_amount):
+            logger.warning("Invalid bid amount: %s", bid_amount)
             return {
                 "statusCode": 400,
                 "body": json.dumps({"error": "Invalid 'bid_amount'."}),
             }
 
-        auction_fifo_queue_name = f"AuctionActionsQueue-{auction_id}.fifo"
-        # auction_fifo_queue = get_or_create_queue(auction_fifo_queue_name)
-        auction_fifo_queue = sqs.get_queue_url(QueueName=auction_fifo_queue_name)[
-            "QueueUrl"
-        ]
-        print(f"Queue URL: {auction_fifo_queue}")
+        auction_data = get_auction_metadata(auction_id)
+        if not auction_data:
+            logger.warning("Auction %s not found in DynamoDB", auction_id)
+            return {
+                "statusCode": 404,
+                "body": json.dumps({"error": "Auction not found."}),
+            }
+
+        accepting_bids, auction_data = is_accepting_bids(auction_id, auction_data)
+        if not accepting_bids:
+            logger.info("Auction %s is not accepting bids", auction_id)
+            return {
+                "statusCode": 409,
+                "body": json.dumps({"error": "Auction is not accepting bids."}),
+            }
+
+        auction_fifo_queue = resolve_bid_queue(auction_id, auction_data)
+        logger.debug("Queue URL: %s", auction_fifo_queue)
 
         if action == "placeBid":
             process_place_bid(
-                auction_fifo_queue, auction_id, user_id, bid_amount, user_name
+                auction_fifo_queue,
+                auction_id,
+                user_id,
+                bid_amount,
+                user_name,
+                auction_data,
             )
         else:
-            print("Invalid Route")
+            logger.warning("Invalid action: %s", action)
             return {"statusCode": 400, "body": json.dumps({"error": "Invalid action."})}
 
-        print("Success")
         return {
             "statusCode": 200,
             "body": json.dumps(
@@ -316,13 +532,13 @@ def lambda_handler(event, context):
         }
 
     except ClientError as e:
-        print(f"ClientError: {e.response['Error']['Message']}")
+        logger.error("ClientError: %s", e.response["Error"]["Message"])
         return {
             "statusCode": 500,
             "body": json.dumps({"error": "Failed due to internal error."}),
         }
     except Exception as e:
-        print(f"Unexpected Error: {str(e)}")
+        logger.error("Unexpected error: %s", str(e), exc_info=True)
         return {
             "statusCode": 500,
             "body": json.dumps({"error": "Internal Server Error"}),
@@ -0,0 +1,165 @@
+import os
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+from metrics_helper import instrument_client
+
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+
+# Per-user coalescing is off unless a table is configured
+BID_COALESCE_TABLE = os.getenv("BID_COALESCE_TABLE")
+BID_COALESCE_WINDOW_MS = int(os.getenv("BID_COALESCE_WINDOW_MS", "250"))
+# Coalescing rows expire (DynamoDB TTL on expires_at) this long after a window
+BID_COALESCE_TTL_SECONDS = 3600
+
+# Outcomes of coalesce_bid
+OPENED = "opened"  # first bid of a window, forward it now
+MERGED = "merged"  # folded into the window's pending bid
+FLUSHER = "flusher"  # folded in, and this caller schedules the window's flush
+BYPASS = "bypass"  # the window closed while deciding, forward it now
+
+
+def coalescing_enabled():
+    return bool(BID_COALESCE_TABLE) and BID_COALESCE_WINDOW_MS > 0
+
+
+def _is_condition_failure(error):
+    return error.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+
+def coalesce_bid(auction_id, user_id, user_name, bid_amount, timestamp, now, token):
+    """
+    Record a bid in the user's coalescing window for an auction.
+
+    The first bid after a window closes opens a new one and is forwarded
+    immediately. Later bids inside the window only raise the pending amount;
+    the first of them becomes the window's flusher (identified by token) and
+    schedules flush_closed_windows for flush_slot(window_end_ms).
+
+    Returns (outcome, window_end_ms).
+    """
+    table = dynamodb.Table(BID_COALESCE_TABLE)
+    key = {"auction_id": auction_id, "user_id": user_id}
+    amount = Decimal(str(bid_amount))
+    window_end = now + BID_COALESCE_WINDOW_MS
+
+    try:
+        table.update_item(
+            Key=key,
+            UpdateExpression=(
+                "SET window_end = :end, forwarded_amount = :amt, pending_amount = :amt, "
+                "pending_user_name = :name, pending_timestamp = :ts, merged = :zero, "
+                "expires_at = :ttl REMOVE flusher"
+            ),
+            ConditionExpression="attribute_not_exists(window_end) OR window_end <= :now",
+            ExpressionAttributeValues={
+                ":end": window_end,
+                ":amt": amount,
+                ":name": user_name,
+                ":ts": timestamp,
+                ":zero": 0,
+                ":now": now,
+                ":ttl": now // 1000 + BID_COALESCE_TTL_SECONDS,
+            },
+        )
+        return OPENED, window_end
+    except ClientError as e:
+        if not _is_condition_failure(e):
+            raise
+
+    # A window is open: raise the pending bid if this one is higher, else
+    # only count it
+    updates = [
+        (
+            "SET pending_amount = :amt, pending_user_name = :name, pending_timestamp = :ts, flusher = if_not_exists(flusher, :token) ADD merged :one",
+            "window_end > :now AND pending_amount < :amt",
+            {":amt": amount, ":name": user_name, ":ts": timestamp},
+        ),
+        (
+            "SET flusher = if_not_exists(flusher, :token) ADD merged :one",
+            "window_end > :now",
+            {},
+        ),
+    ]
+    for update_expression, condition, values in updates:
+        try:
+            item = table.update_item(
+                Key=key,
+                UpdateExpression=update_expression,
+                ConditionExpression=condition,
+                ExpressionAttributeValues={
+                    ":token": token,
+                    ":one": 1,
+                    ":now": now,
+                    **values,
+                },
+                ReturnValues="ALL_NEW",
+            )["Attributes"]
+            outcome = FLUSHER if item.get("flusher") == token else MERGED
+            return outcome, int(item["window_end"])
+        except ClientError as e:
+            if not _is_condition_failure(e):
+                raise
+    return BYPASS, now
+
+
+def flush_slot(window_end_ms):
+    """
+    First multiple of BID_COALESCE_WINDOW_MS at or after a window's end.
+
+    Windows of an auction ending in the same slot share one scheduled flush.
+    """
+    return -(-window_end_ms // BID_COALESCE_WINDOW_MS) * BID_COALESCE_WINDOW_MS
+
+
+def flush_closed_windows(auction_id, now):
+    """
+    Close every window of an auction that has ended with bids still pending.
+
+    Returns one dict per user whose pending bid beats the one already
+    forwarded, with user_id, user_name, bid_amount, timestamp and merged,
+    the number of bids the window absorbed after its first one.
+    """
+    table = dynamodb.Table(BID_COALESCE_TABLE)
+    query_kwargs = {
+        "KeyConditionExpression": Key("auction_id").eq(auction_id),
+        "FilterExpression": Attr("flusher").exists() & Attr("window_end").lte(now),
+    }
+    bids = []
+    while True:
+        response = table.query(**query_kwargs)
+        for row in response.get("Items", []):
+            bid = _close_window(table, row)
+            if bid:
+                bids.append(bid)
+        if "LastEvaluatedKey" not in response:
+            return bids
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _close_window(table, row):
+    try:
+        item = table.update_item(
+            Key={"auction_id": row["auction_id"], "user_id": row["user_id"]},
+            UpdateExpression="SET forwarded_amount = pending_amount, merged = :zero REMOVE flusher",
+            ConditionExpression="flusher = :token",
+            ExpressionAttributeValues={":token": row["flusher"], ":zero": 0},
+            ReturnValues="ALL_OLD",
+        )["Attributes"]
+    except ClientError as e:
+        if not _is_condition_failure(e):
+            raise
+        # Flushed by an overlapping run, or a new window replaced this one
+        return None
+
+    if item["pending_amount"] <= item["forwarded_amount"]:
+        return None
+    return {
+        "user_id": item["user_id"],
+        "user_name": item.get("pending_user_name"),
+        "bid_amount": item["pending_amount"],
+        "timestamp": int(item.get("pending_timestamp", 0)),
+        "merged": int(item.get("merged", 0)),
+    }
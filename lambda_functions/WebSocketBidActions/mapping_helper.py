@@ -0,0 +1,177 @@
+import os
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+from metrics_helper import instrument_client
+
+lambda_client = instrument_client(boto3.client("lambda"))
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+
+PROCESS_PRIORITY_LAMBDA_NAME = os.getenv("PROCESS_PRIORITY_LAMBDA_NAME")
+# Registry of the process priority Lambda's event source mappings, keyed by
+# queue_arn, so an attach is one GetItem however many auctions came before
+EVENT_SOURCE_MAPPING_TABLE = os.getenv(
+    "EVENT_SOURCE_MAPPING_TABLE", "event-source-mappings"
+)
+# Batch settings of every mapping; the bid producer, resource manager and
+# pool manager all attach queues through ensure_mapping with these
+BID_BATCH_SIZE = int(os.getenv("BID_BATCH_SIZE", "10"))
+BID_BATCH_WINDOW_SECONDS = int(os.getenv("BID_BATCH_WINDOW_SECONDS", "0"))
+# Creates tried while an old mapping of the queue is still being deleted
+MAPPING_CREATE_ATTEMPTS = 3
+
+
+def _error_code(error):
+    return error.response["Error"]["Code"]
+
+
+def _register(queue_arn, mapping):
+    dynamodb.Table(EVENT_SOURCE_MAPPING_TABLE).put_item(
+        Item={
+            "queue_arn": queue_arn,
+            "uuid": mapping["UUID"],
+            "state": mapping.get("State", "Enabled"),
+            "batch_size": mapping.get("BatchSize"),
+            "updated_at": int(time.time()),
+        }
+    )
+
+
+def _unregister(queue_arn):
+    dynamodb.Table(EVENT_SOURCE_MAPPING_TABLE).delete_item(Key={"queue_arn": queue_arn})
+
+
+def _list_mappings(**filters):
+    """
+    Yield every event source mapping matching the filters, page by page.
+    """
+    kwargs = dict(filters)
+    while True:
+        response = lambda_client.list_event_source_mappings(**kwargs)
+        yield from response.get("EventSourceMappings", [])
+        if not response.get("NextMarker"):
+            return
+        kwargs["Marker"] = response["NextMarker"]
+
+
+def find_mapping(queue_arn):
+    """
+    Look up the mapping of a queue: the registry first, then Lambda filtered
+    by EventSourceArn (registering what it finds).
+
+    Returns a dict with UUID, State and BatchSize, or None.
+    """
+    item = (
+        dynamodb.Table(EVENT_SOURCE_MAPPING_TABLE)
+        .get_item(Key={"queue_arn": queue_arn})
+        .get("Item")
+    )
+    if item:
+        return {
+            "UUID": item["uuid"],
+            "State": item.get("state"),
+            "BatchSize": item.get("batch_size"),
+        }
+
+    filters = {"EventSourceArn": queue_arn}
+    if PROCESS_PRIORITY_LAMBDA_NAME:
+        filters["FunctionName"] = PROCESS_PRIORITY_LAMBDA_NAME
+    for mapping in _list_mappings(**filters):
+        _register(queue_arn, mapping)
+        return mapping
+    return None
+
+
+def get_batching_config(queue_arn):
+    """
+    Build the batching settings for a queue's event source mapping.
+
+    FIFO queues accept at most 10 messages per batch and do not support a
+    batching window, so the window is only applied to standard queues.
+    """
+    is_fifo = queue_arn.endswith(".fifo")
+    batch_size = min(BID_BATCH_SIZE, 10) if is_fifo else BID_BATCH_SIZE
+    config = {"BatchSize": batch_size}
+    if BID_BATCH_WINDOW_SECONDS > 0 and not is_fifo:
+        config["MaximumBatchingWindowInSeconds"] = BID_BATCH_WINDOW_SECONDS
+    return config
+
+
+def ensure_mapping(queue_arn, batching_config):
+    """
+    Make sure the queue triggers the process priority Lambda, enabled and
+    with the current batch settings. Returns the mapping UUID; raises
+    RuntimeError while a previous mapping of the queue is still being deleted.
+    """
+    mapping = find_mapping(queue_arn)
+    if mapping:
+        if mapping.get("State") == "Enabled" and mapping.get(
+            "BatchSize"
+        ) == batching_config.get("BatchSize"):
+            return mapping["UUID"]
+        try:
+            updated = lambda_client.update_event_source_mapping(
+                UUID=mapping["UUID"], Enabled=True, **batching_config
+            )
+            updated["State"] = "Enabled"
+            _register(queue_arn, updated)
+            print(f"Updated event source mapping {mapping['UUID']}")
+            return mapping["UUID"]
+        except ClientError as e:
+            if _error_code(e) != "ResourceNotFoundException":
+                raise
+            # Deleted outside the registry; fall through and recreate it
+            _unregister(queue_arn)
+
+    for _ in range(MAPPING_CREATE_ATTEMPTS):
+        try:
+            created = lambda_client.create_event_source_mapping(
+                EventSourceArn=queue_arn,
+                FunctionName=PROCESS_PRIORITY_LAMBDA_NAME,
+                Enabled=True,
+                **batching_config,
+            )
+        except ClientError as e:
+            if _error_code(e) != "ResourceConflictException":
+                raise
+            # A concurrent attach created it first, unless the conflicting
+            # mapping is one still being deleted
+            _unregister(queue_arn)
+            existing = find_mapping(queue_arn)
+            if existing and existing.get("State") != "Deleting":
+                return existing["UUID"]
+            _unregister(queue_arn)
+            continue
+        created["State"] = "Enabled"
+        _register(queue_arn, created)
+        print(f"Attached {queue_arn} to Lambda {PROCESS_PRIORITY_LAMBDA_NAME}")
+        return created["UUID"]
+    raise RuntimeError(
+        f"Cannot map {queue_arn}: its previous event source mapping is still "
+        "being deleted"
+    )
+
+
+def remove_mapping(queue_arn):
+    """
+    Delete the queue's mapping, if any, and its registry entry.
+    """
+    mapping = find_mapping(queue_arn)
+    if mapping:
+        try:
+            lambda_client.delete_event_source_mapping(UUID=mapping["UUID"])
+            print(f"Removed event source mapping {mapping['UUID']} of {queue_arn}")
+        except ClientError as e:
+            if _error_code(e) != "ResourceNotFoundException":
+                raise
+    _unregister(queue_arn)
+    return mapping is not None
+
+
+def function_mappings():
+    """
+    Yield every mapping of the process priority Lambda; for the sweeper only,
+    the hot path uses find_mapping.
+    """
+    return _list_mappings(FunctionName=PROCESS_PRIORITY_LAMBDA_NAME)
@@ -1,14 +1,19 @@
 import boto3
 import json
 import os
+from metrics_helper import instrument_client, instrument_handler
+from log_helper import get_logger, log_event
 
 # Initialize the DynamoDB resource
-dynamodb = boto3.resource("dynamodb")
+logger = get_logger(__name__)
+
+dynamodb = instrument_client(boto3.resource("dynamodb"))
 
 # Define the DynamoDB table to store connections
 CONNECTIONS_TABLE = os.getenv("CONNECTIONS_TABLE")
 
 
+@instrument_handler
 def lambda_handler(event, context):
     """
     Handles WebSocket `$connect` and `$disconnect` events with user_id and auction_id.
@@ -16,8 +21,7 @@ def lambda_handler(event, context):
     connection_id = event["requestContext"]["connectionId"]
     route_key = event["requestContext"]["routeKey"]
     table = dynamodb.Table(CONNECTIONS_TABLE)
-    print(connection_id, route_key)
-    print(table)
+    log_event(logger, event, route_key)
 
     try:
         if route_key == "$connect":
@@ -26,7 +30,6 @@ def lambda_handler(event, context):
             params = event.get("queryStringParameters", {})
             user_id = params.get("user_id")
             auction_id = params.get("auction_id")
-            print(params, user_id, auction_id)
 
             if not user_id or not auction_id:
                 return {
@@ -1,36 +1,83 @@
 import boto3
 import json
 import os
+import time
 from decimal import Decimal
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
-import logging
+from auction_engine import diff_top_entries, merge_top_entries
+from broadcast_helper import (
+    encode_leaderboard_delta,
+    encode_leaderboard_message,
+    post_pages_by_format,
+)
+from event_log_helper import append_event
+from connection_helper import iter_connection_pages
+from conflation_helper import (
+    DEFER,
+    SEND,
+    broadcast_decision,
+    broadcast_interval_ms,
+    leader_changed,
+    update_bid_rate,
+)
+from scheduler_helper import TRAILING_BROADCAST, schedule_action
+from metrics_helper import count, instrument_client, instrument_handler, stage
+from log_helper import LazyJson, get_logger, log_event
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
 
 # Initialize AWS services
-dynamodb = boto3.resource("dynamodb")
-api_gateway = boto3.client(
-    "apigatewaymanagementapi", endpoint_url=os.getenv("WEBSOCKET_ENDPOINT")
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+api_gateway = instrument_client(
+    boto3.client(
+        "apigatewaymanagementapi", endpoint_url=os.getenv("WEBSOCKET_ENDPOINT")
+    )
 )
 
 # Environment variables
 LEADERBOARD_TABLE = os.getenv("LEADERBOARD_TABLE")
-USER_CONNECTIONS_TABLE = os.getenv("USER_CONNECTIONS_TABLE")
+LEADERBOARD_TOP_TABLE = os.getenv("LEADERBOARD_TOP_TABLE", "AuctionLeaderboardTop")
+LEADERBOARD_TOP_SIZE = int(os.getenv("LEADERBOARD_TOP_SIZE", "25"))
+TOP_UPDATE_RETRIES = 3
+
+# Broadcast slot each auction's trailing broadcast is already scheduled for
+_trailing_slots = {}
 
 
+@instrument_handler
 def lambda_handler(event, context):
     """
-    Process messages from auction-specific priority queues and broadcast updates.
+    Process a batch of messages from auction-specific priority queues.
+
+    Each user's bids in the batch are coalesced into their highest one, and
+    every remaining bid is applied first; the leaderboard is then broadcast
+    once per distinct auction in the batch instead of once per record, and
+    for busy auctions at most BROADCAST_MAX_PER_SECOND times a second.
+
+    AuctionScheduler also invokes it with a TRAILING_BROADCAST action to send
+    the state conflation held back.
     """
-    logger.info("Event received: %s", json.dumps(event))
+    if event.get("action") == TRAILING_BROADCAST:
+        log_event(logger, event, "trailingBroadcast")
+        with stage("trailing_broadcast"):
+            send_trailing_broadcast(event["auction_id"])
+        return {"statusCode": 200, "body": "Trailing broadcast processed."}
+
+    log_event(logger, event, "queueBatch")
     try:
-        for record in event["Records"]:
-            logger.info("Processing record: %s", json.dumps(record))
-            # Extract the message body and decode JSON
-            message = json.loads(record["body"])
-            logger.info("Decoded message: %s", json.dumps(message))
+        # Extract the message bodies and decode JSON
+        messages, merged = coalesce_bids(
+            [json.loads(record["body"]) for record in event["Records"]]
+        )
+        count("bids_coalesced", merged)
+
+        # Bids applied per auction in this batch, in first-seen order
+        touched_auctions = {}
+        # Auctions with a bid placed inside their snipe window
+        snipe_auctions = set()
+        for message in messages:
+            logger.debug("Decoded message: %s", LazyJson(message))
 
             action = message.get("action")
             auction_id = message.get("auction_id")
@@ -42,7 +89,7 @@ def lambda_handler(event, context):
             if not auction_id or not user_id:
                 logger.warning(
                     "Missing 'auction_id' or 'user_id' in message: %s",
-                    json.dumps(message),
+                    LazyJson(message),
                 )
                 continue
 
@@ -52,15 +99,55 @@ def lambda_handler(event, context):
                     auction_id,
                     user_id,
                 )
-                process_place_bid(auction_id, user_id, bid_amount, timestamp, user_name)
+                with stage("leaderboard_write"):
+                    bid = process_place_bid(
+                        auction_id, user_id, bid_amount, timestamp, user_name
+                    )
+                touched_auctions.setdefault(auction_id, [])
+                if bid:
+                    touched_auctions[auction_id].append(bid)
+                if message.get("snipe_window"):
+                    snipe_auctions.add(auction_id)
             else:
                 logger.warning("Invalid action received: %s", action)
+                touched_auctions.setdefault(auction_id, [])
 
-            # Broadcast the updated leaderboard
+        # Refresh the top-K item and broadcast once per auction in the batch
+        deferred = []
+        for auction_id, bids in touched_auctions.items():
+            with stage("top_update"):
+                top = (
+                    update_top_leaderboard(
+                        auction_id, bids, auction_id in snipe_auctions
+                    )
+                    if bids
+                    else None
+                )
+            if not top:
+                broadcast_leaderboard(auction_id)
+                continue
+            entries, version, decision, delta, next_slot_ms = top
+            if decision == DEFER:
+                count("broadcasts_conflated")
+                deferred.append((auction_id, next_slot_ms))
+                continue
             logger.info("Broadcasting leaderboard for auction_id: %s", auction_id)
-            broadcast_leaderboard(auction_id)
+            broadcast_leaderboard(auction_id, (entries, version), delta)
 
-        logger.info("All records processed successfully.")
+        # A later batch may never come to carry a deferred state, so every
+        # deferred auction gets a trailing broadcast at its next slot; the
+        # scheduler fires it, so this consumer never waits for the slot
+        with stage("trailing_schedule"):
+            for auction_id, slot_ms in deferred:
+                schedule_trailing_broadcast(auction_id, slot_ms)
+
+        count("records", len(event["Records"]))
+        count("auctions", len(touched_auctions))
+        logger.info(
+            "Processed %d records for %d auctions.",
+            len(event["Records"]),
+            len(touched_auctions),
+        )
         return {"statusCode": 200, "body": "Messages processed successfully."}
 
     except Exception as e:
@@ -68,7 +155,50 @@ def lambda_handler(event, context):
         return {"statusCode": 500, "body": "Internal Server Error"}
 
 
+def coalesce_bids(messages):
+    """
+    Keep only each user's highest bid per auction out of a batch.
+
+    Bids a user places in quick succession usually land in the same batch;
+    only the highest of them is written to the leaderboard. The kept bid
+    takes the place of the user's first one and is marked as placed in the
+    snipe window if any of the merged bids was.
+
+    Returns (messages, merged): the remaining messages in order and the
+    number of bids merged away.
+    """
+    kept = []
+    # (auction_id, user_id) -> index of the user's bid in kept
+    positions = {}
+    for message in messages:
+        key = (message.get("auction_id"), message.get("user_id"))
+        if message.get("action") != "placeBid" or not all(key):
+            kept.append(message)
+            continue
+        position = positions.get(key)
+        if position is None:
+            positions[key] = len(kept)
+            kept.append(message)
+            continue
+        previous = kept[position]
+        best = (
+            message
+            if message.get("bid_amount", 0) > previous.get("bid_amount", 0)
+            else previous
+        )
+        kept[position] = {
+            **best,
+            "snipe_window": bool(
+                previous.get("snipe_window") or message.get("snipe_window")
+            ),
+        }
+    return kept, len(messages) - len(kept)
+
+
 def process_place_bid(auction_id, user_id, bid_amount, timestamp, user_name):
+    """
+    Write a bid to the leaderboard table and return the stored entry.
+    """
     try:
         # Convert bid_amount and timestamp to Decimal
         bid_amount_decimal = Decimal(
@@ -85,124 +215,288 @@ def process_place_bid(auction_id, user_id, bid_amount, timestamp, user_name):
         )
 
         table = dynamodb.Table(LEADERBOARD_TABLE)
-        table.put_item(
-            Item={
-                "auction_id": auction_id,
-                "user_id": user_id,
-                "bid_amount": bid_amount_decimal,  # Use Decimal
-                "timestamp": timestamp_decimal,  # Use Decimal
-                "user_name": user_name,
-            }
-        )
+        item = {
+            "auction_id": auction_id,
+            "user_id": user_id,
+            "bid_amount": bid_amount_decimal,  # Use Decimal
+            "timestamp": timestamp_decimal,  # Use Decimal
+            "user_name": user_name,
+        }
+        table.put_item(Item=item)
         logger.info(
             "Successfully added/updated bid for user %s in auction %s",
             user_id,
             auction_id,
         )
+        return item
     except ClientError as e:
         logger.error(
             "Failed to update leaderboard table: %s",
             e.response["Error"]["Message"],
             exc_info=True,
         )
+        return None
 
 
-def convert_decimal(obj):
+def query_leaderboard_partition(auction_id):
     """
-    Recursively converts Decimal objects to float in a dictionary or list.
+    Read every leaderboard row for an auction, following pagination.
     """
-    if isinstance(obj, list):
-        return [convert_decimal(i) for i in obj]
-    elif isinstance(obj, dict):
-        return {k: convert_decimal(v) for k, v in obj.items()}
-    elif isinstance(obj, Decimal):
-        return float(obj)  # Or int(obj) if you need integers
-    else:
-        return obj
+    table = dynamodb.Table(LEADERBOARD_TABLE)
+    query_kwargs = {"KeyConditionExpression": Key("auction_id").eq(auction_id)}
+    items = []
+    while True:
+        response = table.query(**query_kwargs)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
 
 
-def broadcast_leaderboard(auction_id):
+def update_top_leaderboard(auction_id, bids, snipe_window=False):
     """
-    Broadcast the updated leaderboard to all WebSocket clients.
+    Fold a batch of bids into the auction's materialized top-K item.
+
+    The item is replaced with a conditional write on its version so concurrent
+    consumers cannot overwrite each other; on a lost race the merge is retried
+    against the fresh item.
+
+    The item also carries the auction's bid rate and last broadcast, so the
+    broadcast decision costs no extra reads or writes. Returns the new ranked
+    top-K, its version, SEND or DEFER, the delta since the last broadcast and,
+    when deferred, the epoch ms at which the auction's next broadcast slot
+    opens.
     """
-    try:
-        logger.info("Fetching WebSocket connections for auction_id: %s", auction_id)
-        user_connections_table = dynamodb.Table(USER_CONNECTIONS_TABLE)
-
-        # Query connections for the auction
-        response = user_connections_table.query(
-            IndexName="auction_id-index",
-            KeyConditionExpression=boto3.dynamodb.conditions.Key("auction_id").eq(
-                auction_id
-            ),
-        )
-        connections = response.get("Items", [])
-        print(f"Connections found: {connections}")
+    table = dynamodb.Table(LEADERBOARD_TOP_TABLE)
+    for attempt in range(TOP_UPDATE_RETRIES):
+        try:
+            item = table.get_item(
+                Key={"auction_id": auction_id}, ConsistentRead=True
+            ).get("Item")
+            previous_entries = item.get("entries", []) if item else []
+            if item:
+                version = item.get("version", 0)
+                entries, needs_rebuild = merge_top_entries(
+                    item.get("entries", []), bids, LEADERBOARD_TOP_SIZE
+                )
+            else:
+                version = 0
+                needs_rebuild = True
 
-        # Fetch leaderboard
-        leaderboard = fetch_leaderboard(auction_id)
+            if needs_rebuild:
+                # The bids are already in the partition, so a rebuild covers them
+                logger.info("Rebuilding top leaderboard for auction %s", auction_id)
+                entries, _ = merge_top_entries(
+                    [],
+                    query_leaderboard_partition(auction_id),
+                    LEADERBOARD_TOP_SIZE,
+                )
 
-        # Convert Decimal types to JSON-serializable types
-        leaderboard = convert_decimal(leaderboard)
+            now = int(time.time() * 1000)
+            item = item or {}
+            rate_at = item.get("rate_at")
+            bid_rate = update_bid_rate(
+                item.get("bid_rate", 0),
+                int(rate_at) if rate_at is not None else None,
+                len(bids),
+                now,
+            )
+            last_broadcast = item.get("broadcast_at")
+            decision = broadcast_decision(
+                bid_rate,
+                int(last_broadcast) if last_broadcast is not None else None,
+                now,
+                urgent=snipe_window and leader_changed(previous_entries, entries),
+            )
 
-        # Prepare message
-        message = {
-            "type": "leaderboardUpdate",
-            "auction_id": auction_id,
-            "leaderboard": leaderboard,
-        }
+            new_item = {
+                "auction_id": auction_id,
+                "entries": entries,
+                "version": version + 1,
+                "bid_rate": Decimal(str(round(bid_rate, 3))),
+                "rate_at": now,
+            }
+            if decision == SEND:
+                new_item["broadcast_at"] = now
+                new_item["broadcast_version"] = version + 1
+                new_item["broadcast_entries"] = entries
+            elif last_broadcast is not None:
+                for field in ("broadcast_at", "broadcast_version", "broadcast_entries"):
+                    if field in item:
+                        new_item[field] = item[field]
 
-        # Broadcast to all connections
-        for connection in connections:
-            connection_id = connection.get("connection_id")
-            try:
-                logger.info(
-                    "Sending leaderboard update to connection_id: %s", connection_id
-                )
-                api_gateway.post_to_connection(
-                    ConnectionId=connection_id, Data=json.dumps(message)
-                )
-                logger.info(
-                    "Successfully sent leaderboard update to connection_id: %s",
-                    connection_id,
-                )
-            except ClientError as e:
+            table.put_item(
+                Item=new_item,
+                ConditionExpression=Attr("version").not_exists()
+                | Attr("version").eq(version),
+            )
+            next_slot_ms = (
+                int(last_broadcast) + int(broadcast_interval_ms())
+                if decision == DEFER
+                else None
+            )
+            return (
+                entries,
+                version + 1,
+                decision,
+                delta_since_broadcast(item, entries),
+                next_slot_ms,
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
                 logger.error(
-                    "Failed to send message to connection_id %s: %s",
-                    connection_id,
+                    "Failed to update top leaderboard: %s",
                     e.response["Error"]["Message"],
                     exc_info=True,
                 )
+                return None
+            logger.info(
+                "Top leaderboard for auction %s changed concurrently, retrying (%d/%d)",
+                auction_id,
+                attempt + 1,
+                TOP_UPDATE_RETRIES,
+            )
+    return None
+
+
+def delta_since_broadcast(item, entries):
+    """
+    Diff entries against the top-K clients last received for the auction.
+
+    Returns (base_version, changed, removed), or None when a full snapshot
+    should be sent: nothing was broadcast yet, or the delta would not be
+    smaller than the snapshot.
+    """
+    if item.get("broadcast_version") is None or "broadcast_entries" not in item:
+        return None
+    changed, removed = diff_top_entries(item["broadcast_entries"], entries)
+    if len(changed) + len(removed) >= len(entries):
+        return None
+    return item["broadcast_version"], changed, removed
+
+
+def schedule_trailing_broadcast(auction_id, slot_ms):
+    """
+    Schedule the auction's trailing broadcast for its next slot.
+
+    Every batch deferred against the same last broadcast shares the slot, so
+    the schedule entry is written once per slot and container.
+    """
+    if _trailing_slots.get(auction_id) == slot_ms:
+        return
+    schedule_action(auction_id, TRAILING_BROADCAST, slot_ms)
+    _trailing_slots[auction_id] = slot_ms
+
+
+def send_trailing_broadcast(auction_id):
+    """
+    Broadcast an auction's latest leaderboard when its scheduled slot fires,
+    unless a broadcast already carried that version.
+    """
+    table = dynamodb.Table(LEADERBOARD_TOP_TABLE)
+    item = table.get_item(Key={"auction_id": auction_id}, ConsistentRead=True).get(
+        "Item"
+    )
+    if not item or item.get("broadcast_version") == item.get("version"):
+        return
+
+    try:
+        table.update_item(
+            Key={"auction_id": auction_id},
+            UpdateExpression=(
+                "SET broadcast_at = :now, broadcast_version = :version, "
+                "broadcast_entries = :entries"
+            ),
+            ConditionExpression="version = :version",
+            ExpressionAttributeValues={
+                ":now": int(time.time() * 1000),
+                ":version": item["version"],
+                ":entries": item.get("entries", []),
+            },
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        # A newer version was written meanwhile; its batch broadcasts it
+        return
+    count("broadcasts_trailing")
+    entries = item.get("entries", [])
+    broadcast_leaderboard(
+        auction_id, (entries, item["version"]), delta_since_broadcast(item, entries)
+    )
+
+
+def broadcast_leaderboard(auction_id, top=None, delta=None):
+    """
+    Broadcast the updated leaderboard to all WebSocket clients.
+
+    The freshly written (entries, version) top-K can be passed in to skip
+    reading it back, along with its (base_version, changed, removed) delta to
+    send instead of the full leaderboard.
+    """
+    try:
+        # Fetch leaderboard
+        if top:
+            leaderboard, version = top
+        else:
+            with stage("leaderboard_read"):
+                leaderboard, version = fetch_leaderboard(auction_id)
+
+        if delta:
+            count("broadcasts_delta")
+
+        def encode(fmt, seq):
+            # Called once per wire format
+            with stage("encode"):
+                if delta:
+                    base_version, changed, removed = delta
+                    return encode_leaderboard_delta(
+                        auction_id, base_version, version, changed, removed, fmt, seq
+                    )
+                return encode_leaderboard_message(
+                    auction_id, version, leaderboard, fmt, seq
+                )
+
+        # Logged even without viewers, so resuming clients can replay it
+        with stage("event_log"):
+            payloads = append_event(auction_id, encode)
+
+        # Broadcast to all connections, page by page as the GSI returns them
+        post_pages_by_format(
+            api_gateway, auction_id, iter_connection_pages(auction_id), payloads.get
+        )
 
     except Exception as e:
-        print(f"Failed to broadcast leaderboard: {str(e)}")
+        logger.error("Failed to broadcast leaderboard: %s", str(e), exc_info=True)
 
 
 def fetch_leaderboard(auction_id):
     """
-    Fetch the sorted leaderboard for an auction.
+    Fetch the ranked top-K leaderboard for an auction from its materialized item.
+
+    Returns the last broadcast (entries, version), the state leaderboard
+    deltas are based on; version is None when the item does not exist.
     """
     try:
         logger.info("Fetching leaderboard for auction_id: %s", auction_id)
-        table = dynamodb.Table(LEADERBOARD_TABLE)
-        response = table.query(
-            KeyConditionExpression=boto3.dynamodb.conditions.Key("auction_id").eq(
-                auction_id
-            ),
-            ScanIndexForward=False,  # DynamoDB default sorting is ascending; use False for descending
-        )
-        leaderboard = response.get("Items", [])
-        leaderboard_sorted = sorted(
-            leaderboard, key=lambda x: (-x["bid_amount"], x["timestamp"])
+        table = dynamodb.Table(LEADERBOARD_TOP_TABLE)
+        item = table.get_item(Key={"auction_id": auction_id}, ConsistentRead=True).get(
+            "Item"
         )
-        logger.info(
-            "Fetched leaderboard for auction_id %s: %s", auction_id, leaderboard_sorted
+        if item and item.get("broadcast_version") is not None:
+            return item.get("broadcast_entries", []), item["broadcast_version"]
+        if item:
+            return item.get("entries", []), item.get("version")
+
+        # Auctions without a materialized item yet fall back to the partition
+        leaderboard, _ = merge_top_entries(
+            [], query_leaderboard_partition(auction_id), LEADERBOARD_TOP_SIZE
         )
-        return leaderboard_sorted
+        return leaderboard, None
     except ClientError as e:
         logger.error(
             "Failed to fetch leaderboard from table: %s",
             e.response["Error"]["Message"],
             exc_info=True,
         )
-        return []
+        return [], None
@@ -0,0 +1,135 @@
+# Statuses in which an auction accepts bids
+ACTIVE_STATUSES = ("STARTED", "SNIPED")
+
+
+def rank_key(entry):
+    """
+    Leaderboard order: highest bid first, earliest timestamp first on ties.
+    """
+    return (-entry["bid_amount"], entry["timestamp"])
+
+
+def rank_leaderboard(entries):
+    return sorted(entries, key=rank_key)
+
+
+def merge_top_entries(entries, bids, top_size):
+    """
+    Merge bids into a ranked top-K list.
+
+    Returns the new top-K and a flag telling the caller the list can no longer
+    be trusted: a bidder in a full top-K lowered their bid, so someone outside
+    the materialized entries may now outrank them.
+    """
+    by_user = {entry["user_id"]: entry for entry in entries}
+    needs_rebuild = False
+    for bid in bids:
+        previous = by_user.get(bid["user_id"])
+        if (
+            previous is not None
+            and bid["bid_amount"] < previous["bid_amount"]
+            and len(entries) >= top_size
+        ):
+            needs_rebuild = True
+        by_user[bid["user_id"]] = {
+            "user_id": bid["user_id"],
+            "user_name": bid.get("user_name"),
+            "bid_amount": bid["bid_amount"],
+            "timestamp": bid["timestamp"],
+        }
+    return rank_leaderboard(by_user.values())[:top_size], needs_rebuild
+
+
+def diff_top_entries(previous_entries, entries):
+    """
+    Compare two ranked top-K lists bidder by bidder.
+
+    Returns (changed, removed): the entries that are new or whose bid changed,
+    and the user_ids that dropped out. Applying both to the previous list and
+    re-ranking gives the new one.
+    """
+    before = {entry["user_id"]: entry for entry in previous_entries}
+    changed = [entry for entry in entries if before.get(entry["user_id"]) != entry]
+    current = {entry["user_id"] for entry in entries}
+    removed = [user_id for user_id in before if user_id not in current]
+    return changed, removed
+
+
+class AuctionEngine:
+    """
+    Bid rules for one auction with no I/O: acceptance and snipe extension.
+    Times are epoch milliseconds.
+
+    The Lambdas load an engine from the auction item, ask it for decisions
+    and persist the outcome themselves; leaderboards are ranked with
+    rank_leaderboard and merge_top_entries.
+    """
+
+    __slots__ = (
+        "auction_id",
+        "status",
+        "start_ms",
+        "end_ms",
+        "snipes_remaining",
+        "increment_ms",
+        "window_ms",
+    )
+
+    def __init__(
+        self,
+        auction_id,
+        end_ms,
+        start_ms=0,
+        status="STARTED",
+        snipes_remaining=0,
+        increment_ms=0,
+        window_ms=0,
+    ):
+        self.auction_id = auction_id
+        self.status = status
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.snipes_remaining = snipes_remaining
+        self.increment_ms = increment_ms
+        self.window_ms = window_ms
+
+    @classmethod
+    def from_item(cls, auction_id, item, to_epoch_ms):
+        """
+        Build an engine from an auction-connections item; the snipe settings
+        there are stored in minutes.
+        """
+        start = item.get("auction_start_time")
+        return cls(
+            auction_id,
+            end_ms=to_epoch_ms(item["auction_end_time"]),
+            start_ms=to_epoch_ms(start) if start else 0,
+            status=item.get("auction_status", "SCHEDULED"),
+            snipes_remaining=int(item.get("snipes_remaining", 0)),
+            increment_ms=int(item.get("default_time_increment", 0)) * 60000,
+            window_ms=int(item.get("default_time_increment_before", 0)) * 60000,
+        )
+
+    @staticmethod
+    def is_valid_amount(bid_amount):
+        return (
+            isinstance(bid_amount, (int, float))
+            and not isinstance(bid_amount, bool)
+            and bid_amount > 0
+        )
+
+    def accepts_bids(self, now_ms):
+        return self.status in ACTIVE_STATUSES and now_ms < self.end_ms
+
+    def in_snipe_window(self, now_ms):
+        remaining_ms = self.end_ms - now_ms
+        return 0 < remaining_ms <= self.window_ms
+
+    def snipe_extension(self, now_ms):
+        """
+        Return the extended end time for a bid at now_ms, or None when the bid
+        is outside the snipe window or no snipes remain.
+        """
+        if self.in_snipe_window(now_ms) and self.snipes_remaining > 0:
+            return self.end_ms + self.increment_ms
+        return None
@@ -0,0 +1,69 @@
+import math
+import os
+
+# "auto" conflates an auction's leaderboard broadcasts once its measured bid
+# rate passes BROADCAST_CONFLATION_BID_RATE; "on" always, "off" never
+BROADCAST_CONFLATION = os.getenv("BROADCAST_CONFLATION", "auto").lower()
+# Most leaderboard broadcasts per auction per second while conflating
+BROADCAST_MAX_PER_SECOND = float(os.getenv("BROADCAST_MAX_PER_SECOND", "5"))
+# Bids per second above which "auto" starts conflating
+BROADCAST_CONFLATION_BID_RATE = float(os.getenv("BROADCAST_CONFLATION_BID_RATE", "20"))
+# Time constant of the bid-rate moving average
+BID_RATE_WINDOW_MS = int(os.getenv("BID_RATE_WINDOW_MS", "2000"))
+
+# Broadcast decisions
+SEND = "send"
+DEFER = "defer"
+
+
+def broadcast_interval_ms():
+    if BROADCAST_MAX_PER_SECOND <= 0:
+        return 0
+    return 1000 / BROADCAST_MAX_PER_SECOND
+
+
+def update_bid_rate(rate, rate_at_ms, bids, now_ms):
+    """
+    Fold a batch of bids into an exponentially weighted bids/sec estimate.
+
+    The previous estimate decays with the time since it was taken, and each
+    new bid adds 1/window, so a steady rate r converges to r.
+    """
+    window_s = BID_RATE_WINDOW_MS / 1000
+    if rate_at_ms is None:
+        return bids / window_s
+    elapsed_ms = max(0, now_ms - rate_at_ms)
+    return float(rate) * math.exp(-elapsed_ms / BID_RATE_WINDOW_MS) + bids / window_s
+
+
+def conflating(bid_rate):
+    if BROADCAST_CONFLATION == "on":
+        return True
+    if BROADCAST_CONFLATION == "auto":
+        return bid_rate > BROADCAST_CONFLATION_BID_RATE
+    return False
+
+
+def leader_changed(previous_entries, entries):
+    if not previous_entries or not entries:
+        return bool(previous_entries) != bool(entries)
+    before, after = previous_entries[0], entries[0]
+    return (before["user_id"], before["bid_amount"]) != (
+        after["user_id"],
+        after["bid_amount"],
+    )
+
+
+def broadcast_decision(bid_rate, last_broadcast_ms, now_ms, urgent=False):
+    """
+    Decide whether a new leaderboard version goes out now or is left for a
+    later broadcast, which always carries the latest state.
+
+    urgent marks a top-bid change inside the snipe window, which is never
+    held back.
+    """
+    if urgent or not conflating(bid_rate) or last_broadcast_ms is None:
+        return SEND
+    if now_ms - last_broadcast_ms >= broadcast_interval_ms():
+        return SEND
+    return DEFER
@@ -0,0 +1,170 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "LiveFlashAuction")
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+FUNCTION_NAME = os.getenv("AWS_LAMBDA_FUNCTION_NAME", "local")
+
+_cold_start = True
+
+
+class InvocationMetrics:
+    """
+    Stage timings and counters collected during one Lambda invocation.
+
+    Stages with the same name are summed, so a stage entered once per record
+    reports the total time the invocation spent in it.
+    """
+
+    def __init__(self, function_name=FUNCTION_NAME):
+        self.function_name = function_name
+        self.stages = defaultdict(float)
+        self.counters = Counter()
+        self.aws_calls = Counter()
+        self.properties = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, elapsed_ms):
+        with self._lock:
+            self.stages[name] += elapsed_ms
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def record_aws_call(self, service, operation):
+        with self._lock:
+            self.aws_calls[f"{service}.{operation}"] += 1
+
+    def to_record(self):
+        """
+        Build a CloudWatch embedded metric format (EMF) record.
+        """
+        metrics = {f"{name}_ms": round(ms, 3) for name, ms in self.stages.items()}
+        units = {name: "Milliseconds" for name in metrics}
+        for name, value in self.counters.items():
+            metrics[name] = value
+            units[name] = "Count"
+        metrics["aws_calls"] = sum(self.aws_calls.values())
+        units["aws_calls"] = "Count"
+        for call, value in self.aws_calls.items():
+            metrics[f"aws.{call}"] = value
+            units[f"aws.{call}"] = "Count"
+
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": METRICS_NAMESPACE,
+                        "Dimensions": [["FunctionName"]],
+                        "Metrics": [
+                            {"Name": name, "Unit": unit} for name, unit in units.items()
+                        ],
+                    }
+                ],
+            },
+            "FunctionName": self.function_name,
+            **self.properties,
+            **metrics,
+        }
+
+
+# Metrics of the invocation in progress; module-level rather than thread-local
+# so AWS calls made from fan-out worker threads are counted too
+_current = None
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a named hot-path stage of the current invocation.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _current is not None:
+            _current.add_stage(name, (time.perf_counter() - started) * 1000)
+
+
+def timed(name):
+    """
+    Decorator form of stage() for functions that are a stage on their own.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, value=1):
+    if _current is not None:
+        _current.count(name, value)
+
+
+def set_property(name, value):
+    """
+    Attach a non-metric field (e.g. auction_id) to the invocation record.
+    """
+    if _current is not None:
+        _current.properties[name] = value
+
+
+def _count_aws_call(event_name=None, **kwargs):
+    # event_name is "before-call.<service>.<Operation>"
+    if _current is not None and event_name:
+        _, service, operation = event_name.split(".", 2)
+        _current.record_aws_call(service, operation)
+
+
+def instrument_client(client):
+    """
+    Count every API call a boto3 client (or a resource's client) makes.
+    """
+    meta = getattr(client, "meta", None)
+    if meta is not None and hasattr(meta, "client"):
+        meta = getattr(meta.client, "meta", None)
+    events = getattr(meta, "events", None)
+    if events is not None:
+        events.register("before-call", _count_aws_call)
+    return client
+
+
+def instrument_handler(handler):
+    """
+    Wrap a lambda_handler so it emits one EMF metrics record per invocation.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _current, _cold_start
+        if not METRICS_ENABLED:
+            return handler(event, context)
+
+        metrics = InvocationMetrics()
+        metrics.properties["cold_start"] = _cold_start
+        if context is not None and hasattr(context, "aws_request_id"):
+            metrics.properties["request_id"] = context.aws_request_id
+        _cold_start = False
+        _current = metrics
+        started = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            metrics.add_stage("handler", (time.perf_counter() - started) * 1000)
+            _current = None
+            print(json.dumps(metrics.to_record(), default=str))
+
+    return wrapper
@@ -0,0 +1,289 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
+
+import boto3
+from botocore.exceptions import ClientError
+from metrics_helper import count, instrument_client, stage
+
+logger = logging.getLogger(__name__)
+
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+
+USER_CONNECTIONS_TABLE = os.getenv("USER_CONNECTIONS_TABLE", "user-connections")
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "32"))
+PAYLOAD_CACHE_SIZE = int(os.getenv("PAYLOAD_CACHE_SIZE", "256"))
+
+# Wire formats a connection can ask for when it joins an auction. "json" is
+# the original verbose schema; "compact" messages are flat objects with short
+# keys and snapshot leaderboard rows as positional arrays in ENTRY_FIELDS
+# order.
+WIRE_JSON = "json"
+WIRE_COMPACT = "compact"
+ENTRY_FIELDS = ("user_id", "user_name", "bid_amount", "timestamp")
+
+# Encoded leaderboard payloads keyed by (auction_id, version, format, seq),
+# kept across warm invocations so an unchanged leaderboard is never encoded
+# twice. Messages carry the auction event sequence number (seq) when the
+# event log assigned one.
+_leaderboard_payloads = OrderedDict()
+
+
+def _encode_default(obj):
+    """
+    JSON fallback for DynamoDB numbers: integral Decimals become ints.
+    """
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def encode_message(message):
+    """
+    Encode a message to wire bytes once, handling Decimal values directly.
+    """
+    return json.dumps(message, default=_encode_default, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def wire_format(requested):
+    """
+    Normalize a connection's requested format; anything unknown gets JSON.
+    """
+    return WIRE_COMPACT if requested == WIRE_COMPACT else WIRE_JSON
+
+
+def compact_entries(entries):
+    return [[entry.get(field) for field in ENTRY_FIELDS] for entry in entries]
+
+
+def _with_seq(message, seq):
+    if seq is not None:
+        message["seq"] = seq
+    return message
+
+
+def encode_leaderboard_message(
+    auction_id, version, leaderboard, fmt=WIRE_JSON, seq=None
+):
+    """
+    Encode a leaderboardUpdate message, reusing the cached bytes for a version.
+
+    A version of None means the leaderboard is not versioned and is always
+    encoded afresh.
+    """
+    key = (auction_id, version, fmt, seq)
+    if version is not None and key in _leaderboard_payloads:
+        _leaderboard_payloads.move_to_end(key)
+        return _leaderboard_payloads[key]
+
+    if fmt == WIRE_COMPACT:
+        message = {
+            "t": "lb",
+            "a": auction_id,
+            "v": version,
+            "e": compact_entries(leaderboard),
+        }
+    else:
+        message = {
+            "type": "leaderboardUpdate",
+            "auction_id": auction_id,
+            "version": version,
+            "leaderboard": leaderboard,
+        }
+    payload = encode_message(_with_seq(message, seq))
+    if version is not None:
+        _leaderboard_payloads[key] = payload
+        if len(_leaderboard_payloads) > PAYLOAD_CACHE_SIZE:
+            _leaderboard_payloads.popitem(last=False)
+    return payload
+
+
+def encode_leaderboard_delta(
+    auction_id, base_version, version, changed, removed, fmt=WIRE_JSON, seq=None
+):
+    """
+    Encode a leaderboardDelta message: the entries that changed since
+    base_version and the user_ids that left the top-K. Clients holding another
+    version than base_version request a snapshot instead of applying it.
+
+    Compact deltas keep their few changed entries as objects: expanding
+    positional rows does not pay off for a handful of rows.
+    """
+    if fmt == WIRE_COMPACT:
+        message = {
+            "t": "ld",
+            "a": auction_id,
+            "b": base_version,
+            "v": version,
+            "c": changed,
+            "r": removed,
+        }
+    else:
+        message = {
+            "type": "leaderboardDelta",
+            "auction_id": auction_id,
+            "base_version": base_version,
+            "version": version,
+            "changed": changed,
+            "removed": removed,
+        }
+    return encode_message(_with_seq(message, seq))
+
+
+def encode_status_message(message, fmt=WIRE_JSON, seq=None):
+    """
+    Encode an auction status change (start, snipe extension).
+
+    JSON clients get the original envelope with the message JSON-encoded
+    again in its body; compact clients get the message itself.
+    """
+    if fmt == WIRE_COMPACT:
+        return encode_message(_with_seq({"t": "st", **message}, seq))
+    return encode_message(
+        _with_seq(
+            {"statusCode": 200, "body": json.dumps(message, default=_encode_default)},
+            seq,
+        )
+    )
+
+
+def encode_event_message(message, fmt=WIRE_JSON, seq=None):
+    """
+    Encode a flat notification (creating, ended); it is the same in every
+    wire format.
+    """
+    return encode_message(_with_seq(dict(message), seq))
+
+
+def post_by_format(api_client, auction_id, connections, encode):
+    """
+    Post a message to user-connections items, encoding it once per wire
+    format the connections asked for; encode(fmt) returns the payload.
+
+    Returns the combined post_to_connections stats.
+    """
+    by_format = {}
+    for connection in connections:
+        by_format.setdefault(wire_format(connection.get("format")), []).append(
+            connection.get("connection_id")
+        )
+
+    totals = {"sent": 0, "failed": 0, "gone": 0, "elapsed_ms": 0.0}
+    for fmt, connection_ids in by_format.items():
+        stats = post_to_connections(api_client, auction_id, connection_ids, encode(fmt))
+        for key in totals:
+            totals[key] += stats[key]
+    return totals
+
+
+def post_pages_by_format(api_client, auction_id, pages, encode):
+    """
+    Post a message to connections arriving in pages (see
+    connection_helper.iter_connection_pages), fanning out each page as soon
+    as it is read instead of collecting the whole audience first.
+
+    Returns the combined post_to_connections stats.
+    """
+    totals = {"sent": 0, "failed": 0, "gone": 0, "elapsed_ms": 0.0}
+    for page in pages:
+        stats = post_by_format(api_client, auction_id, page, encode)
+        for key in totals:
+            totals[key] += stats[key]
+    return totals
+
+
+def post_to_connections(api_client, auction_id, connection_ids, data):
+    """
+    Post one message to many WebSocket connections concurrently.
+
+    The message is encoded once up front; callers may pass pre-encoded bytes.
+
+    Connections that API Gateway reports as gone are removed from the
+    user-connections table in one batch so later broadcasts skip them.
+
+    Returns a stats dict with sent, failed and gone counts plus elapsed_ms.
+    """
+    if not isinstance(data, (str, bytes)):
+        data = encode_message(data)
+
+    started = time.perf_counter()
+    connection_ids = list(connection_ids)
+    stats = {"sent": 0, "failed": 0, "gone": 0, "elapsed_ms": 0.0}
+    gone_connections = []
+
+    if connection_ids:
+        workers = max(1, min(FANOUT_MAX_WORKERS, len(connection_ids)))
+        with stage("fanout"), ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    api_client.post_to_connection, ConnectionId=connection_id, Data=data
+                ): connection_id
+                for connection_id in connection_ids
+            }
+            for future in as_completed(futures):
+                connection_id = futures[future]
+                try:
+                    future.result()
+                    stats["sent"] += 1
+                except api_client.exceptions.GoneException:
+                    gone_connections.append(connection_id)
+                except ClientError as e:
+                    stats["failed"] += 1
+                    logger.error(
+                        "Failed to send message to connection_id %s: %s",
+                        connection_id,
+                        e.response["Error"]["Message"],
+                    )
+                except Exception as e:
+                    stats["failed"] += 1
+                    logger.error(
+                        "Failed to send message to connection_id %s: %s",
+                        connection_id,
+                        str(e),
+                    )
+
+    if gone_connections:
+        stats["gone"] = len(gone_connections)
+        prune_connections(auction_id, gone_connections)
+
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    count("fanout_sent", stats["sent"])
+    count("fanout_failed", stats["failed"])
+    count("fanout_gone", stats["gone"])
+    logger.info(
+        "Broadcast for auction %s: sent=%d failed=%d gone=%d elapsed_ms=%s",
+        auction_id,
+        stats["sent"],
+        stats["failed"],
+        stats["gone"],
+        stats["elapsed_ms"],
+    )
+    return stats
+
+
+def prune_connections(auction_id, connection_ids):
+    """
+    Batch-delete stale connection ids for an auction from user-connections.
+    """
+    table = dynamodb.Table(USER_CONNECTIONS_TABLE)
+    try:
+        with stage("connection_prune"), table.batch_writer() as batch:
+            for connection_id in connection_ids:
+                batch.delete_item(
+                    Key={"connection_id": connection_id, "auction_id": auction_id}
+                )
+        logger.info(
+            "Pruned %d stale connections for auction %s",
+            len(connection_ids),
+            auction_id,
+        )
+    except ClientError as e:
+        logger.error(
+            "Failed to prune stale connections: %s", e.response["Error"]["Message"]
+        )
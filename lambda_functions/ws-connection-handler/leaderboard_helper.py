@@ -1,50 +1,56 @@
 import boto3
-import json
 import os
-from decimal import Decimal
+from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
-import logging
+from auction_engine import rank_leaderboard
+from broadcast_helper import WIRE_JSON, encode_leaderboard_message
+from event_log_helper import current_seq
+from metrics_helper import instrument_client, stage, timed
+from log_helper import get_logger
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
 
 # Initialize AWS services
-dynamodb = boto3.resource("dynamodb")
-broadcast_gateway = boto3.client(
-    "apigatewaymanagementapi", endpoint_url=os.getenv("BROADCAST_ENDPOINT")
+dynamodb = instrument_client(boto3.resource("dynamodb"))
+broadcast_gateway = instrument_client(
+    boto3.client(
+        "apigatewaymanagementapi", endpoint_url=os.getenv("BROADCAST_ENDPOINT")
+    )
 )
 
 # Environment variables
 LEADERBOARD_TABLE = os.getenv("LEADERBOARD_TABLE")
+LEADERBOARD_TOP_TABLE = os.getenv("LEADERBOARD_TOP_TABLE", "AuctionLeaderboardTop")
+LEADERBOARD_TOP_SIZE = int(os.getenv("LEADERBOARD_TOP_SIZE", "25"))
 
 
-def broadcast_leaderboard(auction_id, connection_id):
+def broadcast_leaderboard(auction_id, connection_id, fmt=WIRE_JSON):
     """
-    Broadcast the updated leaderboard to the connection_id.
+    Broadcast the updated leaderboard to the connection_id, in the wire
+    format it asked for.
+
+    The snapshot carries the auction's current event sequence number so the
+    client can later resume from it.
     """
     try:
-        # Fetch leaderboard
-        leaderboard = fetch_leaderboard(auction_id)
+        # Read the sequence first: events after it are newer than the snapshot
+        seq = current_seq(auction_id)
 
-        # Convert Decimal types to JSON-serializable types
-        leaderboard = convert_decimal(leaderboard)
+        # Fetch leaderboard
+        leaderboard, version = fetch_leaderboard(auction_id)
 
-        # Prepare message
-        message = {
-            "type": "leaderboardUpdate",
-            "auction_id": auction_id,
-            "leaderboard": leaderboard,
-        }
+        # Reuses the encoded bytes when this version was already sent
+        payload = encode_leaderboard_message(auction_id, version, leaderboard, fmt, seq)
 
         # Broadcast to connection_id
         try:
             logger.info(
                 "Sending leaderboard update to connection_id: %s", connection_id
             )
-            broadcast_gateway.post_to_connection(
-                ConnectionId=connection_id, Data=json.dumps(message)
-            )
+            with stage("fanout"):
+                broadcast_gateway.post_to_connection(
+                    ConnectionId=connection_id, Data=payload
+                )
             logger.info(
                 "Successfully sent leaderboard update to connection_id: %s",
                 connection_id,
@@ -58,46 +64,61 @@ def broadcast_leaderboard(auction_id, connection_id):
             )
 
     except Exception as e:
-        print(f"Failed to broadcast leaderboard: {str(e)}")
+        logger.error("Failed to broadcast leaderboard: %s", str(e), exc_info=True)
+
+
+@timed("replay")
+def replay_events(connection_id, events, fmt=WIRE_JSON):
+    """
+    Send logged auction events to a resumed connection, oldest first.
+    """
+    for event in events:
+        broadcast_gateway.post_to_connection(
+            ConnectionId=connection_id, Data=event[fmt].encode("utf-8")
+        )
 
 
+@timed("leaderboard_read")
 def fetch_leaderboard(auction_id):
     """
-    Fetch the sorted leaderboard for an auction.
+    Fetch the ranked top-K leaderboard for an auction from its materialized item.
+
+    Returns the last broadcast (entries, version), the state leaderboard
+    deltas are based on; version is None when the item does not exist.
     """
     try:
         logger.info("Fetching leaderboard for auction_id: %s", auction_id)
-        table = dynamodb.Table(LEADERBOARD_TABLE)
-        response = table.query(
-            KeyConditionExpression=boto3.dynamodb.conditions.Key("auction_id").eq(
-                auction_id
-            ),
-            ScanIndexForward=False,  # DynamoDB default sorting is ascending; use False for descending
-        )
-        leaderboard = response.get("Items", [])
-        leaderboard_sorted = sorted(leaderboard, key=lambda x: -x["bid_amount"])
-        logger.info(
-            "Fetched leaderboard for auction_id %s: %s", auction_id, leaderboard_sorted
+        table = dynamodb.Table(LEADERBOARD_TOP_TABLE)
+        item = table.get_item(Key={"auction_id": auction_id}, ConsistentRead=True).get(
+            "Item"
         )
-        return leaderboard_sorted
+        if item and item.get("broadcast_version") is not None:
+            return item.get("broadcast_entries", []), item["broadcast_version"]
+        if item:
+            return item.get("entries", []), item.get("version")
+
+        # Auctions without a materialized item yet fall back to the partition
+        return fetch_leaderboard_partition(auction_id)[:LEADERBOARD_TOP_SIZE], None
     except ClientError as e:
         logger.error(
             "Failed to fetch leaderboard from table: %s",
             e.response["Error"]["Message"],
             exc_info=True,
         )
-        return []
+        return [], None
 
 
-def convert_decimal(obj):
+def fetch_leaderboard_partition(auction_id):
     """
-    Recursively converts Decimal objects to float in a dictionary or list.
+    Read and rank every leaderboard row for an auction, following pagination.
     """
-    if isinstance(obj, list):
-        return [convert_decimal(i) for i in obj]
-    elif isinstance(obj, dict):
-        return {k: convert_decimal(v) for k, v in obj.items()}
-    elif isinstance(obj, Decimal):
-        return float(obj)  # Or int(obj) if you need integers
-    else:
-        return obj
+    table = dynamodb.Table(LEADERBOARD_TABLE)
+    query_kwargs = {"KeyConditionExpression": Key("auction_id").eq(auction_id)}
+    leaderboard = []
+    while True:
+        response = table.query(**query_kwargs)
+        leaderboard.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            break
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return rank_leaderboard(leaderboard)
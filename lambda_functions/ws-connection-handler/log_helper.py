@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import random
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Share of invocations whose INFO/DEBUG lines are kept, e.g. "placeBid=0.01,$default=0.1";
+# routes not listed use LOG_SAMPLE_RATE. WARNING and above are always kept.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_SAMPLE_RATES = {
+    route.strip(): float(rate)
+    for route, _, rate in (
+        pair.rpartition("=")
+        for pair in os.getenv("LOG_SAMPLE_RATES", "").split(",")
+        if "=" in pair
+    )
+}
+# Strings longer than this are truncated when logged
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "256"))
+# Lists longer than this are cut down to their first items when logged
+LOG_MAX_LIST_ITEMS = int(os.getenv("LOG_MAX_LIST_ITEMS", "20"))
+# Fields never logged verbatim, only summarized by size
+REDACTED_FIELDS = {"product_images", "base64", "password", "Authorization"}
+
+# Whether the current invocation's INFO/DEBUG lines are emitted
+_sampled = True
+_configured = False
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drop INFO and DEBUG records of invocations that were not sampled.
+
+    Filters run before a record is formatted, so dropped lines never pay for
+    their message arguments.
+    """
+
+    def filter(self, record):
+        return _sampled or record.levelno >= logging.WARNING
+
+
+def get_logger(name):
+    """
+    Return a logger with LOG_LEVEL applied and per-invocation sampling.
+    """
+    global _configured
+    if not _configured:
+        root = logging.getLogger()
+        if not root.handlers:
+            logging.basicConfig()
+        root.setLevel(LOG_LEVEL)
+        for handler in root.handlers:
+            handler.addFilter(SamplingFilter())
+        _configured = True
+    return logging.getLogger(name)
+
+
+def begin_invocation(route):
+    """
+    Decide once per invocation whether its routine log lines are kept.
+    """
+    global _sampled
+    rate = LOG_SAMPLE_RATES.get(route, LOG_SAMPLE_RATE)
+    _sampled = rate >= 1 or random.random() < rate
+    return _sampled
+
+
+def _summarize(key, item):
+    """
+    Describe a redacted field by a size that is cheap to compute: the length
+    of a string, or the summed lengths of a list's strings.
+    """
+    if isinstance(item, str):
+        return f"<{key}: {len(item)} chars>"
+    if isinstance(item, (list, tuple)):
+        chars = sum(len(element) for element in item if isinstance(element, str))
+        return f"<{key}: {len(item)} items, {chars} chars>"
+    return f"<{key}: redacted>"
+
+
+def redact(value, max_chars=LOG_MAX_FIELD_CHARS):
+    """
+    Copy a JSON-like value with large and sensitive fields cut down for logging.
+    """
+    if isinstance(value, dict):
+        return {
+            key: (
+                _summarize(key, item)
+                if key in REDACTED_FIELDS
+                else redact(item, max_chars)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        items = [redact(item, max_chars) for item in value[:LOG_MAX_LIST_ITEMS]]
+        if len(value) > LOG_MAX_LIST_ITEMS:
+            items.append(f"<{len(value) - LOG_MAX_LIST_ITEMS} more>")
+        return items
+    if isinstance(value, str) and len(value) > max_chars:
+        if value[:1] in "{[":
+            # JSON bodies (API Gateway events) are redacted field by field
+            try:
+                return redact(json.loads(value), max_chars)
+            except ValueError:
+                pass
+        return f"{value[:max_chars]}...<{len(value)} chars>"
+    return value
+
+
+class LazyJson:
+    """
+    Log argument that redacts and serializes its value only when emitted.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(redact(self.value), default=str)
+
+
+def log_event(logger, event, route):
+    """
+    Start sampling for an invocation and log its (redacted) event.
+    """
+    begin_invocation(route)
+    logger.info("Received event for %s: %s", route, LazyJson(event))
@@ -1,15 +1,21 @@
 import json
 import uuid
 import boto3
-from time_helper import calculate_remaining_time
+from time_helper import now_ms, to_epoch_ms
 from botocore.exceptions import ClientError
-from leaderboard_helper import broadcast_leaderboard
+from leaderboard_helper import broadcast_leaderboard, replay_events
+from event_log_helper import events_since
+from broadcast_helper import wire_format
+from metrics_helper import instrument_client, instrument_handler, set_property, stage
+from log_helper import get_logger, log_event
 import pymysql
 import os
 from datetime import datetime
 
+logger = get_logger(__name__)
+
 # Initialize DynamoDB
-dynamodb = boto3.resource("dynamodb")
+dynamodb = instrument_client(boto3.resource("dynamodb"))
 auction_table = dynamodb.Table("auction-connections")
 user_table = dynamodb.Table("user-connections")
 
@@ -39,18 +45,72 @@ def get_rds_connection():
     )
 
 
+def resume_session(connection_id, auction_id, user_id, last_seq, fmt):
+    """
+    Re-register a reconnecting client and replay only the events it missed.
+
+    Returns the route response, or None when last_seq is no longer in the
+    replay buffer and the client needs a full join instead.
+    """
+    if not auction_id or not user_id:
+        raise ValueError("Missing required fields: auction_id or user_id")
+    try:
+        last_seq = int(last_seq)
+    except (TypeError, ValueError):
+        return None
+
+    # Register before reading the log so no event falls between the two;
+    # the client drops events it already has by seq
+    with stage("connection_write"):
+        user_table.put_item(
+            Item={
+                "connection_id": connection_id,
+                "auction_id": auction_id,
+                "user_id": user_id,
+                "format": fmt,
+            }
+        )
+    with stage("replay_lookup"):
+        events = events_since(auction_id, last_seq)
+    if events is None:
+        logger.info(
+            "Connection %s fell out of the replay buffer of auction %s at seq %s",
+            connection_id,
+            auction_id,
+            last_seq,
+        )
+        return None
+
+    replay_events(connection_id, events, fmt)
+    logger.info(
+        "Resumed connection %s in auction %s with %d events after seq %s",
+        connection_id,
+        auction_id,
+        len(events),
+        last_seq,
+    )
+    return {
+        "statusCode": 200,
+        "body": json.dumps(
+            {"message": f"Auction {auction_id} resumed", "replayed": len(events)}
+        ),
+    }
+
+
+@instrument_handler
 def lambda_handler(event, context):
     """
     Handles WebSocket events for $connect, $disconnect, and $default.
     """
     route_key = event["requestContext"]["routeKey"]
     connection_id = event["requestContext"]["connectionId"]
+    set_property("route", route_key)
     response = {}
-    print("Event:", event["requestContext"])
+    log_event(logger, event, route_key)
 
     if route_key == "$connect":
         # Handle $connect
-        print(f"Connection established: {connection_id}")
+        logger.info("Connection established: %s", connection_id)
         response = {
             "statusCode": 200,
             "body": json.dumps(
@@ -70,14 +130,16 @@ def lambda_handler(event, context):
 
         for item in user_items["Items"]:
             auction_id = item["auction_id"]
-            auction_connection_id = item["auction_connectionId"]
+            auction_connection_id = item.get("auction_connectionId")
 
             # Delete the connectionId entry from UserConnections
             user_table.delete_item(
                 Key={"connection_id": connection_id, "auction_id": auction_id}
             )
-            print(f"Removed connection {connection_id} from auction {auction_id}")
-        print(f"Disconnected: {connection_id}")
+            logger.info(
+                "Removed connection %s from auction %s", connection_id, auction_id
+            )
+        logger.info("Disconnected: %s", connection_id)
 
         response = {
             "statusCode": 200,
@@ -86,49 +148,57 @@ def lambda_handler(event, context):
 
     elif route_key == "$default":
         # Handle $default
-        print("Before Try")
         try:
             raw_body = event.get("body", "{}")
             body = json.loads(raw_body) if raw_body.strip() else {}
             action = body.get("action")
             auction_id = body.get("auction_id")
             user_id = body.get("user_id")
-            print("Raw Body: ", raw_body)
-            print("body:", body)
-            print("in try")
-            if action == "create":
-                print("in create")
+            # "compact" or "json"; older clients send nothing and get JSON
+            fmt = wire_format(body.get("format"))
+            if action == "resume":
+                response = resume_session(
+                    connection_id, auction_id, user_id, body.get("last_seq"), fmt
+                )
+                if not response:
+                    # Fell out of the replay buffer: rejoin with a snapshot
+                    action = "create"
+            if action == "ping":
+                # Clock sync: the client halves the round trip to estimate
+                # its offset from server time
+                response = {
+                    "statusCode": 200,
+                    "body": json.dumps(
+                        {
+                            "type": "pong",
+                            "client_ms": body.get("client_ms"),
+                            "server_ms": now_ms(),
+                        }
+                    ),
+                }
+            elif action == "create":
                 auction_id = body.get("auction_id")
                 user_id = body.get("user_id")
-                print("in create 2")
 
                 if not auction_id or not user_id:
                     raise ValueError("Missing required fields: auction_id or user_id")
-                print("Auction ID:", auction_id)
-                print("User ID:", user_id)
 
                 # Check if an auction_connectionId exists
-                auction_response = auction_table.get_item(
-                    Key={"auction_id": auction_id}
-                )
-                print("Auction Response:", auction_response)
+                with stage("auction_lookup"):
+                    auction_response = auction_table.get_item(
+                        Key={"auction_id": auction_id}
+                    )
                 auction_connection_id = auction_response.get("Item", {}).get(
                     "auction_connectionId"
                 )
-                print("Auction Connection ID:", auction_connection_id)
-                broadcast_leaderboard(auction_id, connection_id)
-                print("1")
-                # auction_end_time = time.time() + 15*60
-                # remaining_timedelta = timedelta(seconds=int(remaining))
-                # formatted_time = str(remaining_timedelta)
+                logger.debug("Auction connection id: %s", auction_connection_id)
+                broadcast_leaderboard(auction_id, connection_id, fmt)
                 auction_end_time = auction_response.get("Item", {}).get(
                     "auction_end_time"
                 )
-                remaining_time = calculate_remaining_time(auction_end_time)
                 auction_status = auction_response.get("Item", {}).get(
                     "auction_status"
                 )  # {'SCHEDULED', 'CREATING', 'STARTED', 'ENDED'}
-                print("2")
 
                 # Create auction_connectionId if not present
                 if not auction_connection_id:
@@ -141,23 +211,29 @@ def lambda_handler(event, context):
                         # 'auction_status': auction_status,
                         # # 'auction_start_time': auction_start_time,
                         # 'auction_end_time': auction_end_time,
-                        # 'remaining_time': remaining_time,
                     )
-                    print(
-                        f"Created auction_connectionId {auction_connection_id} for auction {auction_id}"
+                    logger.info(
+                        "Created auction_connectionId %s for auction %s",
+                        auction_connection_id,
+                        auction_id,
                     )
 
                 # Map connectionId to auction
-                user_table.put_item(
-                    Item={
-                        "connection_id": connection_id,
-                        "auction_connectionId": auction_connection_id,
-                        "auction_id": auction_id,
-                        "user_id": user_id,
-                    }
-                )
-                print(
-                    f"User {user_id} joined auction {auction_id} with connection {connection_id}"
+                with stage("connection_write"):
+                    user_table.put_item(
+                        Item={
+                            "connection_id": connection_id,
+                            "auction_connectionId": auction_connection_id,
+                            "auction_id": auction_id,
+                            "user_id": user_id,
+                            "format": fmt,
+                        }
+                    )
+                logger.info(
+                    "User %s joined auction %s with connection %s",
+                    user_id,
+                    auction_id,
+                    connection_id,
                 )
 
                 response = {
@@ -169,28 +245,37 @@ def lambda_handler(event, context):
                             "auction_status": auction_status,
                             # 'auction_start_time': auction_start_time,
                             "auction_end_time": auction_end_time,
-                            "remaining_time": remaining_time,
+                            "auction_end_ms": to_epoch_ms(auction_end_time),
                         }
                     ),
                 }
-            else:
+            elif action == "leaderboardSnapshot":
+                # Sent by clients that missed a leaderboardDelta version
+                if not auction_id:
+                    raise ValueError("Missing required field: auction_id")
+                broadcast_leaderboard(auction_id, connection_id, fmt)
+                response = {
+                    "statusCode": 200,
+                    "body": json.dumps({"message": "Leaderboard snapshot sent"}),
+                }
+            elif action != "resume":
                 response = {
                     "statusCode": 400,
                     "body": json.dumps({"message": "Unknown or missing action"}),
                 }
         except ValueError as ve:
-            print(f"Validation error: {ve}")
+            logger.warning("Validation error: %s", ve)
             response = {"statusCode": 400, "body": json.dumps({"message": str(ve)})}
 
         except ClientError as e:
-            print(f"DynamoDB error: {e.response['Error']['Message']}")
+            logger.error("DynamoDB error: %s", e.response["Error"]["Message"])
             response = {
                 "statusCode": 500,
                 "body": json.dumps({"message": "Internal server error"}),
             }
 
         except json.JSONDecodeError as e:
-            print(f"JSON parse error: {e}")
+            logger.warning("JSON parse error: %s", e)
             response = {
                 "statusCode": 400,
                 "body": json.dumps({"message": "Invalid JSON in request"}),
@@ -209,7 +294,7 @@ def lambda_handler(event, context):
         # print(json.dumps(table_description, cls=CustomJSONEncoder))
     else:
         # Handle unknown routes (optional)
-        print(f"Unknown route: {route_key}")
+        logger.warning("Unknown route: %s", route_key)
         response = {"statusCode": 400, "body": json.dumps({"message": "Unknown route"})}
 
     return response
@@ -0,0 +1,28 @@
+"""Add email to users
+
+Revision ID: 3f9a1c7d2b64
+Revises: 5e4dcc2e44a0
+Create Date: 2026-10-18 10:12:44.518203
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3f9a1c7d2b64"
+down_revision = "5e4dcc2e44a0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Verified email stored at login so Lambdas can resolve many users in one query
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("email", sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.drop_column("email")
@@ -0,0 +1,42 @@
+"""Add user_watch
+
+Revision ID: 8b2e5d41c0f3
+Revises: 3f9a1c7d2b64
+Create Date: 2026-10-18 11:02:17.904316
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8b2e5d41c0f3"
+down_revision = "3f9a1c7d2b64"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_watch",
+        sa.Column("watch_id", sa.String(length=36), nullable=False),
+        sa.Column("user_id", sa.String(length=36), nullable=False),
+        sa.Column("watch_type", sa.Enum("seller", "keyword"), nullable=False),
+        sa.Column("target", sa.String(length=100), nullable=False),
+        sa.Column("created_on", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.user_id"]),
+        sa.PrimaryKeyConstraint("watch_id"),
+        sa.UniqueConstraint("user_id", "watch_type", "target"),
+    )
+    with op.batch_alter_table("user_watch", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_user_watch_type_target", ["watch_type", "target"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("user_watch", schema=None) as batch_op:
+        batch_op.drop_index("ix_user_watch_type_target")
+
+    op.drop_table("user_watch")
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+LAMBDA_DIR = os.path.join(ROOT, "lambda_functions")
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+# The in-process AWS stand-ins the benchmarks run against
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
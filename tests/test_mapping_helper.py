@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+from aws_standins import FakeTable, client_error
+from conftest import LAMBDA_DIR
+
+sys.path.insert(0, os.path.join(LAMBDA_DIR, "AuctionResourceManager"))
+
+import mapping_helper  # noqa: E402
+
+QUEUE_ARN = "arn:aws:sqs:us-east-1:000000000000:AuctionActionsQueue-a1.fifo"
+
+
+class FakeLambdaMappings:
+    """
+    Event source mappings whose create always conflicts with existing ones.
+    """
+
+    def __init__(self, mappings):
+        self.mappings = mappings
+        self.creates = 0
+
+    def create_event_source_mapping(self, **kwargs):
+        self.creates += 1
+        raise client_error("ResourceConflictException", "CreateEventSourceMapping")
+
+    def list_event_source_mappings(self, **kwargs):
+        return {"EventSourceMappings": list(self.mappings)}
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    table = FakeTable(mapping_helper.EVENT_SOURCE_MAPPING_TABLE, "queue_arn")
+
+    class Resource:
+        def Table(self, name):
+            return table
+
+    monkeypatch.setattr(mapping_helper, "dynamodb", Resource())
+    return table
+
+
+def test_conflict_returns_concurrently_created_mapping(monkeypatch, registry):
+    mapping = {"UUID": "m-1", "State": "Enabled", "BatchSize": 10}
+    lambda_client = FakeLambdaMappings([])
+    monkeypatch.setattr(mapping_helper, "lambda_client", lambda_client)
+    # The concurrent attach only becomes visible after our create conflicts
+    original = lambda_client.create_event_source_mapping
+
+    def create(**kwargs):
+        lambda_client.mappings.append(mapping)
+        return original(**kwargs)
+
+    lambda_client.create_event_source_mapping = create
+
+    assert mapping_helper.ensure_mapping(QUEUE_ARN, {"BatchSize": 10}) == "m-1"
+
+
+def test_conflict_with_deleting_mapping_raises(monkeypatch, registry):
+    lambda_client = FakeLambdaMappings(
+        [{"UUID": "m-old", "State": "Deleting", "BatchSize": 10}]
+    )
+    monkeypatch.setattr(mapping_helper, "lambda_client", lambda_client)
+    mapping_helper_find = mapping_helper.find_mapping
+    # The deleting mapping is not returned by the first lookup
+    calls = []
+
+    def find(queue_arn):
+        calls.append(queue_arn)
+        return mapping_helper_find(queue_arn) if len(calls) > 1 else None
+
+    monkeypatch.setattr(mapping_helper, "find_mapping", find)
+
+    with pytest.raises(RuntimeError, match="still being deleted"):
+        mapping_helper.ensure_mapping(QUEUE_ARN, {"BatchSize": 10})
+    assert lambda_client.creates == mapping_helper.MAPPING_CREATE_ATTEMPTS
+    assert registry.items == {}
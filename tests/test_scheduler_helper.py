@@ -0,0 +1,78 @@
+import os
+import sys
+
+from aws_standins import FakeTable
+from conftest import LAMBDA_DIR
+
+sys.path.insert(0, os.path.join(LAMBDA_DIR, "AuctionScheduler"))
+
+import scheduler_helper  # noqa: E402
+from scheduler_helper import (  # noqa: E402
+    END_AUCTION,
+    SCHEDULE_BUCKET_MS,
+    START_AUCTION,
+    DynamoScheduleStore,
+    run_dispatcher,
+)
+
+
+def make_store():
+    return DynamoScheduleStore(FakeTable("auction-schedule", "bucket", "entry_key"))
+
+
+def test_due_finds_entry_written_into_scanned_bucket():
+    store = make_store()
+    # The tick before the write already scanned past the entry's bucket
+    now = 10 * SCHEDULE_BUCKET_MS + 50
+    assert store.due(now + 200) == []
+
+    store.put("a1", START_AUCTION, now - 100)
+
+    entries = store.due(now + 700)
+    assert [(e["auction_id"], e["due_ms"]) for e in entries] == [("a1", now - 100)]
+    assert store.claim(entries[0])
+    assert store.due(now + 1200) == []
+
+
+def test_dispatcher_fires_entry_written_past_due():
+    store = make_store()
+    boundary = 10 * SCHEDULE_BUCKET_MS
+    clock = [boundary - 300]
+    written = []
+    fired = []
+
+    def sleep(seconds):
+        clock[0] += int(seconds * 1000)
+        if clock[0] > boundary and not written:
+            # Written once the dispatcher has moved on to the next bucket
+            store.put("a1", END_AUCTION, boundary - 100)
+            written.append(True)
+
+    run_dispatcher(
+        store,
+        fired.append,
+        boundary + 2000,
+        tick_ms=500,
+        clock=lambda: clock[0],
+        sleep=sleep,
+    )
+    assert [entry["auction_id"] for entry in fired] == ["a1"]
+
+
+def test_failed_firing_is_retried():
+    store = scheduler_helper.InMemoryScheduleStore()
+    store.put("a1", END_AUCTION, 100)
+    clock = [0]
+    attempts = []
+
+    def fire(entry):
+        attempts.append(entry["due_ms"])
+        if len(attempts) == 1:
+            raise RuntimeError("invoke failed")
+
+    def sleep(seconds):
+        clock[0] += int(seconds * 1000)
+
+    fired = run_dispatcher(store, fire, 5000, clock=lambda: clock[0], sleep=sleep)
+    assert len(attempts) == 2
+    assert [entry["attempts"] for entry in fired] == [1]
@@ -0,0 +1,55 @@
+import json
+import os
+import random
+
+os.environ["BROADCAST_CONFLATION"] = "on"
+os.environ["BROADCAST_MAX_PER_SECOND"] = "5"
+
+from aws_standins import AwsCallCounter  # noqa: E402
+from bid_storm_benchmark import (  # noqa: E402
+    AUCTION_ID,
+    build_environment,
+    load_handlers,
+)
+
+
+def bid_record(user_id, bid_amount):
+    body = {
+        "action": "placeBid",
+        "auction_id": AUCTION_ID,
+        "user_id": user_id,
+        "user_name": user_id,
+        "bid_amount": bid_amount,
+        "timestamp": 1,
+    }
+    return {"body": json.dumps(body)}
+
+
+def test_deferred_bid_without_later_bids_gets_trailing_broadcast():
+    services, _ = build_environment(AwsCallCounter(), 3, 0, random.Random(7))
+    _, queue_handler, scheduler_helper = load_handlers(services)
+    store = scheduler_helper.get_default_store()
+    events = services["dynamodb"].Table("auction-events")
+
+    def broadcast_versions():
+        return [
+            json.loads(item["json"]).get("version")
+            for key, item in sorted(events.items.items())
+            if key[1] != 0
+        ]
+
+    queue_handler({"Records": [bid_record("user-1", 101)]}, None)
+    # Inside the broadcast interval: held back, and no bid follows
+    queue_handler({"Records": [bid_record("user-2", 102)]}, None)
+    top_items = services["dynamodb"].Table("AuctionLeaderboardTop").items
+    assert broadcast_versions() == [1]
+    assert top_items[(AUCTION_ID,)]["version"] == 2
+
+    entries = store.due(scheduler_helper.now_ms() + 10**6)
+    assert [e["action"] for e in entries] == [scheduler_helper.TRAILING_BROADCAST]
+    for entry in entries:
+        assert store.claim(entry)
+        queue_handler({"auction_id": AUCTION_ID, "action": entry["action"]}, None)
+
+    assert broadcast_versions() == [1, 2]
+    assert top_items[(AUCTION_ID,)]["broadcast_version"] == 2